@@ -16,7 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
+from telegram_api.webhook import telegram_webhook
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('telegram/webhook/<str:bot>/', telegram_webhook, name='telegram_webhook'),
 ]
@@ -0,0 +1,160 @@
+from pathlib import Path
+import numpy as np
+
+
+# Vectors are assigned to lists in blocks to bound the size of the temporary score matrix
+ASSIGN_BLOCK_SIZE = 65536
+
+
+class IVFIndex:
+    """
+    Inverted file index for approximate nearest-neighbour search over unit-length embeddings.
+    Vectors are grouped into lists around k-means centroids; a query only scores the vectors of the `nprobe`
+    lists whose centroids are closest to it. The index stores list assignments only, the vectors themselves
+    stay in the embedding matrix of the RAG context and are passed to `search`.
+    """
+
+    def __init__(self, n_lists: int, nprobe: int = None, seed: int = 0) -> None:
+        """
+        Args:
+            n_lists (int): Number of lists (k-means centroids).
+            nprobe (int, optional): Number of lists scanned per query. Defaults to 1/16th of the lists, at least 8.
+            seed (int): Seed of the k-means initialisation.
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe or max(8, n_lists // 16)
+        self.seed = seed
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+        self._lists = None
+
+    @staticmethod
+    def lists_for(size: int) -> int:
+        """
+        Rule of thumb for the number of lists of an index over `size` vectors.
+        """
+        return max(1, int(4 * np.sqrt(size)))
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    def train(self, matrix: np.ndarray, iterations: int = 10, sample_per_list: int = 64) -> None:
+        """
+        Fit the centroids with spherical k-means on a sample of the vectors and assign every vector to a list.
+
+        Args:
+            matrix (np.ndarray): All vectors of the context, one per row.
+            iterations (int): Number of k-means iterations.
+            sample_per_list (int): Number of sampled vectors per list used for training.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self.n_lists, len(matrix))
+        sample_size = min(len(matrix), n_lists * sample_per_list)
+        sample = matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))]
+
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            # Empty lists keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True)
+
+        self.centroids = centroids
+        self.n_lists = n_lists
+        self.assignments = self._nearest(matrix, centroids)
+        self.trained_size = len(matrix)
+        self._lists = None
+
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        Append vectors to the index. They get the row numbers following the vectors already indexed.
+
+        Args:
+            vectors (np.ndarray): The new vectors, one per row.
+        """
+        self.assignments = np.concatenate([self.assignments, self._nearest(vectors, self.centroids)])
+        self._lists = None
+
+    def needs_training(self, size: int) -> bool:
+        """
+        Whether the centroids are missing or were fitted on too small a part of `size` vectors to be representative.
+        """
+        return not self.is_trained or size > 4 * self.trained_size
+
+    def search(self, matrix: np.ndarray, query, k: int, nprobe: int = None) -> tuple:
+        """
+        Find the rows of the matrix most similar to a query vector.
+
+        Args:
+            matrix (np.ndarray): The indexed vectors, one per row.
+            query: Embedding of the query.
+            k (int): Number of rows to return.
+            nprobe (int, optional): Number of lists to scan. Defaults to the `nprobe` of the index.
+
+        Returns:
+            tuple: The indices of the best rows and their scores, both ordered from most to least similar.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        probed = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+
+        order, offsets = self._inverted_lists()
+        candidates = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in probed])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = matrix[candidates] @ query
+        k = min(k, len(scores))
+        best = np.argpartition(scores, -k)[-k:]
+        best = best[np.argsort(scores[best])[::-1]]
+        return candidates[best], scores[best]
+
+    def save(self, file) -> None:
+        """
+        Write the index in `.npz` format to a path or an open binary file.
+        """
+        np.savez(file, centroids=self.centroids, assignments=self.assignments,
+                 trained_size=self.trained_size, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        """
+        Read an index written by `save`.
+        """
+        with np.load(path) as data:
+            index = cls(n_lists=len(data["centroids"]), nprobe=int(data["nprobe"]))
+            index.centroids = data["centroids"]
+            index.assignments = data["assignments"]
+            index.trained_size = int(data["trained_size"])
+        return index
+
+    def _inverted_lists(self) -> tuple:
+        """
+        Row numbers grouped by list, with the start of each list, rebuilt after vectors were added.
+        """
+        lists = self._lists
+        if lists is None:
+            # Built aside and swapped in at once, searches may run concurrently from several threads
+            order = np.argsort(self.assignments, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(self.assignments, minlength=self.n_lists))])
+            lists = self._lists = (order, offsets)
+        return lists
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+            block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+            labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
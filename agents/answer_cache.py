@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from decouple import config
+import numpy as np
+import threading
+import time
+
+
+@dataclass
+class CachedAnswer:
+    """
+    An answer kept for questions similar to the one it was generated for.
+    """
+    question: str
+    answer: str
+    vector: np.ndarray
+    version: str
+    expires: float
+
+
+class AnswerCache:
+    """
+    In-process cache of generated answers, looked up by question similarity.
+    Answers are kept per company and model and are only returned for questions whose embedding is within
+    `threshold` cosine similarity of a cached question, asked against the same version of the company's RAG
+    context. Entries expire after `ttl` seconds and the least recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, threshold: float = None) -> None:
+        """
+        Args:
+            max_entries (int, optional): Number of answers kept. Defaults to the ANSWER_CACHE_MAX_ENTRIES setting.
+            ttl (float, optional): Seconds an answer stays valid. Defaults to the ANSWER_CACHE_TTL setting.
+            threshold (float, optional): Lowest cosine similarity of a matching question. Defaults to the
+                ANSWER_CACHE_SIMILARITY setting.
+        """
+        self.max_entries = max_entries or config("ANSWER_CACHE_MAX_ENTRIES", default=1024, cast=int)
+        self.ttl = ttl or config("ANSWER_CACHE_TTL", default=3600, cast=float)
+        self.threshold = threshold or config("ANSWER_CACHE_SIMILARITY", default=0.95, cast=float)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Least recently used first, keyed by (company, model, entry number)
+        self._entries = OrderedDict()
+        # Question matrix of each company and model, rebuilt after their entries change
+        self._matrices = {}
+        self._counter = 0
+
+    def get(self, company: str, model: str, version: str, vector) -> str:
+        """
+        Find the answer to a question similar to the given one.
+
+        Args:
+            company (str): The company the question is about.
+            model (str): The model answering.
+            version (str): The version of the company's RAG context.
+            vector: The embedding of the question.
+
+        Returns:
+            str: The cached answer, or None if no similar question was answered for this context version.
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            self._expire(company, model, version)
+            keys, matrix = self._matrix(company, model)
+            if keys:
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]].answer
+            self.misses += 1
+            return None
+
+    def put(self, company: str, model: str, version: str, vector, answer: str, question: str = "") -> None:
+        """
+        Store the answer to a question.
+
+        Args:
+            company (str): The company the question is about.
+            model (str): The model that answered.
+            version (str): The version of the company's RAG context the answer was generated from.
+            vector: The embedding of the question.
+            answer (str): The answer.
+            question (str): The question, kept for inspection.
+        """
+        entry = CachedAnswer(question=question, answer=answer, vector=self._normalize(vector), version=version,
+                             expires=time.monotonic() + self.ttl)
+        with self._lock:
+            self._counter += 1
+            self._entries[(company, model, self._counter)] = entry
+            self._matrices.pop((company, model), None)
+            while len(self._entries) > self.max_entries:
+                (old_company, old_model, _), _ = self._entries.popitem(last=False)
+                self._matrices.pop((old_company, old_model), None)
+
+    def invalidate(self, company: str) -> int:
+        """
+        Drop every answer about a company.
+
+        Args:
+            company (str): The company whose context changed.
+
+        Returns:
+            int: The number of answers dropped.
+        """
+        with self._lock:
+            return self._remove([key for key in self._entries if key[0] == company])
+
+    def stats(self) -> dict:
+        """
+        Report hit and miss counts along with the number of cached answers.
+
+        Returns:
+            dict: The "hits", "misses" and "entries" of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _expire(self, company: str, model: str, version: str) -> None:
+        """
+        Drop the answers of a company and model that expired or were generated from another context version.
+        """
+        now = time.monotonic()
+        keys, _ = self._matrix(company, model)
+        self._remove([key for key in keys
+                      if self._entries[key].version != version or self._entries[key].expires <= now])
+
+    def _remove(self, keys: list) -> int:
+        for key in keys:
+            del self._entries[key]
+            self._matrices.pop(key[:2], None)
+        return len(keys)
+
+    def _matrix(self, company: str, model: str) -> tuple:
+        """
+        Return the keys and the stacked question vectors of the answers of a company and model.
+        """
+        if (company, model) not in self._matrices:
+            keys = [key for key in self._entries if key[:2] == (company, model)]
+            matrix = np.stack([self._entries[key].vector for key in keys]) if keys else None
+            self._matrices[(company, model)] = (keys, matrix)
+        return self._matrices[(company, model)]
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+_default_cache = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Return the answer cache of the current process, creating it on first use.
+
+    Returns:
+        AnswerCache: The shared cache instance.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnswerCache()
+    return _default_cache
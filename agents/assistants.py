@@ -0,0 +1,145 @@
+from agents.clients import get_client
+from django.db import models
+from typing import Callable
+import hashlib
+import json
+import openai
+
+
+# Assistants used by the factory, created once per model and configuration
+ASSISTANT_ROLES = {
+    "summarizer": {
+        "name": "Summarizer",
+        "description": "An assistant that summarizes content."
+    },
+    "verifier": {
+        "name": "Verifier",
+        "description": "An assistant that verifies if the summary contains all main points of the content."
+    },
+}
+
+
+class RegisteredAssistant(models.Model):
+    """
+    An assistant created by the factory, shared by every host through the database.
+    """
+    key = models.CharField(max_length=64, unique=True, help_text="Digest of the name, model and configuration")
+    name = models.CharField(max_length=255)
+    model = models.CharField(max_length=100)
+    assistant_id = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "agents"
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.model}): {self.assistant_id}"
+
+
+class AssistantRegistry:
+    """
+    Registry of the assistants created by the factory, shared by every process and host through the database.
+    Each assistant is created once per name, model and configuration and its ID is reused afterwards.
+    """
+
+    def __init__(self, client: openai.OpenAI = None) -> None:
+        """
+        Args:
+            client (openai.OpenAI, optional): Client used to check that assistants still exist and to delete
+                duplicates. Defaults to the shared client of the process.
+        """
+        self.client = client
+
+    @staticmethod
+    def key(name: str, model: str, **configuration) -> str:
+        """
+        Identify an assistant by its name, model and configuration.
+
+        Args:
+            name (str): The name of the assistant.
+            model (str): The model of the assistant.
+            **configuration: The remaining parameters the assistant is created with.
+
+        Returns:
+            str: Hex digest identifying the assistant.
+        """
+        fields = json.dumps({"name": name, "model": model, **configuration}, sort_keys=True, default=str)
+        return hashlib.sha256(fields.encode()).hexdigest()
+
+    def get_or_create(self, name: str, model: str, create: Callable[[], str], **configuration) -> str:
+        """
+        Return the ID of an assistant, creating it if no process created it before.
+        The assistant is created without holding any lock. Should another process register the same assistant in
+        the meantime, its registration wins and the assistant created here is deleted.
+
+        Args:
+            name (str): The name of the assistant.
+            model (str): The model of the assistant.
+            create (Callable[[], str]): Function creating the assistant and returning its ID.
+            **configuration: The remaining parameters the assistant is created with.
+
+        Returns:
+            str: The ID of the assistant.
+        """
+        key = self.key(name, model, **configuration)
+        assistant_id = RegisteredAssistant.objects.filter(key=key).values_list("assistant_id", flat=True).first()
+        if assistant_id:
+            return assistant_id
+
+        assistant_id = create()
+        registered, created = RegisteredAssistant.objects.get_or_create(
+            key=key, defaults={"name": name, "model": model, "assistant_id": assistant_id}
+        )
+        if not created:
+            self._delete(assistant_id)
+        return registered.assistant_id
+
+    def forget(self, assistant_id: str) -> None:
+        """
+        Remove an assistant from the registry, so it is created again on next use.
+
+        Args:
+            assistant_id (str): The ID of the assistant.
+        """
+        RegisteredAssistant.objects.filter(assistant_id=assistant_id).delete()
+
+    def verify(self) -> list:
+        """
+        Check that every registered assistant still exists and forget those that were deleted.
+
+        Returns:
+            list: The IDs of the assistants that were forgotten.
+        """
+        missing = []
+        for assistant_id in RegisteredAssistant.objects.values_list("assistant_id", flat=True):
+            try:
+                (self.client or get_client()).beta.assistants.retrieve(assistant_id)
+            except openai.NotFoundError:
+                missing.append(assistant_id)
+                self.forget(assistant_id)
+        return missing
+
+    def _delete(self, assistant_id: str) -> None:
+        """
+        Delete an assistant that lost the race to be registered.
+        """
+        try:
+            (self.client or get_client()).beta.assistants.delete(assistant_id)
+        except openai.OpenAIError as e:
+            print(f"Error deleting duplicate assistant {assistant_id}: {e}")
+
+
+_default_registry = None
+
+
+def get_assistant_registry() -> AssistantRegistry:
+    """
+    Return the assistant registry of the current process, creating it on first use.
+
+    Returns:
+        AssistantRegistry: The shared registry instance.
+    """
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = AssistantRegistry()
+    return _default_registry
@@ -0,0 +1,124 @@
+from agents.tokenizer import count_tokens
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator
+import io
+import re
+
+
+# Paragraph breaks, line breaks and sentence ends
+SEGMENT_END = re.compile(r"\n\s*\n|\n|(?<=[.!?])\s+")
+WORD = re.compile(r"\S+\s*|\s+")
+
+READ_BLOCK_SIZE = 65536
+
+
+@dataclass
+class Chunk:
+    """
+    A piece of a source text, with its position in that text.
+    """
+    text: str
+    start: int
+    end: int
+    tokens: int
+
+
+def iter_segments(source, block_size: int = READ_BLOCK_SIZE) -> Iterator[tuple]:
+    """
+    Split a text into sentences and paragraphs while reading it block by block.
+    Only the segment currently being read is buffered; a run of text with no boundary at all is cut at the
+    last whitespace once it grows past one block.
+
+    Args:
+        source: The text, as a string or a text file object.
+        block_size (int): Number of characters read at a time.
+
+    Yields:
+        tuple: The text of each segment, trailing whitespace included, and its start offset in the source.
+    """
+    read = source.read if hasattr(source, "read") else io.StringIO(source).read
+    buffer, offset = "", 0
+
+    while True:
+        block = read(block_size)
+        buffer += block
+        last = 0
+        for match in SEGMENT_END.finditer(buffer):
+            # A boundary touching the end of the buffer may still grow with the next block
+            if block and match.end() == len(buffer):
+                break
+            yield buffer[last:match.end()], offset + last
+            last = match.end()
+
+        if not block:
+            if last < len(buffer):
+                yield buffer[last:], offset + last
+            return
+
+        if len(buffer) - last > block_size:
+            cut = buffer.rfind(" ", last) + 1 or len(buffer)
+            yield buffer[last:cut], offset + last
+            last = cut
+
+        offset += last
+        buffer = buffer[last:]
+
+
+def chunk_text(source, max_tokens: int = 512, overlap_tokens: int = 64,
+               count_tokens: Callable[[str], int] = count_tokens) -> Iterator[Chunk]:
+    """
+    Stream token-bounded, overlapping chunks out of a text, breaking between sentences and paragraphs.
+    Memory use is bounded by the chunk size, not by the size of the source.
+
+    Args:
+        source: The text, as a string or a text file object.
+        max_tokens (int): Maximum number of tokens of a chunk.
+        overlap_tokens (int): Maximum number of tokens a chunk repeats from the end of the previous one.
+        count_tokens (Callable[[str], int]): Function returning the token count of a text.
+
+    Yields:
+        Chunk: Each chunk with its offsets in the source.
+    """
+    window = deque()
+    window_tokens = 0
+    fresh = False
+
+    for text, start, tokens in _bounded_segments(iter_segments(source), max_tokens, count_tokens):
+        if window and window_tokens + tokens > max_tokens:
+            if fresh:
+                yield _join(window, window_tokens)
+                fresh = False
+            # Keep the tail of the chunk as the start of the next one
+            while window and (window_tokens > overlap_tokens or window_tokens + tokens > max_tokens):
+                window_tokens -= window.popleft()[2]
+
+        window.append((text, start, tokens))
+        window_tokens += tokens
+        fresh = fresh or bool(text.strip())
+
+    if window and fresh:
+        yield _join(window, window_tokens)
+
+
+def _bounded_segments(segments: Iterator[tuple], max_tokens: int, count_tokens: Callable[[str], int]) -> Iterator[tuple]:
+    """
+    Count the tokens of each segment, splitting segments longer than a chunk into words.
+    """
+    for text, start in segments:
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            yield text, start, tokens
+            continue
+
+        for match in WORD.finditer(text):
+            word, word_start = match.group(), start + match.start()
+            # A single token is at least one character long
+            for cut in range(0, len(word), max_tokens):
+                piece = word[cut:cut + max_tokens]
+                yield piece, word_start + cut, count_tokens(piece)
+
+
+def _join(window: deque, tokens: int) -> Chunk:
+    text = "".join(segment[0] for segment in window)
+    return Chunk(text=text, start=window[0][1], end=window[0][1] + len(text), tokens=tokens)
@@ -0,0 +1,85 @@
+from decouple import config
+import asyncio
+import httpx
+import importlib.util
+import openai
+import os
+import threading
+import weakref
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+# Async connections belong to the event loop that opened them, so each loop gets its own client
+_async_clients = weakref.WeakKeyDictionary()
+_async_pid = None
+
+
+def http2_available() -> bool:
+    """
+    Tell whether HTTP/2 can be used, which requires the optional h2 package.
+
+    Returns:
+        bool: True if h2 is installed.
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def connection_limits() -> httpx.Limits:
+    """
+    Build the connection pool limits of the OpenAI clients from the settings.
+
+    Returns:
+        httpx.Limits: The OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS and OPENAI_KEEPALIVE_EXPIRY
+            settings.
+    """
+    return httpx.Limits(
+        max_connections=config("OPENAI_MAX_CONNECTIONS", default=100, cast=int),
+        max_keepalive_connections=config("OPENAI_MAX_KEEPALIVE_CONNECTIONS", default=20, cast=int),
+        keepalive_expiry=config("OPENAI_KEEPALIVE_EXPIRY", default=30, cast=float)
+    )
+
+
+def get_client() -> openai.OpenAI:
+    """
+    Return the OpenAI client of the current process, creating it on first use.
+    The client keeps its connections alive between calls and is shared by every thread of the process. A forked
+    worker gets a client of its own instead of reusing the sockets of its parent.
+
+    Returns:
+        openai.OpenAI: The shared client.
+    """
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = openai.OpenAI(
+                api_key=config("OPENAI_API_KEY"),
+                http_client=openai.DefaultHttpxClient(limits=connection_limits(), http2=http2_available())
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """
+    Return the async OpenAI client of the running event loop, creating it on first use.
+    All coroutines of a loop share one connection pool, so hundreds of concurrent calls reuse a bounded number of
+    kept-alive connections.
+
+    Returns:
+        openai.AsyncOpenAI: The shared client of the running loop.
+    """
+    global _async_pid
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if _async_pid != os.getpid():
+            _async_clients.clear()
+            _async_pid = os.getpid()
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = openai.AsyncOpenAI(
+                api_key=config("OPENAI_API_KEY"),
+                http_client=openai.DefaultAsyncHttpxClient(limits=connection_limits(), http2=http2_available())
+            )
+        return client
@@ -0,0 +1,119 @@
+from dataclasses import dataclass, field
+import re
+
+
+# Context windows of the chat models, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Tokens added by the chat format around each message
+MESSAGE_OVERHEAD_TOKENS = 8
+
+# A truncated chunk shorter than this is dropped rather than included
+MIN_TRUNCATED_TOKENS = 32
+
+SENTENCE_END = re.compile(r"[.!?]\s|\n")
+
+
+@dataclass
+class PackedContext:
+    """
+    Context selected to fit a token budget.
+    """
+    text: str = ""
+    tokens: int = 0
+    budget: int = 0
+    documents: list = field(default_factory=list)
+    truncated: bool = False
+
+
+class ContextPacker:
+    """
+    Fill a token budget with ranked context documents, leaving room for the question and the answer.
+    Documents are taken in rank order; the last one that does not fit whole is cut at a sentence or word boundary.
+    """
+
+    def __init__(self, encoding, model: str, budget: int, answer_tokens: int, separator: str = "\n") -> None:
+        """
+        Args:
+            encoding: The tiktoken encoding used to measure text.
+            model (str): The chat model the context is for, which bounds the budget by its context window.
+            budget (int): Maximum number of context tokens.
+            answer_tokens (int): Tokens reserved for the answer.
+            separator (str): Text put between documents.
+        """
+        self.encoding = encoding
+        self.window = MODEL_CONTEXT_WINDOWS.get(model, min(MODEL_CONTEXT_WINDOWS.values()))
+        self.budget = budget
+        self.answer_tokens = answer_tokens
+        self.separator = separator
+
+    def available(self, prompt_text: str) -> int:
+        """
+        Number of context tokens that fit next to the rest of the prompt.
+
+        Args:
+            prompt_text (str): All prompt text other than the context: the question and any instructions.
+
+        Returns:
+            int: The number of tokens available for context.
+        """
+        prompt_tokens = len(self.encoding.encode_ordinary(prompt_text))
+        reserved = prompt_tokens + self.answer_tokens + 2 * MESSAGE_OVERHEAD_TOKENS
+        return max(0, min(self.budget, self.window - reserved))
+
+    def pack(self, prompt_text: str, documents: list) -> PackedContext:
+        """
+        Select as much of the ranked documents as fits the budget.
+
+        Args:
+            prompt_text (str): All prompt text other than the context: the question and any instructions.
+            documents (list): Context documents, most relevant first.
+
+        Returns:
+            PackedContext: The packed context text, the number of tokens it uses and the documents it includes.
+        """
+        budget = self.available(prompt_text)
+        packed = PackedContext(budget=budget)
+        separator_tokens = len(self.encoding.encode_ordinary(self.separator))
+        parts = []
+
+        for document in documents:
+            remaining = budget - packed.tokens - (separator_tokens if parts else 0)
+            if remaining <= 0:
+                break
+
+            tokens = self.encoding.encode_ordinary(document)
+            if len(tokens) > remaining:
+                document = self._truncate(tokens[:remaining])
+                tokens = self.encoding.encode_ordinary(document)
+                packed.truncated = True
+                if len(tokens) < MIN_TRUNCATED_TOKENS:
+                    break
+
+            packed.tokens += len(tokens) + (separator_tokens if parts else 0)
+            parts.append(document)
+            if packed.truncated:
+                break
+
+        packed.documents = parts
+        packed.text = self.separator.join(parts)
+        return packed
+
+    def _truncate(self, tokens: list) -> str:
+        """
+        Decode the leading tokens of a document and cut the text back to its last full sentence,
+        or last full word if that would lose more than half of it.
+        """
+        text = self.encoding.decode(tokens)
+        ends = [match.end() for match in SENTENCE_END.finditer(text)]
+        if ends and ends[-1] >= len(text) // 2:
+            return text[:ends[-1]].rstrip()
+
+        cut = text.rfind(" ")
+        return text[:cut] if cut > 0 else text
@@ -0,0 +1,169 @@
+from agents.local_store import connect
+from array import array
+from decouple import config
+import hashlib
+import os
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# SQLite caps the number of bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings shared by every process on the host.
+    Entries are keyed by a hash of the document text and the embedding model, so identical text is only ever
+    embedded once regardless of which company it belongs to. The least recently used entries are evicted once
+    the stored vectors exceed the configured size.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None) -> None:
+        """
+        Args:
+            path (str, optional): Location of the SQLite file. Defaults to the EMBEDDING_CACHE_PATH setting.
+            max_bytes (int, optional): Size of the stored vectors above which entries are evicted.
+                Defaults to the EMBEDDING_CACHE_MAX_BYTES setting.
+        """
+        self.path = path or config("EMBEDDING_CACHE_PATH", default="var/embedding_cache.sqlite3")
+        self.max_bytes = max_bytes or config("EMBEDDING_CACHE_MAX_BYTES", default=1024 ** 3, cast=int)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    @staticmethod
+    def key(document: str, model: str) -> str:
+        """
+        Compute the cache key of a document.
+
+        Args:
+            document (str): The document text.
+            model (str): The embedding model.
+
+        Returns:
+            str: Hex digest identifying the document and model.
+        """
+        return hashlib.sha256(f"{model}\0{document}".encode()).hexdigest()
+
+    def get_many(self, documents: list, model: str) -> dict:
+        """
+        Look up the embeddings of several documents at once.
+
+        Args:
+            documents (list): The documents to look up.
+            model (str): The embedding model.
+
+        Returns:
+            dict: Cached embeddings keyed by the position of their document in `documents`.
+        """
+        positions = {}
+        for position, doc in enumerate(documents):
+            positions.setdefault(self.key(doc, model), []).append(position)
+
+        found = {}
+        keys = list(positions)
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[start:start + QUERY_CHUNK_SIZE]
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = array("f", vector).tolist()
+
+            if found:
+                now = time.time()
+                connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+
+            hits = sum(len(positions[key]) for key in found)
+            self.hits += hits
+            self.misses += len(documents) - hits
+
+        return {position: vector for key, vector in found.items() for position in positions[key]}
+
+    def put_many(self, documents: list, embeddings: list, model: str) -> None:
+        """
+        Store the embeddings of several documents, evicting old entries if the cache grows too large.
+
+        Args:
+            documents (list): The embedded documents.
+            embeddings (list): The embeddings, in the same order as the documents.
+            model (str): The embedding model.
+        """
+        now = time.time()
+        rows = []
+        for doc, embedding in zip(documents, embeddings):
+            vector = array("f", embedding).tobytes()
+            rows.append((self.key(doc, model), model, vector, len(vector), now))
+
+        with self._lock:
+            connection = self._connect()
+            connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict(connection)
+
+    def stats(self) -> dict:
+        """
+        Report hit and miss counts of this process along with the size of the cache.
+
+        Returns:
+            dict: The "hits", "misses", "entries" and "bytes" of the cache.
+        """
+        with self._lock:
+            entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def _evict(self, connection) -> None:
+        """
+        Remove the least recently used entries until the cache is back under 90% of its size limit.
+        """
+        size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if size <= self.max_bytes:
+            return
+
+        excess = size - int(self.max_bytes * 0.9)
+        stale = []
+        for key, entry_size in connection.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            stale.append((key,))
+            excess -= entry_size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+
+    def _connect(self):
+        # SQLite connections must not be shared with forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = connect(self.path, SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+
+_default_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the embedding cache of the current process, creating it on first use.
+
+    Returns:
+        EmbeddingCache: The shared cache instance.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
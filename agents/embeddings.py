@@ -0,0 +1,217 @@
+from agents.clients import get_async_client, get_client
+from agents.rate_limit import BACKGROUND, TokenBucketLimiter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decouple import config
+from typing import Callable, Iterable, Iterator
+import asyncio
+import openai
+import random
+import time
+
+
+# Per-request limits of the OpenAI embeddings endpoint
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8191
+MAX_TOKENS_PER_REQUEST = 300000
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class EmbeddingBatcher:
+    """
+    Pack documents into as few embedding requests as the endpoint limits allow and send them concurrently.
+    Vectors are returned in input order; when a batch fails, only that batch is sent again.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], client=None, model: str = "text-embedding-ada-002",
+                 max_concurrency: int = None, max_inputs: int = MAX_INPUTS_PER_REQUEST,
+                 max_tokens: int = MAX_TOKENS_PER_REQUEST, max_retries: int = 3, backoff: float = 1.0,
+                 async_client: openai.AsyncOpenAI = None, limiter: TokenBucketLimiter = None,
+                 priority: str = BACKGROUND) -> None:
+        """
+        Args:
+            count_tokens (Callable[[str], int]): Function returning the token count of a document.
+            client (openai.OpenAI, optional): Client used by `embed`. Defaults to the shared client of the process.
+            model (str): Embedding model to use.
+            max_concurrency (int, optional): Number of requests in flight at once. Defaults to the
+                EMBEDDING_MAX_CONCURRENCY setting.
+            max_inputs (int): Maximum number of documents per request.
+            max_tokens (int): Maximum number of tokens summed across the documents of a request.
+            max_retries (int): How many times a failed batch is sent again before giving up.
+            backoff (float): Base delay in seconds between retry rounds, doubled every round.
+            async_client (openai.AsyncOpenAI, optional): Client used by `aembed`. Defaults to the shared client of
+                the running event loop.
+            limiter (TokenBucketLimiter, optional): Rate limiter every request waits for.
+            priority (str): Priority of the requests at the rate limiter, INTERACTIVE or BACKGROUND.
+        """
+        self.count_tokens = count_tokens
+        self.client = client or get_client()
+        self.async_client = async_client
+        self.limiter = limiter
+        self.priority = priority
+        self.model = model
+        self.max_concurrency = max_concurrency or config("EMBEDDING_MAX_CONCURRENCY", default=4, cast=int)
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def pack(self, documents: Iterable[str]) -> Iterator[list]:
+        """
+        Group documents into batches that respect the per-request input and token limits.
+
+        Args:
+            documents (Iterable[str]): The documents to be embedded.
+
+        Yields:
+            list: The input positions of the documents in each batch.
+        """
+        batch, batch_tokens = [], 0
+        for position, doc in enumerate(documents):
+            tokens = self.count_tokens(doc)
+            if tokens > MAX_TOKENS_PER_INPUT:
+                raise ValueError(f"Document {position} has {tokens} tokens, more than the "
+                                 f"{MAX_TOKENS_PER_INPUT} allowed per embedding input. Chunk it first.")
+
+            if batch and (len(batch) >= self.max_inputs or batch_tokens + tokens > self.max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+
+            batch.append(position)
+            batch_tokens += tokens
+
+        if batch:
+            yield batch
+
+    def embed(self, documents: Iterable[str]) -> list:
+        """
+        Create embeddings for all documents.
+
+        Args:
+            documents (Iterable[str]): The documents to be embedded.
+
+        Returns:
+            list: One embedding per document, in input order.
+        """
+        documents = list(documents)
+        embeddings = [None] * len(documents)
+        pending = list(self.pack(documents))
+
+        attempt = 0
+        while pending:
+            failed, last_error = [], None
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                futures = {
+                    executor.submit(self._embed_batch, [documents[i] for i in batch]): batch for batch in pending
+                }
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        vectors = future.result()
+                    except RETRYABLE_ERRORS as e:
+                        failed.append(batch)
+                        last_error = e
+                        continue
+
+                    for position, vector in zip(batch, vectors):
+                        embeddings[position] = vector
+
+            if failed:
+                attempt += 1
+                time.sleep(self._retry_delay(attempt, failed, last_error))
+
+            pending = failed
+
+        return embeddings
+
+    async def aembed(self, documents: Iterable[str]) -> list:
+        """
+        Create embeddings for all documents without blocking the event loop.
+
+        Args:
+            documents (Iterable[str]): The documents to be embedded.
+
+        Returns:
+            list: One embedding per document, in input order.
+        """
+        documents = list(documents)
+        embeddings = [None] * len(documents)
+        pending = list(self.pack(documents))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: list) -> list:
+            async with semaphore:
+                return await self._aembed_batch([documents[i] for i in batch])
+
+        attempt = 0
+        while pending:
+            failed, last_error = [], None
+            results = await asyncio.gather(*(embed_batch(batch) for batch in pending), return_exceptions=True)
+            for batch, result in zip(pending, results):
+                if isinstance(result, RETRYABLE_ERRORS):
+                    failed.append(batch)
+                    last_error = result
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+
+                for position, vector in zip(batch, result):
+                    embeddings[position] = vector
+
+            if failed:
+                attempt += 1
+                await asyncio.sleep(self._retry_delay(attempt, failed, last_error))
+
+            pending = failed
+
+        return embeddings
+
+    def _retry_delay(self, attempt: int, failed: list, last_error: Exception) -> float:
+        """
+        Return the delay before the next retry round, or raise the last error once retries are exhausted.
+        """
+        if attempt > self.max_retries:
+            raise last_error
+        print(f"{len(failed)} embedding batches failed ({last_error}), retrying...")
+        return self.backoff * 2 ** (attempt - 1) * (1 + random.random())
+
+    def _embed_batch(self, batch: list) -> list:
+        """
+        Send a single embeddings request.
+
+        Args:
+            batch (list): The documents of the batch.
+
+        Returns:
+            list: The embeddings of the batch, in the same order as the documents.
+        """
+        def create():
+            return self.client.embeddings.create(input=batch, model=self.model)
+
+        if self.limiter:
+            response = self.limiter.call(create, tokens=sum(map(self.count_tokens, batch)), priority=self.priority)
+            return self._vectors(response)
+        return self._vectors(create())
+
+    async def _aembed_batch(self, batch: list) -> list:
+        client = self.async_client or get_async_client()
+
+        def create():
+            return client.embeddings.create(input=batch, model=self.model)
+
+        if self.limiter:
+            response = await self.limiter.acall(create, tokens=sum(map(self.count_tokens, batch)),
+                                                priority=self.priority)
+            return self._vectors(response)
+        return self._vectors(await create())
+
+    @staticmethod
+    def _vectors(response) -> list:
+        # The endpoint tags each vector with the position of its input
+        data = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in data]
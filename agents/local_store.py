@@ -0,0 +1,23 @@
+from pathlib import Path
+import sqlite3
+
+
+def connect(path: str, schema: str = "") -> sqlite3.Connection:
+    """
+    Open a connection to a local SQLite store shared by all worker processes on the host.
+    The database is put in WAL mode so readers never block the single writer.
+
+    Args:
+        path (str): Location of the database file. Missing parent directories are created.
+        schema (str, optional): SQL script creating the tables of the store if they do not exist yet.
+
+    Returns:
+        sqlite3.Connection: An open connection in autocommit mode.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        connection.executescript(schema)
+    return connection
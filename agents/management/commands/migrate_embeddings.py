@@ -0,0 +1,16 @@
+from agents.models import RAGContext
+from agents.vector_store import migrate_embeddings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Move RAGContext embeddings from the legacy JSON column to float32 .npy files"
+
+    def handle(self, *args, **options):
+        migrated = 0
+        for rag_context in RAGContext.objects.exclude(embeddings=[]).iterator(chunk_size=10):
+            matrix = migrate_embeddings(rag_context)
+            migrated += 1
+            self.stdout.write(f"Migrated RAG context {rag_context.pk} ({matrix.shape[0]} embeddings)")
+
+        self.stdout.write(self.style.SUCCESS(f"Migrated {migrated} RAG contexts"))
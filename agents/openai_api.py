@@ -1,8 +1,45 @@
+from agents.answer_cache import get_answer_cache
+from agents.assistants import ASSISTANT_ROLES, get_assistant_registry
+from agents.chunker import chunk_text
+from agents.clients import get_async_client, get_client
+from agents.context_packer import ContextPacker, PackedContext
+from agents.embedding_cache import get_embedding_cache
+from agents.embeddings import EmbeddingBatcher
 from agents.models import LLM, RAGContext
+from agents.prompts import (CHUNK_SUMMARY_PROMPT, COMBINE_PROMPT, PARTIAL_SUMMARY_SEPARATOR, RETRY_PROMPT,
+                            SUMMARY_PROMPT, VERIFICATION_PROMPT)
+from agents.rate_limit import BACKGROUND, INTERACTIVE, RateLimiter, get_rate_limiter
+from agents.retrieval import top_k
+from agents.runs import RunWaiter
+from agents.singleflight import AsyncSingleFlight, SingleFlight, embedding_bucket, normalize_question
+from agents.summary_cache import get_summary_cache
+from agents.summary_checks import AMBIGUOUS, PASS, check_summary
+from agents.tokenizer import count_tokens, count_tokens_batch, get_encoding
+from agents.vector_store import append_embeddings, embeddings_version, load_embeddings, load_index, update_index
+from asgiref.sync import sync_to_async
 from companies.models import Company
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decouple import config
-import openai
-import tiktoken
+from django.db import transaction
+from itertools import islice
+from typing import AsyncIterator, Iterator
+import asyncio
+import numpy as np
+
+# Identical questions in flight at the same time share one call
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+
+# Tokens an assistant reply is expected to use, counted against the rate limit before the run starts
+ASSISTANT_REPLY_TOKENS = 512
+
+# First message of threads created without one
+DEFAULT_THREAD_MESSAGES = [
+    {
+        "role": "user",
+        "content": "This is a new thread to start managing summaries."
+    }
+]
 
 
 class LLMFactory:
@@ -19,81 +56,522 @@ class LLMFactory:
             company_name (str): Name of Company that will be associated with LLM
             model (str): OpenAI GPT model to use
         """
-        # Load the OpenAI API key from the .env file using decouple.config().
+        # Load the OpenAI API key from the .env file using decouple.config(). The shared clients read it too.
         self.api_key: str = config('OPENAI_API_KEY')
-        openai.api_key = self.api_key
         self.company_name = company_name
         self.model = model
+        self.last_context: PackedContext = None
 
-    def generate_response(self, prompt: str, use_context: bool = True) -> str:
+    def generate_response(self, prompt: str, use_context: bool = True, num_documents: int = 5,
+                          context_tokens: int = None, answer_tokens: int = None, use_cache: bool = True) -> str:
         """
         Generate a response using the chat-based language model for a given prompt.
+        The retrieved context is packed into a token budget, so the cost of a request stays bounded however many
+        documents match. The packed context is kept in `last_context`.
+        Answers generated with context are cached: a question similar enough to one already answered about the
+        same version of the company's context gets the same answer without calling the model.
+        Concurrent calls asking the same question, after normalization, share a single call; so do concurrent
+        questions whose embeddings fall in the same bucket and are as similar as an answer cache hit.
 
         Args:
             prompt (str): The prompt to be passed to the model.
             use_context (bool): Whether to use the RAG context associated with the company. Defaults to True.
+            num_documents (int): Number of context documents most relevant to the prompt to include. Defaults to 5.
+            context_tokens (int, optional): Maximum number of context tokens. Defaults to the
+                CONTEXT_TOKEN_BUDGET setting.
+            answer_tokens (int, optional): Maximum number of tokens of the answer. Defaults to the
+                ANSWER_TOKEN_BUDGET setting.
+            use_cache (bool): Whether to look up and store the answer in the answer cache. Defaults to True.
 
         Returns:
             str: The response from the model.
         """
-        messages = [
-            {"role": "user", "content": prompt}
-        ]
+        answer_tokens = answer_tokens or config("ANSWER_TOKEN_BUDGET", default=1024, cast=int)
+        options = (use_context, num_documents, context_tokens, answer_tokens, use_cache)
+        return _flights.do(
+            ("question", self.company_name, self.model, normalize_question(prompt), options),
+            lambda: self._generate_response(prompt, *options)
+        )
+
+    def _generate_response(self, prompt: str, use_context: bool, num_documents: int, context_tokens: int,
+                           answer_tokens: int, use_cache: bool) -> str:
+        """
+        Generate the response to a prompt on behalf of every caller coalesced with it.
+        """
+        messages, cache_key, answer = self._prepare_messages(prompt, use_context, num_documents, context_tokens,
+                                                             answer_tokens, use_cache)
+        if answer is not None:
+            return answer
+
+        def complete() -> str:
+            # Answers to users go ahead of background embedding and summarization
+            response = get_rate_limiter(self.model).call(
+                lambda: get_client().chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=answer_tokens
+                ),
+                tokens=self._request_tokens(messages, answer_tokens),
+                priority=INTERACTIVE
+            )
+            return response.choices[0].message.content.strip()
+
+        if not cache_key:
+            return complete()
+
+        led = []
+
+        def lead() -> tuple:
+            led.append(True)
+            return complete(), cache_key[3]
+
+        key = self._bucket_key(cache_key, num_documents, context_tokens, answer_tokens)
+        answer, leader_query = _flights.do(key, lead)
+        if led:
+            return self._store_answer(cache_key, prompt, answer)
+        if self._shares_answer(leader_query, cache_key[3]):
+            # Borrowed answers are not cached under the question that borrowed them
+            return answer
+        return self._store_answer(cache_key, prompt, complete())
+
+    async def agenerate_response(self, prompt: str, use_context: bool = True, num_documents: int = 5,
+                                 context_tokens: int = None, answer_tokens: int = None, use_cache: bool = True) -> str:
+        """
+        Asynchronous version of `generate_response`, for use on an event loop.
+        """
+        answer_tokens = answer_tokens or config("ANSWER_TOKEN_BUDGET", default=1024, cast=int)
+        options = (use_context, num_documents, context_tokens, answer_tokens, use_cache)
+        return await _async_flights.do(
+            ("question", self.company_name, self.model, normalize_question(prompt), options),
+            lambda: self._agenerate_response(prompt, *options)
+        )
+
+    async def _agenerate_response(self, prompt: str, use_context: bool, num_documents: int, context_tokens: int,
+                                  answer_tokens: int, use_cache: bool) -> str:
+        messages, cache_key, answer = await self._aprepare_messages(prompt, use_context, num_documents,
+                                                                    context_tokens, answer_tokens, use_cache)
+        if answer is not None:
+            return answer
+
+        async def complete() -> str:
+            response = await get_rate_limiter(self.model).acall(
+                lambda: get_async_client().chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=answer_tokens
+                ),
+                tokens=self._request_tokens(messages, answer_tokens),
+                priority=INTERACTIVE
+            )
+            return response.choices[0].message.content.strip()
+
+        if not cache_key:
+            return await complete()
+
+        led = []
+
+        async def lead() -> tuple:
+            led.append(True)
+            return await complete(), cache_key[3]
 
+        key = self._bucket_key(cache_key, num_documents, context_tokens, answer_tokens)
+        answer, leader_query = await _async_flights.do(key, lead)
+        if led:
+            return self._store_answer(cache_key, prompt, answer)
+        if self._shares_answer(leader_query, cache_key[3]):
+            return answer
+        return self._store_answer(cache_key, prompt, await complete())
+
+    def stream_response(self, prompt: str, use_context: bool = True, num_documents: int = 5,
+                        context_tokens: int = None, answer_tokens: int = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Generate a response like `generate_response`, yielding the text of the answer as the model produces it.
+        A cached answer is yielded whole. The complete answer is stored in the answer cache once the stream ends.
+        Streamed calls are not coalesced, since each caller shows the answer as it arrives.
+
+        Args:
+            prompt (str): The prompt to be passed to the model.
+            use_context (bool): Whether to use the RAG context associated with the company. Defaults to True.
+            num_documents (int): Number of context documents most relevant to the prompt to include. Defaults to 5.
+            context_tokens (int, optional): Maximum number of context tokens. Defaults to the
+                CONTEXT_TOKEN_BUDGET setting.
+            answer_tokens (int, optional): Maximum number of tokens of the answer. Defaults to the
+                ANSWER_TOKEN_BUDGET setting.
+            use_cache (bool): Whether to look up and store the answer in the answer cache. Defaults to True.
+
+        Yields:
+            str: The successive pieces of the answer.
+        """
+        answer_tokens = answer_tokens or config("ANSWER_TOKEN_BUDGET", default=1024, cast=int)
+        messages, cache_key, answer = self._prepare_messages(prompt, use_context, num_documents, context_tokens,
+                                                             answer_tokens, use_cache)
+        if answer is not None:
+            yield answer
+            return
+
+        stream = get_rate_limiter(self.model).call(
+            lambda: get_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=answer_tokens,
+                stream=True
+            ),
+            tokens=self._request_tokens(messages, answer_tokens),
+            priority=INTERACTIVE
+        )
+        parts = []
+        for chunk in stream:
+            if delta := self._delta(chunk):
+                parts.append(delta)
+                yield delta
+        self._store_answer(cache_key, prompt, "".join(parts).strip())
+
+    async def astream_response(self, prompt: str, use_context: bool = True, num_documents: int = 5,
+                               context_tokens: int = None, answer_tokens: int = None,
+                               use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Asynchronous version of `stream_response`, for use on an event loop.
+        """
+        answer_tokens = answer_tokens or config("ANSWER_TOKEN_BUDGET", default=1024, cast=int)
+        messages, cache_key, answer = await self._aprepare_messages(prompt, use_context, num_documents,
+                                                                    context_tokens, answer_tokens, use_cache)
+        if answer is not None:
+            yield answer
+            return
+
+        stream = await get_rate_limiter(self.model).acall(
+            lambda: get_async_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=answer_tokens,
+                stream=True
+            ),
+            tokens=self._request_tokens(messages, answer_tokens),
+            priority=INTERACTIVE
+        )
+        parts = []
+        async for chunk in stream:
+            if delta := self._delta(chunk):
+                parts.append(delta)
+                yield delta
+        self._store_answer(cache_key, prompt, "".join(parts).strip())
+
+    @staticmethod
+    def _delta(chunk) -> str:
+        """
+        Text carried by one chunk of a streamed completion, if any.
+        """
+        return chunk.choices[0].delta.content if chunk.choices else None
+
+    def _prepare_messages(self, prompt: str, use_context: bool, num_documents: int, context_tokens: int,
+                          answer_tokens: int, use_cache: bool) -> tuple:
+        """
+        Retrieve the context of a prompt and build its chat messages, unless the answer cache already holds an
+        answer to it.
+
+        Returns:
+            tuple: The messages, the answer cache key (None when the cache is not used) and the cached answer.
+        """
+        context_documents, cache_key = None, None
         if use_context:
             # Load the RAG context from the model using the Company FK
             rag_context = self._get_rag_context()
-            context_documents = []
-            context_content = "\n".join(context_documents)
-            messages.insert(0,
-                            {"role": "system", "content": f"Here is some context about the company: {context_content}"})
+            query = None
+            # A context without embeddings has nothing to retrieve, so its questions are neither embedded nor cached
+            if use_cache and load_embeddings(rag_context).shape[0]:
+                query = self.create_text_embeddings([prompt], priority=INTERACTIVE)[0]
+                cache_key = (self.company_name, self.model, embeddings_version(rag_context), query)
+                answer = self._cached_answer(cache_key)
+                if answer is not None:
+                    return None, cache_key, answer
+            context_documents = self.retrieve_context(prompt, rag_context, k=num_documents, query=query)
+        return self._build_messages(prompt, context_documents, context_tokens, answer_tokens), cache_key, None
 
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=messages
-        )
-        
-        return response['choices'][0]['message']['content'].strip()
+    async def _aprepare_messages(self, prompt: str, use_context: bool, num_documents: int, context_tokens: int,
+                                 answer_tokens: int, use_cache: bool) -> tuple:
+        context_documents, cache_key = None, None
+        if use_context:
+            rag_context = await sync_to_async(self._get_rag_context)()
+            query = None
+            if use_cache and (await sync_to_async(load_embeddings)(rag_context)).shape[0]:
+                query = (await self.acreate_text_embeddings([prompt], priority=INTERACTIVE))[0]
+                version = await asyncio.to_thread(embeddings_version, rag_context)
+                cache_key = (self.company_name, self.model, version, query)
+                answer = self._cached_answer(cache_key)
+                if answer is not None:
+                    return None, cache_key, answer
+            context_documents = await self.aretrieve_context(prompt, rag_context, k=num_documents, query=query)
+        return self._build_messages(prompt, context_documents, context_tokens, answer_tokens), cache_key, None
+
+    @staticmethod
+    def _bucket_key(cache_key: tuple, *options) -> tuple:
+        """
+        Coalescing key of questions whose embeddings fall in the same bucket, for the same context version.
+        """
+        company, model, version, query = cache_key
+        return ("embedding", company, model, version, embedding_bucket(query), options)
+
+    @staticmethod
+    def _shares_answer(leader_query: list, query: list) -> bool:
+        """
+        Whether a question coalesced by bucket is close enough to the one answered to share its answer: buckets
+        also hold merely related questions, so only those as similar as an answer cache hit get the answer.
+        """
+        leader_query = np.asarray(leader_query, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        norms = np.linalg.norm(leader_query) * np.linalg.norm(query)
+        return bool(norms) and float(leader_query @ query) / norms >= get_answer_cache().threshold
+
+    def _cached_answer(self, cache_key: tuple) -> str:
+        """
+        Look up the answer cache with a (company, model, context version, question embedding) key.
+        """
+        answer = get_answer_cache().get(*cache_key)
+        if answer is not None:
+            # No context was packed for this answer
+            self.last_context = None
+        return answer
+
+    @staticmethod
+    def _store_answer(cache_key: tuple, prompt: str, answer: str) -> str:
+        if cache_key:
+            get_answer_cache().put(*cache_key, answer, question=prompt)
+        return answer
+
+    @staticmethod
+    def _request_tokens(messages: list, answer_tokens: int) -> int:
+        """
+        Estimate the tokens a chat request counts against the rate limit: its messages and its answer budget.
+        """
+        return sum(LLMFactory.get_token_count(message["content"]) for message in messages) + answer_tokens
+
+    def _build_messages(self, prompt: str, context_documents: list = None, context_tokens: int = None,
+                        answer_tokens: int = None) -> list:
+        """
+        Build the chat messages of a prompt, with the context documents that fit the token budget as the system
+        message. The packed context is kept in `last_context`.
+        """
+        messages = [
+            {"role": "user", "content": prompt}
+        ]
+        if context_documents is not None:
+            packer = ContextPacker(
+                encoding=get_encoding("gpt-4"),
+                model=self.model,
+                budget=context_tokens or config("CONTEXT_TOKEN_BUDGET", default=3000, cast=int),
+                answer_tokens=answer_tokens
+            )
+            instructions = "Here is some context about the company: "
+            self.last_context = packer.pack(instructions + prompt, context_documents)
+            messages.insert(0, {"role": "system", "content": instructions + self.last_context.text})
+        return messages
+
+    def retrieve_context(self, question: str, rag_context: RAGContext, k: int = 5, query: list = None) -> list:
+        """
+        Retrieve the documents of a RAG context most relevant to a question.
+        The question is embedded once and scored against the embedding matrix of the context, through its
+        approximate nearest-neighbour index when the context is large enough to have one.
+
+        Args:
+            question (str): The question to find context for.
+            rag_context (RAGContext): The RAG context to search.
+            k (int): Maximum number of documents to return. Defaults to 5.
+            query (list, optional): The embedding of the question, if it was already computed.
+
+        Returns:
+            list: The content of the best matching documents, most relevant first.
+        """
+        matrix = load_embeddings(rag_context)
+        if matrix.shape[0] == 0:
+            return []
+
+        if query is None:
+            query = self.create_text_embeddings([question], priority=INTERACTIVE)[0]
+        return self._search(rag_context, matrix, query, k)
+
+    async def aretrieve_context(self, question: str, rag_context: RAGContext, k: int = 5, query: list = None) -> list:
+        """
+        Asynchronous version of `retrieve_context`, for use on an event loop.
+        """
+        # A context without an embedding file falls back to its deferred JSON column, which is a database query
+        matrix = await sync_to_async(load_embeddings)(rag_context)
+        if matrix.shape[0] == 0:
+            return []
+
+        if query is None:
+            query = (await self.acreate_text_embeddings([question], priority=INTERACTIVE))[0]
+        # The index is read from its file and the matrix paged in from disk
+        return await asyncio.to_thread(self._search, rag_context, matrix, query, k)
+
+    @staticmethod
+    def _search(rag_context: RAGContext, matrix: np.ndarray, query: list, k: int) -> list:
+        """
+        Return the content of the `k` documents whose embeddings are closest to the query.
+        """
+        # Embeddings are published before their documents are saved, rows past the documents are not visible yet
+        matrix = matrix[:len(rag_context.documents)]
+        index = load_index(rag_context)
+        if index is not None and len(index) == matrix.shape[0]:
+            indices, _ = index.search(matrix, query, k)
+        else:
+            indices, _ = top_k(matrix, query, k)
+        return [rag_context.documents[i]["content"] for i in indices]
 
     @staticmethod
-    def create_text_embeddings(documents: list) -> list:
+    def create_text_embeddings(documents: list, model: str = "text-embedding-ada-002",
+                               max_concurrency: int = None, use_cache: bool = True,
+                               priority: str = BACKGROUND) -> list:
         """
         Create text embeddings for the provided documents using OpenAI's updated embeddings utility.
+        Documents already in the embedding cache are not sent again; the rest are packed into batched requests
+        which are sent concurrently.
 
         Args:
             documents (list): A list of documents to be embedded.
+            model (str): The embedding model to use. Defaults to "text-embedding-ada-002".
+            max_concurrency (int, optional): Number of embedding requests in flight at once.
+            use_cache (bool): Whether to read and fill the embedding cache. Defaults to True.
+            priority (str): Priority of the requests at the rate limiter: INTERACTIVE for a question being
+                answered, BACKGROUND (the default) for ingestion.
 
         Returns:
-            list: A list of embeddings for the documents.
+            list: A list of embeddings for the documents, in the same order as the documents.
         """
-        embeddings = []
-        for doc in documents:
-            response = openai.embeddings.create(input=doc, model="text-embedding-ada-002")
-            embeddings.append(response.data[0].embedding)
-        return embeddings
+        documents = list(documents)
+        cache = get_embedding_cache() if use_cache else None
+        embeddings, missing = LLMFactory._cached_embeddings(documents, model, cache)
+        if missing:
+            batcher = EmbeddingBatcher(
+                count_tokens=LLMFactory.get_token_count,
+                client=get_client(),
+                model=model,
+                max_concurrency=max_concurrency,
+                limiter=get_rate_limiter(model),
+                priority=priority
+            )
+            LLMFactory._store_embeddings(documents, embeddings, missing, batcher.embed(missing), model, cache)
+        return [embeddings[position] for position in range(len(documents))]
+
+    @staticmethod
+    async def acreate_text_embeddings(documents: list, model: str = "text-embedding-ada-002",
+                                      max_concurrency: int = None, use_cache: bool = True,
+                                      priority: str = BACKGROUND) -> list:
+        """
+        Asynchronous version of `create_text_embeddings`, for use on an event loop.
+        """
+        documents = list(documents)
+        cache = get_embedding_cache() if use_cache else None
+        # The cache is a SQLite file, read and written in a worker thread
+        embeddings, missing = await asyncio.to_thread(LLMFactory._cached_embeddings, documents, model, cache)
+        if missing:
+            batcher = EmbeddingBatcher(
+                count_tokens=LLMFactory.get_token_count,
+                client=get_client(),
+                model=model,
+                max_concurrency=max_concurrency,
+                async_client=get_async_client(),
+                limiter=get_rate_limiter(model),
+                priority=priority
+            )
+            vectors = await batcher.aembed(missing)
+            await asyncio.to_thread(LLMFactory._store_embeddings, documents, embeddings, missing, vectors, model,
+                                    cache)
+        return [embeddings[position] for position in range(len(documents))]
 
-    def save_rag_context_to_model(self, context_name: str, context_documents: list) -> None:
+    @staticmethod
+    def _cached_embeddings(documents: list, model: str, cache) -> tuple:
+        """
+        Look up the cached embeddings of documents.
+
+        Returns:
+            tuple: Cached embeddings keyed by position, and the distinct documents that still need embedding.
+        """
+        embeddings = cache.get_many(documents, model) if cache else {}
+        # Embed each distinct missing document only once
+        missing = list(dict.fromkeys(doc for position, doc in enumerate(documents) if position not in embeddings))
+        return embeddings, missing
+
+    @staticmethod
+    def _store_embeddings(documents: list, embeddings: dict, missing: list, vectors: list, model: str,
+                          cache) -> None:
+        """
+        Fill the embeddings of the missing documents in, caching them.
+        """
+        created = dict(zip(missing, vectors))
+        if cache:
+            cache.put_many(missing, vectors, model)
+        for position, doc in enumerate(documents):
+            embeddings.setdefault(position, created.get(doc))
+
+    def save_rag_context_to_model(self, context_name: str, context_documents: list, max_tokens: int = None,
+                                  overlap_tokens: int = None, batch_size: int = None) -> None:
         """
         Save the RAG context to the Django model (RAGContext).
+        Each input is streamed through the chunker and stored as overlapping, token-bounded documents that record
+        their position in the input. Documents are appended to the company's context of the same name if it
+        already exists. Embeddings are stored as a float32 matrix next to the database rather than in the JSON
+        column, and the approximate nearest-neighbour index of the context is updated with the new rows.
+        Documents are embedded and appended `batch_size` at a time, so only one batch of embeddings is held in
+        memory however large the inputs are.
 
         Args:
             context_name (str): The name of the RAG context.
-            context_documents (list): A list of documents to be used as context.
-        """
-        embeddings = self.create_text_embeddings(context_documents)
-        rag_context = RAGContext.objects.create(
-            name=context_name,
-            documents=[
-                {
-                    "content": doc,
-                    "summary": "",
-                    "published": ""
-                } for doc in context_documents
-            ],
-            embeddings=embeddings,
-            llm=self._get_llm()
+            context_documents (list): A list of documents to be used as context, as strings or text file objects.
+            max_tokens (int, optional): Maximum number of tokens per stored document. Defaults to the
+                CHUNK_MAX_TOKENS setting.
+            overlap_tokens (int, optional): Number of tokens repeated between consecutive documents of an input.
+                Defaults to the CHUNK_OVERLAP_TOKENS setting.
+            batch_size (int, optional): Number of documents embedded and appended at a time. Defaults to the
+                CHUNK_BATCH_SIZE setting.
+        """
+        max_tokens = max_tokens or config("CHUNK_MAX_TOKENS", default=512, cast=int)
+        overlap_tokens = overlap_tokens or config("CHUNK_OVERLAP_TOKENS", default=64, cast=int)
+        batch_size = batch_size or config("CHUNK_BATCH_SIZE", default=256, cast=int)
+        chunks = (
+            (source, chunk)
+            for source, doc in enumerate(context_documents)
+            for chunk in chunk_text(doc, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
         )
-        rag_context.save()
+        llm, rag_context, matrix = None, None, None
+        while batch := list(islice(chunks, batch_size)):
+            embeddings = self.create_text_embeddings(chunk.text for _, chunk in batch)
+            llm = llm or self._get_llm()
+
+            # The row lock orders concurrent writers of the context, so none of them loses the documents of another
+            with transaction.atomic():
+                rag_context, _ = RAGContext.objects.select_for_update().get_or_create(
+                    name=context_name,
+                    llm=llm,
+                    defaults={"documents": [], "embeddings": []}
+                )
+                start = len(rag_context.documents)
+                # Embeddings are published before the documents are saved: if either fails, no stored document is
+                # left without its embedding, and the next append overwrites the rows past the stored documents
+                matrix = append_embeddings(rag_context, embeddings, start)
+                rag_context.documents.extend(
+                    {
+                        "content": chunk.text,
+                        "summary": "",
+                        "published": "",
+                        "source": {"index": source, "start": chunk.start, "end": chunk.end}
+                    } for source, chunk in batch
+                )
+                rag_context.save(update_fields=["documents"])
+
+        if rag_context is None:
+            return
+        update_index(rag_context, matrix)
+        # Other processes notice the new embeddings version on their own
+        get_answer_cache().invalidate(self.company_name)
+
+    def add_to_rag_context(self, context_documents: list) -> None:
+        """
+        Add documents to the company's RAG context, the one questions are answered from.
+
+        Args:
+            context_documents (list): A list of documents to be used as context, as strings or text file objects.
+        """
+        self.save_rag_context_to_model(self._get_rag_context().name, context_documents)
 
     def _get_llm(self) -> LLM:
         """
@@ -119,7 +597,8 @@ class LLMFactory:
             RAGContext: The RAGContext instance associated with the specified company.
         """
         llm = self._get_llm()
-        rag_context, _ = RAGContext.objects.get_or_create(llm=llm)
+        # Embeddings are read from the shared matrix files, never parsed from the legacy JSON column
+        rag_context, _ = RAGContext.objects.defer("embeddings").get_or_create(llm=llm)
         return rag_context
 
     @staticmethod
@@ -133,16 +612,18 @@ class LLMFactory:
         Returns:
             dict: The created thread details.
         """
-        response = openai.beta.threads.create(
-            messages=messages or [
-                {
-                    "role": "user",
-                    "content": "This is a new thread to start managing summaries."
-                }
-            ],
+        response = get_client().beta.threads.create(
+            messages=messages or DEFAULT_THREAD_MESSAGES,
         )
         return response
 
+    @staticmethod
+    async def acreate_thread(messages: list = None) -> dict:
+        """
+        Asynchronous version of `create_thread`, for use on an event loop.
+        """
+        return await get_async_client().beta.threads.create(messages=messages or DEFAULT_THREAD_MESSAGES)
+
     def create_assistant(self, name: str, description: str = None, tools: list = None,
                          tool_resources: dict = None) -> dict:
         """
@@ -157,14 +638,62 @@ class LLMFactory:
         Returns:
             dict: The created assistant details.
         """
-        response = openai.beta.assistants.create(
+        response = get_client().beta.assistants.create(
+            **self._assistant_parameters(name, description, tools, tool_resources)
+        )
+        return response
+
+    async def acreate_assistant(self, name: str, description: str = None, tools: list = None,
+                                tool_resources: dict = None) -> dict:
+        """
+        Asynchronous version of `create_assistant`, for use on an event loop.
+        """
+        return await get_async_client().beta.assistants.create(
+            **self._assistant_parameters(name, description, tools, tool_resources)
+        )
+
+    def _assistant_parameters(self, name: str, description: str = None, tools: list = None,
+                              tool_resources: dict = None) -> dict:
+        return {
+            "name": name,
+            "description": description or "An assistant focused on summarizing and verifying document information",
+            "model": self.model,
+            "tools": tools or [{"type": "code_interpreter"}],
+            "tool_resources": tool_resources or {}
+        }
+
+    def get_assistant(self, name: str, description: str = None, tools: list = None,
+                      tool_resources: dict = None) -> str:
+        """
+        Return the ID of an assistant with the given configuration, creating it only if it is not registered yet.
+        The registry is shared by all worker processes, so each assistant is created once per model and
+        configuration instead of once per call.
+
+        Args:
+            name (str): The name of the assistant.
+            description (str, optional): A brief description of the assistant. Defaults to None.
+            tools (list, optional): A list of tools for the assistant. Defaults to a code interpreter tool.
+            tool_resources (dict, optional): Resources for the tools. Defaults to None.
+
+        Returns:
+            str: The ID of the assistant.
+        """
+        return get_assistant_registry().get_or_create(
             name=name,
-            description=description or "An assistant focused on summarizing and verifying document information",
             model=self.model,
-            tools=tools or [{"type": "code_interpreter"}],
-            tool_resources=tool_resources or {}
+            create=lambda: self.create_assistant(name, description, tools, tool_resources).id,
+            description=description,
+            tools=tools,
+            tool_resources=tool_resources
         )
-        return response
+
+    async def aget_assistant(self, name: str, description: str = None, tools: list = None,
+                             tool_resources: dict = None) -> str:
+        """
+        Asynchronous version of `get_assistant`, for use on an event loop. The registry is read, and the assistant
+        created if needed, in a worker thread.
+        """
+        return await asyncio.to_thread(self.get_assistant, name, description, tools, tool_resources)
 
     @staticmethod
     def run(thread_id: str, assistant_id: str) -> dict:
@@ -178,17 +707,25 @@ class LLMFactory:
         Returns:
             dict: The response from the assistant.
         """
-        response = openai.beta.threads.runs.create(
+        response = get_client().beta.threads.runs.create(
             thread_id=thread_id,
             assistant_id=assistant_id,
         )
 
         return response
 
+    @staticmethod
+    async def arun(thread_id: str, assistant_id: str) -> dict:
+        """
+        Asynchronous version of `run`, for use on an event loop.
+        """
+        return await get_async_client().beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+
     @staticmethod
     def get_token_count(document: str) -> int:
         """
         Get the token count of a given document.
+        The gpt-4 encoding is built once per process and reused by every call.
 
         Args:
             document (str): The document for which to count tokens.
@@ -196,87 +733,469 @@ class LLMFactory:
         Returns:
             int: The number of tokens in the document.
         """
-        encoding = tiktoken.encoding_for_model("gpt-4")
-        tokens = encoding.encode(document)
-        return len(tokens)
+        return count_tokens(document, "gpt-4")
+
+    @staticmethod
+    def get_token_counts(documents: list) -> np.ndarray:
+        """
+        Get the token counts of many documents at once, encoded in parallel.
+
+        Args:
+            documents (list): The documents for which to count tokens.
+
+        Returns:
+            np.ndarray: The number of tokens in each document.
+        """
+        return count_tokens_batch(documents, "gpt-4")
 
     @staticmethod
-    def wait_for_complete_status(run) -> None:
+    def wait_for_complete_status(run, timeout: float = None):
         """
+        Poll a run with exponential backoff until it completes.
+
         Args:
             run (Run): An instance that contains metadata of a thread that has been processed by the assistants
+            timeout (float, optional): Seconds to wait before cancelling the run. Defaults to the RUN_TIMEOUT setting.
+
+        Returns:
+            Run: The completed run.
+
+        Raises:
+            RunError: If the run failed, was cancelled, expired or did not finish in time.
         """
-        while run.status != 'completed':
-            run = openai.beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+        return RunWaiter(timeout=timeout).poll(run)
 
-    def summarize_document(self, document: dict) -> dict:
+    @staticmethod
+    async def await_for_complete_status(run, timeout: float = None):
         """
-        Summarize the document content by creating a summarizer and a verifier assistant to ensure quality.
-        The summarization is repeated until the verification passes. Messages are added to the existing thread for verification.
+        Asynchronous version of `wait_for_complete_status`, for use on an event loop.
+        """
+        return await RunWaiter(timeout=timeout).apoll(run)
+
+    @staticmethod
+    def run_to_completion(thread_id: str, assistant_id: str, stream: bool = True, timeout: float = None):
+        """
+        Run the given assistant within the specified thread and wait until the run completes.
+
+        Args:
+            thread_id (str): The ID of the thread to which the assistant belongs.
+            assistant_id (str): The ID of the assistant to use.
+            stream (bool): Follow the run's event stream instead of polling it. Defaults to True.
+            timeout (float, optional): Seconds to wait before cancelling the run. Defaults to the RUN_TIMEOUT setting.
+
+        Returns:
+            Run: The completed run.
+
+        Raises:
+            RunError: If the run failed, was cancelled, expired or did not finish in time.
+        """
+        waiter = RunWaiter(timeout=timeout)
+        if stream:
+            return waiter.stream(thread_id=thread_id, assistant_id=assistant_id)
+        return waiter.poll(LLMFactory.run(thread_id=thread_id, assistant_id=assistant_id))
+
+    @staticmethod
+    async def arun_to_completion(thread_id: str, assistant_id: str, timeout: float = None):
+        """
+        Asynchronous version of `run_to_completion`, for use on an event loop. The run is polled, so thousands of
+        runs can be awaited at once without holding a stream open for each.
+        """
+        run = await LLMFactory.arun(thread_id=thread_id, assistant_id=assistant_id)
+        return await LLMFactory.await_for_complete_status(run, timeout=timeout)
+
+    def summarize_document(self, document: dict, chunk_tokens: int = None, max_concurrency: int = None,
+                           max_attempts: int = None, use_cache: bool = True) -> dict:
+        """
+        Summarize the document content using a summarizer and a verifier assistant to ensure quality.
+        Each summary is first checked locally for coverage of the content's key terms; the verifier assistant is
+        only asked when that check is inconclusive. A rejected summary is retried at most `max_attempts` times,
+        each time with a fresh prompt naming what the previous attempt missed. If no attempt passes, the summary
+        with the best coverage is kept.
+        Content longer than `chunk_tokens` is first reduced map-reduce style (see `reduce_content`), so the final
+        summary and its verification only see the partial summaries, never the full raw text.
+        Verified summaries are cached by content, model and prompt version, so identical content is only
+        summarized once.
 
         Args:
             document (dict): A dictionary containing the "content" key with the main information to be summarized.
+            chunk_tokens (int, optional): Maximum number of tokens of content sent to an assistant at once. Defaults
+                to the SUMMARY_CHUNK_TOKENS setting.
+            max_concurrency (int, optional): Number of chunks summarized at once. Defaults to the
+                SUMMARY_MAX_CONCURRENCY setting.
+            max_attempts (int, optional): Maximum number of summaries written. Defaults to the SUMMARY_MAX_ATTEMPTS
+                setting.
+            use_cache (bool): Look up and store the summary in the summary cache. Defaults to True.
+
+        Returns:
+            dict: The updated dictionary with the "summary" key containing the generated summary, and the
+                "summary_meta" key recording the attempts, the tokens sent and received, the coverage score, the
+                number of verifier calls and the outcome ("verified" or "unverified").
+        """
+        cache = get_summary_cache() if use_cache else None
+        cached = cache.get(document["content"], self.model) if cache else None
+        if cached:
+            document.update(cached)
+            return document
+
+        # Two assistants, created once and reused: one for summarizing, another for verifying the summary
+        summarizer_id = self.get_assistant(**ASSISTANT_ROLES["summarizer"])
+        verifier_id = self.get_assistant(**ASSISTANT_ROLES["verifier"])
+
+        usage = []
+        content = self.reduce_content(document["content"], summarizer_id, chunk_tokens, max_concurrency, usage)
+
+        attempts, reply = self._summary_attempts(content, summarizer_id, verifier_id, max_attempts), None
+        try:
+            while True:
+                assistant_id, prompt = attempts.send(reply)
+                reply = self.ask_assistant(assistant_id, prompt, usage)
+        except StopIteration as result:
+            return self._finish_summary(document, result.value, usage, cache)
+
+    async def asummarize_document(self, document: dict, chunk_tokens: int = None, max_concurrency: int = None,
+                                  max_attempts: int = None, use_cache: bool = True) -> dict:
+        """
+        Asynchronous version of `summarize_document`, for use on an event loop. The summary cache is read and
+        written in a worker thread.
+        """
+        cache = get_summary_cache() if use_cache else None
+        cached = await asyncio.to_thread(cache.get, document["content"], self.model) if cache else None
+        if cached:
+            document.update(cached)
+            return document
+
+        summarizer_id = await self.aget_assistant(**ASSISTANT_ROLES["summarizer"])
+        verifier_id = await self.aget_assistant(**ASSISTANT_ROLES["verifier"])
+
+        usage = []
+        content = await self.areduce_content(document["content"], summarizer_id, chunk_tokens, max_concurrency,
+                                             usage)
+
+        attempts, reply = self._summary_attempts(content, summarizer_id, verifier_id, max_attempts), None
+        try:
+            while True:
+                assistant_id, prompt = attempts.send(reply)
+                reply = await self.aask_assistant(assistant_id, prompt, usage)
+        except StopIteration as result:
+            return await asyncio.to_thread(self._finish_summary, document, result.value, usage, cache)
+
+    @staticmethod
+    def _summary_attempts(content: str, summarizer_id: str, verifier_id: str, max_attempts: int = None):
+        """
+        Run the summary and verification attempts of a content as a generator, so the blocking and the asyncio
+        methods share the same loop. Each question is yielded as an (assistant ID, prompt) pair and its reply is
+        expected back through `send`.
+
+        Returns:
+            dict: The best summary, its coverage check, the number of attempts and verifier calls, and the outcome.
+        """
+        max_attempts = max_attempts or config("SUMMARY_MAX_ATTEMPTS", default=3, cast=int)
+        best, verifier_calls, outcome, feedback = None, 0, "unverified", None
+        for attempt in range(1, max_attempts + 1):
+            print(f"Summary attempt {attempt}... ")
+            summary_prompt = SUMMARY_PROMPT.format(content=content)
+            if feedback:
+                summary_prompt += RETRY_PROMPT.format(missing=feedback)
+            summary = yield summarizer_id, summary_prompt
+
+            check = check_summary(content, summary)
+            if best is None or check.score > best[1].score:
+                best = (summary, check)
+
+            verified = check.verdict == PASS
+            feedback = ", ".join(check.missing)
+            if check.verdict == AMBIGUOUS:
+                verifier_calls += 1
+                verification_response = yield verifier_id, VERIFICATION_PROMPT.format(content=content, summary=summary)
+                verified = verification_response == "1"
+                feedback = verification_response
+
+            if verified:
+                best, outcome = (summary, check), "verified"
+                break
+
+        return {"summary": best[0], "check": best[1], "attempts": attempt, "verifier_calls": verifier_calls,
+                "outcome": outcome}
+
+    def _finish_summary(self, document: dict, result: dict, usage: list, cache) -> dict:
+        """
+        Store the outcome of the summary attempts in the document, and cache it if it was verified.
+        """
+        document["summary"] = result["summary"]
+        document["summary_meta"] = {
+            "attempts": result["attempts"],
+            "tokens": sum(usage),
+            "coverage": round(result["check"].score, 3),
+            "verifier_calls": result["verifier_calls"],
+            "outcome": result["outcome"],
+        }
+        # Unverified summaries are not cached, so the next run tries again
+        if cache and result["outcome"] == "verified":
+            cache.put(document["content"], self.model, document["summary"], document["summary_meta"])
+        return document
+
+    def reduce_content(self, content: str, summarizer_id: str, chunk_tokens: int = None,
+                       max_concurrency: int = None, usage: list = None) -> str:
+        """
+        Shrink a text until it fits in `chunk_tokens` tokens. The text is split into token-bounded chunks that are
+        summarized in parallel, then the partial summaries are combined in groups, level by level, until they fit.
+        Every level at least halves the number of summaries, so the number of sequential steps grows with the
+        logarithm of the text size. Texts that already fit are returned unchanged.
+
+        Args:
+            content (str): The text to shrink.
+            summarizer_id (str): The ID of the assistant writing the summaries.
+            chunk_tokens (int, optional): Maximum number of tokens sent to the assistant at once. Defaults to the
+                SUMMARY_CHUNK_TOKENS setting.
+            max_concurrency (int, optional): Number of summaries written at once. Defaults to the
+                SUMMARY_MAX_CONCURRENCY setting.
+            usage (list, optional): Receives the token count of every prompt and reply.
+
+        Returns:
+            str: The text itself, or its partial summaries separated by blank lines.
+        """
+        max_concurrency = max_concurrency or config("SUMMARY_MAX_CONCURRENCY", default=8, cast=int)
+        levels, summaries = self._reduction_levels(content, chunk_tokens), None
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            try:
+                while True:
+                    prompts = levels.send(summaries)
+                    summaries = list(executor.map(
+                        lambda prompt: self.ask_assistant(summarizer_id, prompt, usage), prompts
+                    ))
+            except StopIteration as result:
+                return result.value
+
+    async def areduce_content(self, content: str, summarizer_id: str, chunk_tokens: int = None,
+                              max_concurrency: int = None, usage: list = None) -> str:
+        """
+        Asynchronous version of `reduce_content`, for use on an event loop.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or config("SUMMARY_MAX_CONCURRENCY", default=8, cast=int))
+
+        async def ask(prompt: str) -> str:
+            async with semaphore:
+                return await self.aask_assistant(summarizer_id, prompt, usage)
+
+        levels, summaries = self._reduction_levels(content, chunk_tokens), None
+        try:
+            while True:
+                prompts = levels.send(summaries)
+                summaries = await asyncio.gather(*(ask(prompt) for prompt in prompts))
+        except StopIteration as result:
+            return result.value
+
+    def _reduction_levels(self, content: str, chunk_tokens: int = None):
+        """
+        Run the levels of `reduce_content` as a generator. The prompts of each level are yielded together and
+        their summaries, in the same order, are expected back through `send`.
 
         Returns:
-            dict: The updated dictionary with the "summary" key containing the generated summary.
-        """
-        # Create a new thread for the summarization process
-        thread = self.create_thread(messages=[
-            {
-                "role": "user",
-                "content": "Please summarize the following content: " + document["content"]
-            }
-        ])
-        thread_id = thread.id
-
-        # Create two assistants: one for summarizing, another for verifying the summary
-        summarizer = self.create_assistant(
-            name="Summarizer",
-            description="An assistant that summarizes content."
+            str: The reduced text.
+        """
+        chunk_tokens = chunk_tokens or config("SUMMARY_CHUNK_TOKENS", default=6000, cast=int)
+        if self.get_token_count(content) <= chunk_tokens:
+            return content
+
+        parts = [chunk.text for chunk in chunk_text(content, max_tokens=chunk_tokens, overlap_tokens=0,
+                                                     count_tokens=self.get_token_count)]
+        prompt = CHUNK_SUMMARY_PROMPT
+        while True:
+            print(f"Summarizing {len(parts)} parts... ")
+            summaries = yield [prompt.format(content=part) for part in parts]
+            reduced = PARTIAL_SUMMARY_SEPARATOR.join(summaries)
+            if len(summaries) == 1 or self.get_token_count(reduced) <= chunk_tokens:
+                return reduced
+            parts = self._group_summaries(summaries, chunk_tokens)
+            prompt = COMBINE_PROMPT
+
+    @staticmethod
+    def _group_summaries(summaries: list, max_tokens: int) -> list:
+        """
+        Join consecutive summaries into groups of at most `max_tokens` tokens, at least two per group but the last.
+        """
+        groups, group, group_tokens = [], [], 0
+        for summary, tokens in zip(summaries, count_tokens_batch(summaries, "gpt-4")):
+            if len(group) >= 2 and group_tokens + tokens > max_tokens:
+                groups.append(PARTIAL_SUMMARY_SEPARATOR.join(group))
+                group, group_tokens = [], 0
+            group.append(summary)
+            group_tokens += int(tokens)
+        groups.append(PARTIAL_SUMMARY_SEPARATOR.join(group))
+        return groups
+
+    def ask_assistant(self, assistant_id: str, prompt: str, usage: list = None) -> str:
+        """
+        Send a single prompt to an assistant in a new thread and return its answer.
+
+        Args:
+            assistant_id (str): The ID of the assistant to use.
+            prompt (str): The message to send.
+            usage (list, optional): Receives the token counts of the prompt and the reply.
+
+        Returns:
+            str: The text of the assistant's reply.
+        """
+        thread = self.create_thread(messages=[{"role": "user", "content": prompt}])
+        get_rate_limiter(self.model).call(
+            lambda: self.run_to_completion(thread_id=thread.id, assistant_id=assistant_id),
+            tokens=self.get_token_count(prompt) + ASSISTANT_REPLY_TOKENS
         )
-        verifier = self.create_assistant(
-            name="Verifier",
-            description="An assistant that verifies if the summary contains all main points of the content."
+        messages = get_client().beta.threads.messages.list(thread_id=thread.id, limit=1)
+        return self._reply(prompt, messages, usage)
+
+    async def aask_assistant(self, assistant_id: str, prompt: str, usage: list = None) -> str:
+        """
+        Asynchronous version of `ask_assistant`, for use on an event loop.
+        """
+        thread = await self.acreate_thread(messages=[{"role": "user", "content": prompt}])
+        await get_rate_limiter(self.model).acall(
+            lambda: self.arun_to_completion(thread_id=thread.id, assistant_id=assistant_id),
+            tokens=self.get_token_count(prompt) + ASSISTANT_REPLY_TOKENS
         )
+        messages = await get_async_client().beta.threads.messages.list(thread_id=thread.id, limit=1)
+        return self._reply(prompt, messages, usage)
 
-        properly_summarized = False
-        while not properly_summarized:
-            print("Summary attempt... ")
+    def _reply(self, prompt: str, messages, usage: list = None) -> str:
+        """
+        Extract the text of the newest message of a thread, recording the tokens of the exchange.
+        """
+        reply = messages.data[0].content[0].text.value.strip()
+        if usage is not None:
+            # list.extend is atomic, so parallel chunk summaries can share one list
+            usage.extend((self.get_token_count(prompt), self.get_token_count(reply)))
+        return reply
 
-            summary_prompt = f"Create a summary of the the following:{document['content']}"
-            openai.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=summary_prompt
-            )
+    def summarize_rag_context(self, rag_context: RAGContext = None, max_concurrency: int = None,
+                              documents_per_minute: float = None, save_every: int = 10) -> int:
+        """
+        Summarize every document of a RAG context that has no summary yet, several documents at a time.
+        Summaries are saved back into the context in small batches as they finish, so a run interrupted by a
+        worker restart resumes with the documents that are still missing a summary. Documents whose content was
+        summarized before are filled from the summary cache up front, without calling the API or waiting on the
+        rate limit.
 
-            # Run summarizer assistant to generate the summary
-            summary_run = self.run(thread_id=thread_id, assistant_id=summarizer.id)
-            self.wait_for_complete_status(summary_run)
+        Args:
+            rag_context (RAGContext, optional): The RAG context to summarize. Defaults to the company's context.
+            max_concurrency (int, optional): Number of documents summarized at once. Defaults to the
+                SUMMARY_MAX_CONCURRENCY setting.
+            documents_per_minute (float, optional): Maximum number of summaries started per minute. Defaults to
+                the SUMMARY_DOCUMENTS_PER_MINUTE setting.
+            save_every (int): Number of finished summaries written to the database at once. Defaults to 10.
 
-            # List the messages once the run is complete
-            messages = openai.beta.threads.messages.list(thread_id=thread_id)
-            summary = messages.data[0].content
+        Returns:
+            int: The number of documents summarized.
+        """
+        rag_context = rag_context or self._get_rag_context()
+        max_concurrency = max_concurrency or config("SUMMARY_MAX_CONCURRENCY", default=8, cast=int)
+        limiter = RateLimiter(documents_per_minute or config("SUMMARY_DOCUMENTS_PER_MINUTE", default=60, cast=float))
 
-            # Add a new message with the verification prompt
-            verification_prompt = (f"Here is the original content: {document['content']}\n\nHere is the summary: "
-                                   f"{summary}\n\nDoes the summary include all the important points? If not, list the "
-                                   f"missing points, otherwise respond with '1'.")
+        pending, summarized = self._fill_cached_summaries(rag_context)
 
-            openai.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=verification_prompt
-            )
-            # Run verifier assistant to check the summary
-            verification_run = self.run(thread_id=thread_id, assistant_id=verifier.id)
-            self.wait_for_complete_status(verification_run)
+        def summarize(position: int) -> dict:
+            limiter.acquire()
+            return self._summary_fields(self.summarize_document(dict(rag_context.documents[position])))
 
-            messages = openai.beta.threads.messages.list(thread_id=thread_id)
+        finished, failed = {}, 0
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {executor.submit(summarize, position): position for position in pending}
+            for future in as_completed(futures):
+                try:
+                    finished[futures[future]] = future.result()
+                except Exception as e:
+                    # One failed document must not cost the summaries of the others
+                    print(f"Error summarizing document {futures[future]} of {rag_context.name}: {e}")
+                    failed += 1
+                    continue
 
-            verification_response = messages.data[0].content
-            if verification_response[0].text.value.strip() == "1":
-                properly_summarized = True
-                document["summary"] = summary[0].text.value.strip()
+                if len(finished) >= save_every:
+                    summarized += self._save_summaries(rag_context, finished)
+                    finished = {}
 
-        return document
+        summarized += self._save_summaries(rag_context, finished)
+        if failed:
+            print(f"{failed} documents of {rag_context.name} could not be summarized")
+        return summarized
+
+    async def asummarize_rag_context(self, rag_context: RAGContext = None, max_concurrency: int = None,
+                                     documents_per_minute: float = None, save_every: int = 10) -> int:
+        """
+        Asynchronous version of `summarize_rag_context`, for use on an event loop. Documents are summarized as
+        concurrent tasks instead of threads, so `max_concurrency` can be raised to hundreds.
+        """
+        rag_context = rag_context or await sync_to_async(self._get_rag_context)()
+        semaphore = asyncio.Semaphore(max_concurrency or config("SUMMARY_MAX_CONCURRENCY", default=8, cast=int))
+        limiter = RateLimiter(documents_per_minute or config("SUMMARY_DOCUMENTS_PER_MINUTE", default=60, cast=float))
+        save_summaries = sync_to_async(self._save_summaries)
+
+        pending, summarized = await sync_to_async(self._fill_cached_summaries)(rag_context)
+
+        async def summarize(position: int) -> tuple:
+            async with semaphore:
+                await limiter.aacquire()
+                document = await self.asummarize_document(dict(rag_context.documents[position]))
+                return position, self._summary_fields(document)
+
+        finished, failed = {}, 0
+        for task in asyncio.as_completed([summarize(position) for position in pending]):
+            try:
+                position, fields = await task
+            except Exception as e:
+                # One failed document must not cost the summaries of the others
+                print(f"Error summarizing a document of {rag_context.name}: {e}")
+                failed += 1
+                continue
+
+            finished[position] = fields
+            if len(finished) >= save_every:
+                summarized += await save_summaries(rag_context, finished)
+                finished = {}
+
+        summarized += await save_summaries(rag_context, finished)
+        if failed:
+            print(f"{failed} documents of {rag_context.name} could not be summarized")
+        return summarized
+
+    def _fill_cached_summaries(self, rag_context: RAGContext) -> tuple:
+        """
+        Save the cached summaries of the documents of a RAG context that have none yet.
+
+        Returns:
+            tuple: The positions of the documents still to summarize, and the number of summaries saved.
+        """
+        pending = [position for position, doc in enumerate(rag_context.documents) if not doc.get("summary")]
+        cached = get_summary_cache().get_many([rag_context.documents[position]["content"] for position in pending],
+                                              self.model)
+        summarized = self._save_summaries(rag_context, {pending[index]: fields for index, fields in cached.items()})
+        pending = [position for index, position in enumerate(pending) if index not in cached]
+        print(f"Summarizing {len(pending)} of {len(rag_context.documents)} documents of {rag_context.name}, "
+              f"{summarized} found in cache")
+        return pending, summarized
+
+    @staticmethod
+    def _summary_fields(document: dict) -> dict:
+        return {field: document[field] for field in ("summary", "summary_meta") if field in document}
+
+    @staticmethod
+    def _save_summaries(rag_context: RAGContext, summaries: dict) -> int:
+        """
+        Write finished summaries into the stored documents of a RAG context.
+        The documents are re-read under a row lock so concurrent writers do not overwrite each other.
+
+        Args:
+            rag_context (RAGContext): The RAG context the summaries belong to.
+            summaries (dict): The summary fields of each document, keyed by the position of the document.
+
+        Returns:
+            int: The number of summaries written.
+        """
+        if not summaries:
+            return 0
+
+        with transaction.atomic():
+            stored = RAGContext.objects.select_for_update().only("documents").get(pk=rag_context.pk)
+            for position, fields in summaries.items():
+                stored.documents[position].update(fields)
+                rag_context.documents[position].update(fields)
+            stored.save(update_fields=["documents"])
+        return len(summaries)
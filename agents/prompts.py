@@ -0,0 +1,25 @@
+"""
+Prompts sent to the summarizer and verifier assistants.
+"""
+import hashlib
+
+
+SUMMARY_PROMPT = "Create a summary of the following:\n\n{content}"
+
+CHUNK_SUMMARY_PROMPT = ("Summarize the following part of a longer document. Keep every important point, name and "
+                        "figure:\n\n{content}")
+
+COMBINE_PROMPT = ("Here are summaries of consecutive parts of a document. Combine them into a single summary that "
+                  "keeps every important point, name and figure:\n\n{content}")
+
+RETRY_PROMPT = "\n\nA previous summary of this content was rejected. Make sure to cover: {missing}"
+
+VERIFICATION_PROMPT = ("Here is the original content: {content}\n\nHere is the summary: {summary}\n\nDoes the summary "
+                       "include all the important points? If not, list the missing points, otherwise respond with '1'.")
+
+PARTIAL_SUMMARY_SEPARATOR = "\n\n"
+
+# Identifies the prompts above; cached summaries written with other prompts are discarded
+PROMPT_VERSION = hashlib.sha256("\0".join((
+    SUMMARY_PROMPT, CHUNK_SUMMARY_PROMPT, COMBINE_PROMPT, RETRY_PROMPT, VERIFICATION_PROMPT, PARTIAL_SUMMARY_SEPARATOR
+)).encode()).hexdigest()[:16]
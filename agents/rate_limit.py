@@ -0,0 +1,332 @@
+from agents.local_store import connect
+from agents.runs import RunError
+from decouple import Csv, config
+from typing import Awaitable, Callable
+import asyncio
+import logging
+import openai
+import os
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    model TEXT PRIMARY KEY,
+    requests REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    paused_until REAL NOT NULL
+);
+"""
+
+# Interactive calls may empty the buckets, background calls leave them a reserve
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Requests and tokens per minute of the models we use, unless overridden by the OPENAI_RATE_LIMITS setting
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": (500, 30000),
+    "gpt-4o-mini": (500, 200000),
+    "text-embedding-ada-002": (3000, 1000000),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Space out calls made from any number of threads so that at most `per_minute` of them start each minute.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        """
+        Args:
+            per_minute (float): Maximum number of calls per minute.
+        """
+        self.interval = 60 / per_minute
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until the caller may start its call.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """
+        Wait until the caller may start its call without blocking the event loop.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _reserve(self) -> float:
+        """
+        Book the next free start time and return how long the caller has to wait for it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        return start - now
+
+
+def rate_limits() -> dict:
+    """
+    Read the rate limits of each model. The OPENAI_RATE_LIMITS setting lists them as comma separated
+    `model=requests/tokens` pairs, e.g. "gpt-4o=500/30000,text-embedding-ada-002=3000/1000000".
+
+    Returns:
+        dict: (requests per minute, tokens per minute) keyed by model.
+    """
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for entry in config("OPENAI_RATE_LIMITS", default="", cast=Csv()):
+        model, _, rates = entry.partition("=")
+        requests, _, tokens = rates.partition("/")
+        limits[model.strip()] = (float(requests), float(tokens))
+    return limits
+
+
+class TokenBucketLimiter:
+    """
+    Keep the requests and tokens sent to one model under its per-minute limits, across every thread and worker
+    process of the host. Both budgets are token buckets refilled continuously and stored in a SQLite file, so all
+    workers draw from the same buckets.
+    Background calls (embedding, summarization) may only use the buckets down to a reserve, which is left to
+    interactive calls such as answering a question. A 429 pauses the model for every worker and the call is
+    retried, so a burst ends up queued instead of failing.
+    """
+
+    def __init__(self, model: str, requests_per_minute: float = None, tokens_per_minute: float = None,
+                 path: str = None, reserve: float = None, max_retries: int = 5) -> None:
+        """
+        Args:
+            model (str): The model whose limits are enforced.
+            requests_per_minute (float, optional): Request limit. Defaults to the limit of the model, or the
+                OPENAI_REQUESTS_PER_MINUTE setting for unknown models.
+            tokens_per_minute (float, optional): Token limit. Defaults to the limit of the model, or the
+                OPENAI_TOKENS_PER_MINUTE setting for unknown models.
+            path (str, optional): Location of the SQLite file. Defaults to the RATE_LIMIT_PATH setting.
+            reserve (float, optional): Share of each bucket kept for interactive calls. Defaults to the
+                RATE_LIMIT_RESERVE setting.
+            max_retries (int): How many times a rate limited call is sent again before the error is raised.
+        """
+        default_requests, default_tokens = rate_limits().get(model, (
+            config("OPENAI_REQUESTS_PER_MINUTE", default=500, cast=float),
+            config("OPENAI_TOKENS_PER_MINUTE", default=30000, cast=float),
+        ))
+        self.model = model
+        self.requests_per_minute = requests_per_minute or default_requests
+        self.tokens_per_minute = tokens_per_minute or default_tokens
+        self.path = path or config("RATE_LIMIT_PATH", default="var/rate_limits.sqlite3")
+        self.reserve = reserve if reserve is not None else config("RATE_LIMIT_RESERVE", default=0.2, cast=float)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def acquire(self, tokens: int = 0, priority: str = BACKGROUND) -> float:
+        """
+        Block until one request of `tokens` tokens may be sent.
+
+        Args:
+            tokens (int): Estimated number of tokens of the request, prompt and answer included.
+            priority (str): INTERACTIVE or BACKGROUND.
+
+        Returns:
+            float: The number of seconds waited.
+        """
+        waited = 0.0
+        while (delay := self._take(tokens, priority)) > 0:
+            # Wake up regularly, other workers may have been paused or resumed meanwhile
+            delay = min(delay, 1.0)
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def aacquire(self, tokens: int = 0, priority: str = BACKGROUND) -> float:
+        """
+        Wait until one request of `tokens` tokens may be sent, without blocking the event loop. The buckets are
+        read and written in a worker thread, since another process may hold their file locked.
+
+        Args:
+            tokens (int): Estimated number of tokens of the request, prompt and answer included.
+            priority (str): INTERACTIVE or BACKGROUND.
+
+        Returns:
+            float: The number of seconds waited.
+        """
+        waited = 0.0
+        while (delay := await asyncio.to_thread(self._take, tokens, priority)) > 0:
+            delay = min(delay, 1.0)
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def call(self, function: Callable, tokens: int = 0, priority: str = BACKGROUND):
+        """
+        Call `function` once the limits allow it, retrying it after a pause when it is rate limited.
+
+        Args:
+            function (Callable): The call to make, without arguments.
+            tokens (int): Estimated number of tokens of the request, prompt and answer included.
+            priority (str): INTERACTIVE or BACKGROUND.
+
+        Returns:
+            The result of `function`.
+        """
+        for attempt in range(1, self.max_retries + 2):
+            self.acquire(tokens, priority)
+            try:
+                return function()
+            except (openai.RateLimitError, RunError) as e:
+                self._handle_rate_limit(e, attempt)
+
+    async def acall(self, function: Callable[[], Awaitable], tokens: int = 0, priority: str = BACKGROUND):
+        """
+        Asynchronous version of `call`, for use on an event loop.
+
+        Args:
+            function (Callable[[], Awaitable]): Function returning the awaitable to wait for.
+            tokens (int): Estimated number of tokens of the request, prompt and answer included.
+            priority (str): INTERACTIVE or BACKGROUND.
+
+        Returns:
+            The result of the awaitable.
+        """
+        for attempt in range(1, self.max_retries + 2):
+            await self.aacquire(tokens, priority)
+            try:
+                return await function()
+            except (openai.RateLimitError, RunError) as e:
+                await asyncio.to_thread(self._handle_rate_limit, e, attempt)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop every worker from sending requests to the model for a while.
+
+        Args:
+            seconds (float): Length of the pause.
+        """
+        with self._lock:
+            connection = self._connect()
+            self._bucket(connection)
+            connection.execute("UPDATE token_buckets SET paused_until = MAX(paused_until, ?) WHERE model = ?",
+                               (time.time() + seconds, self.model))
+
+    def _handle_rate_limit(self, error: Exception, attempt: int) -> None:
+        """
+        Pause the model after a rate limited call, or raise the error if it is not a rate limit or the call
+        failed too many times.
+        """
+        if isinstance(error, RunError):
+            last_error = getattr(error.run, "last_error", None)
+            if getattr(last_error, "code", None) != "rate_limit_exceeded":
+                raise error
+        if attempt > self.max_retries:
+            raise error
+
+        delay = self._retry_after(error) or min(2 ** (attempt - 1), 20)
+        logger.warning("Rate limited on %s, pausing %.1fs", self.model, delay)
+        self.pause(delay)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        response = getattr(error, "response", None)
+        headers = response.headers if response is not None else {}
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            try:
+                return float(headers["retry-after"])
+            except ValueError:
+                return None
+        return None
+
+    def _take(self, tokens: int, priority: str) -> float:
+        """
+        Take one request and `tokens` tokens from the buckets if they hold enough.
+
+        Returns:
+            float: 0 if the request may be sent, otherwise the number of seconds before it could be.
+        """
+        floor = 0.0 if priority == INTERACTIVE else self.reserve
+        # A request larger than the bucket would never fit; let it through once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute * (1 - self.reserve))
+        request_rate, token_rate = self.requests_per_minute / 60, self.tokens_per_minute / 60
+
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                requests, available, paused_until, now = self._bucket(connection)
+                if paused_until > now:
+                    delay = paused_until - now
+                else:
+                    delay = max(
+                        (1 + floor * self.requests_per_minute - requests) / request_rate,
+                        (tokens + floor * self.tokens_per_minute - available) / token_rate,
+                        0.0
+                    )
+                    if delay <= 0:
+                        requests -= 1
+                        available -= tokens
+                connection.execute("UPDATE token_buckets SET requests = ?, tokens = ?, updated = ? WHERE model = ?",
+                                   (requests, available, now, self.model))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return delay
+
+    def _bucket(self, connection) -> tuple:
+        """
+        Read the buckets of the model, refilled up to the current time.
+
+        Returns:
+            tuple: The requests and tokens available, the end of the current pause and the current time.
+        """
+        now = time.time()
+        row = connection.execute("SELECT requests, tokens, updated, paused_until FROM token_buckets WHERE model = ?",
+                                 (self.model,)).fetchone()
+        if row is None:
+            connection.execute("INSERT INTO token_buckets VALUES (?, ?, ?, ?, 0)",
+                               (self.model, self.requests_per_minute, self.tokens_per_minute, now))
+            return self.requests_per_minute, self.tokens_per_minute, 0.0, now
+
+        requests, tokens, updated, paused_until = row
+        elapsed = max(now - updated, 0.0)
+        requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60)
+        tokens = min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60)
+        return requests, tokens, paused_until, now
+
+    def _connect(self):
+        # SQLite connections must not be shared with forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = connect(self.path, SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> TokenBucketLimiter:
+    """
+    Return the rate limiter of a model in the current process, creating it on first use.
+
+    Args:
+        model (str): The model.
+
+    Returns:
+        TokenBucketLimiter: The shared limiter of the model.
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = TokenBucketLimiter(model)
+        return _limiters[model]
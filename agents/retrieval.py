@@ -0,0 +1,28 @@
+import numpy as np
+
+
+def top_k(matrix: np.ndarray, query, k: int) -> tuple:
+    """
+    Find the rows of an embedding matrix most similar to a query vector.
+    All rows are scored with a single matrix-vector product; OpenAI embeddings are unit length, so the dot
+    product is the cosine similarity.
+
+    Args:
+        matrix (np.ndarray): Embedding matrix with one row per document.
+        query: Embedding of the query.
+        k (int): Number of rows to return.
+
+    Returns:
+        tuple: The indices of the best rows and their scores, both ordered from most to least similar.
+    """
+    if matrix.shape[0] == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    query = np.asarray(query, dtype=np.float32)
+    scores = matrix @ (query / np.linalg.norm(query))
+
+    k = min(k, len(scores))
+    # argpartition finds the k best rows in linear time; only those k are sorted
+    best = np.argpartition(scores, -k)[-k:] if k < len(scores) else np.arange(len(scores))
+    best = best[np.argsort(scores[best])[::-1]]
+    return best, scores[best]
@@ -0,0 +1,174 @@
+from agents.clients import get_async_client, get_client
+from decouple import config
+import asyncio
+import openai
+import random
+import time
+
+
+COMPLETED = "completed"
+
+# Statuses a run never leaves; anything but "completed" is an error for us since no function tools are used
+TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete", "requires_action"}
+
+
+class RunError(Exception):
+    """
+    Raised when an assistant run ends in a state other than completed.
+    """
+
+    def __init__(self, run, message: str = None) -> None:
+        self.run = run
+        last_error = getattr(run, "last_error", None)
+        detail = f": {last_error.message}" if last_error else ""
+        super().__init__(message or f"Run {run.id} on thread {run.thread_id} ended as '{run.status}'{detail}")
+
+
+class RunTimeoutError(RunError):
+    """
+    Raised when an assistant run is still going when the deadline passes. The run is cancelled.
+    """
+
+
+class RunWaiter:
+    """
+    Wait for assistant runs to finish, either by following the run's event stream or by polling it with
+    exponential backoff and jitter. Both stop at an overall deadline and raise on every terminal state other
+    than completed.
+    """
+
+    def __init__(self, client: openai.OpenAI = None, async_client: openai.AsyncOpenAI = None, timeout: float = None,
+                 initial_delay: float = 0.25, max_delay: float = 5.0, jitter: float = 0.5) -> None:
+        """
+        Args:
+            client (openai.OpenAI, optional): Client used by the blocking methods. Defaults to the shared client of
+                the process.
+            async_client (openai.AsyncOpenAI, optional): Client used by the asyncio methods. Defaults to the shared
+                client of the running event loop.
+            timeout (float, optional): Seconds to wait for a run before giving up. Defaults to the RUN_TIMEOUT
+                setting.
+            initial_delay (float): Seconds before the first poll.
+            max_delay (float): Upper bound of the delay between polls.
+            jitter (float): Fraction by which each delay is randomly shortened or lengthened.
+        """
+        self.client = client or get_client()
+        self.async_client = async_client
+        self.timeout = timeout or config("RUN_TIMEOUT", default=600, cast=float)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    @staticmethod
+    def check(run):
+        """
+        Return a finished run if it completed, raise RunError otherwise.
+        """
+        if run.status != COMPLETED:
+            raise RunError(run)
+        return run
+
+    def poll(self, run):
+        """
+        Poll a run until it reaches a terminal state.
+
+        Args:
+            run (Run): The run to wait for.
+
+        Returns:
+            Run: The completed run.
+        """
+        deadline = time.monotonic() + self.timeout
+        for delay in self._delays():
+            if run.status in TERMINAL_STATUSES:
+                return self.check(run)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._cancel(run)
+                raise RunTimeoutError(run, f"Run {run.id} did not finish within {self.timeout} seconds")
+
+            time.sleep(min(delay, remaining))
+            run = self.client.beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+
+    def stream(self, thread_id: str, assistant_id: str):
+        """
+        Create a run and follow its event stream until it ends, without polling.
+
+        Args:
+            thread_id (str): The ID of the thread to run.
+            assistant_id (str): The ID of the assistant to use.
+
+        Returns:
+            Run: The completed run.
+        """
+        deadline = time.monotonic() + self.timeout
+        # The request timeout bounds the wait for each event, the deadline bounds the whole run
+        with self.client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id,
+                                                  timeout=self.timeout) as stream:
+            for _ in stream:
+                if time.monotonic() > deadline and stream.current_run is not None:
+                    self._cancel(stream.current_run)
+                    raise RunTimeoutError(stream.current_run,
+                                          f"Run {stream.current_run.id} did not finish within {self.timeout} seconds")
+            return self.check(stream.get_final_run())
+
+    async def apoll(self, run):
+        """
+        Poll a run until it reaches a terminal state without blocking the event loop.
+
+        Args:
+            run (Run): The run to wait for.
+
+        Returns:
+            Run: The completed run.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        for delay in self._delays():
+            if run.status in TERMINAL_STATUSES:
+                return self.check(run)
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                await self._acancel(run)
+                raise RunTimeoutError(run, f"Run {run.id} did not finish within {self.timeout} seconds")
+
+            await asyncio.sleep(min(delay, remaining))
+            run = await self._async_client().beta.threads.runs.retrieve(thread_id=run.thread_id, run_id=run.id)
+
+    async def apoll_many(self, runs: list, return_exceptions: bool = False) -> list:
+        """
+        Wait for many runs at once on the current event loop.
+
+        Args:
+            runs (list): The runs to wait for.
+            return_exceptions (bool): Return the RunError of a failed run in its place instead of raising it.
+
+        Returns:
+            list: The completed runs, in the same order.
+        """
+        return await asyncio.gather(*(self.apoll(run) for run in runs), return_exceptions=return_exceptions)
+
+    def _delays(self):
+        """
+        Yield delays growing exponentially up to `max_delay`, each randomly spread by `jitter`.
+        """
+        delay = self.initial_delay
+        while True:
+            yield delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay * 2, self.max_delay)
+
+    def _cancel(self, run) -> None:
+        try:
+            self.client.beta.threads.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+        except openai.OpenAIError as e:
+            print(f"Error cancelling run {run.id}: {e}")
+
+    async def _acancel(self, run) -> None:
+        try:
+            await self._async_client().beta.threads.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+        except openai.OpenAIError as e:
+            print(f"Error cancelling run {run.id}: {e}")
+
+    def _async_client(self) -> openai.AsyncOpenAI:
+        return self.async_client or get_async_client()
@@ -0,0 +1,151 @@
+from typing import Awaitable, Callable, Hashable
+import asyncio
+import numpy as np
+import re
+import threading
+import weakref
+
+
+MENTION = re.compile(r"@\w+")
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Hyperplanes of the embedding buckets, per embedding size; fixed so every process buckets alike
+_planes = {}
+_planes_lock = threading.Lock()
+
+
+def normalize_question(text: str) -> str:
+    """
+    Reduce a question to the words it is made of, so trivially different phrasings coalesce.
+    Mentions, punctuation, case and spacing are ignored.
+
+    Args:
+        text (str): The question.
+
+    Returns:
+        str: The normalized question.
+    """
+    text = PUNCTUATION.sub(" ", MENTION.sub(" ", text.lower()))
+    return " ".join(text.split())
+
+
+def embedding_bucket(vector, bits: int = 16) -> str:
+    """
+    Hash an embedding with random hyperplanes, so nearly identical embeddings usually share a bucket.
+
+    Args:
+        vector: The embedding.
+        bits (int): Number of hyperplanes; more bits make smaller buckets.
+
+    Returns:
+        str: The bucket, as a string of bits.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    with _planes_lock:
+        planes = _planes.get((vector.shape[0], bits))
+        if planes is None:
+            planes = np.random.default_rng(0).standard_normal((bits, vector.shape[0])).astype(np.float32)
+            _planes[(vector.shape[0], bits)] = planes
+    return "".join("1" if side > 0 else "0" for side in planes @ vector)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run a function once per key at a time: threads calling with a key already in flight wait for that call and
+    get its result, or its exception, instead of starting their own.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, function: Callable):
+        """
+        Call `function`, or wait for the call in flight with the same key.
+
+        Args:
+            key (Hashable): Identifies calls that can share their result.
+            function (Callable): The call to make, without arguments.
+
+        Returns:
+            The result of the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _AsyncCall:
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio version of SingleFlight: coroutines awaiting a key already in flight on their event loop share that
+    call's result. The call runs in its own task, which is only cancelled once every coroutine waiting for it was.
+    """
+
+    def __init__(self) -> None:
+        # Tasks belong to the event loop that created them
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable]):
+        """
+        Await `function()`, or the call in flight with the same key.
+
+        Args:
+            key (Hashable): Identifies calls that can share their result.
+            function (Callable[[], Awaitable]): Function returning the awaitable to wait for.
+
+        Returns:
+            The result of the call.
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = _AsyncCall(asyncio.ensure_future(function()))
+
+            def forget(task: asyncio.Task) -> None:
+                if calls.get(key) is call:
+                    del calls[key]
+            call.task.add_done_callback(forget)
+
+        call.waiters += 1
+        try:
+            # A waiter being cancelled must not cancel the call the others wait for
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
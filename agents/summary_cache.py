@@ -0,0 +1,169 @@
+from agents.local_store import connect
+from agents.prompts import PROMPT_VERSION
+from decouple import config
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+# SQLite caps the number of bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+
+
+class SummaryCache:
+    """
+    Persistent cache of verified summaries shared by every process on the host.
+    Entries are keyed by a hash of the document content, the model and the version of the summarization prompts,
+    so re-ingested documents are summarized once and any change to the prompts invalidates every entry. Entries
+    of other prompt versions are kept while they are still written, since processes running the previous prompts
+    keep using them during a rolling deploy, and are deleted once none was written for `stale_ttl` seconds.
+    """
+
+    def __init__(self, path: str = None, prompt_version: str = PROMPT_VERSION, stale_ttl: float = None) -> None:
+        """
+        Args:
+            path (str, optional): Location of the SQLite file. Defaults to the SUMMARY_CACHE_PATH setting.
+            prompt_version (str): Version of the summarization prompts. Defaults to the current one.
+            stale_ttl (float, optional): Seconds after which the entries of other prompt versions are deleted.
+                Defaults to the SUMMARY_CACHE_STALE_TTL setting.
+        """
+        self.path = path or config("SUMMARY_CACHE_PATH", default="var/summary_cache.sqlite3")
+        self.prompt_version = prompt_version
+        self.stale_ttl = stale_ttl or config("SUMMARY_CACHE_STALE_TTL", default=7 * 24 * 3600, cast=float)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def key(self, content: str, model: str) -> str:
+        """
+        Compute the cache key of a document.
+
+        Args:
+            content (str): The document content.
+            model (str): The model writing the summary.
+
+        Returns:
+            str: Hex digest identifying the content, model and prompt version.
+        """
+        return hashlib.sha256(f"{self.prompt_version}\0{model}\0{content}".encode()).hexdigest()
+
+    def get_many(self, contents: list, model: str) -> dict:
+        """
+        Look up the summaries of several documents at once.
+
+        Args:
+            contents (list): The contents of the documents.
+            model (str): The model writing the summaries.
+
+        Returns:
+            dict: The "summary" and "summary_meta" fields of each cached document, keyed by its position in
+                `contents`.
+        """
+        positions = {}
+        for position, content in enumerate(contents):
+            positions.setdefault(self.key(content, model), []).append(position)
+
+        found = {}
+        keys = list(positions)
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[start:start + QUERY_CHUNK_SIZE]
+                rows = connection.execute(
+                    f"SELECT key, summary, meta FROM summaries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, summary, meta in rows:
+                    found[key] = {"summary": summary, "summary_meta": {**json.loads(meta), "cached": True}}
+
+            hits = sum(len(positions[key]) for key in found)
+            self.hits += hits
+            self.misses += len(contents) - hits
+
+        return {position: dict(fields) for key, fields in found.items() for position in positions[key]}
+
+    def get(self, content: str, model: str) -> dict:
+        """
+        Look up the summary of a document.
+
+        Args:
+            content (str): The document content.
+            model (str): The model writing the summary.
+
+        Returns:
+            dict: The "summary" and "summary_meta" fields of the document, or None if it is not cached.
+        """
+        return self.get_many([content], model).get(0)
+
+    def put(self, content: str, model: str, summary: str, meta: dict) -> None:
+        """
+        Store the summary of a document.
+
+        Args:
+            content (str): The document content.
+            model (str): The model that wrote the summary.
+            summary (str): The summary.
+            meta (dict): How the summary was obtained, as recorded in "summary_meta".
+        """
+        row = (self.key(content, model), model, self.prompt_version, summary, json.dumps(meta), time.time())
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def stats(self) -> dict:
+        """
+        Report hit and miss counts of this process along with the number of entries.
+
+        Returns:
+            dict: The "hits", "misses" and "entries" of the cache.
+        """
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def _connect(self):
+        # SQLite connections must not be shared with forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = connect(self.path, SCHEMA)
+            self._pid = os.getpid()
+            self._evict_stale(self._connection)
+        return self._connection
+
+    def _evict_stale(self, connection) -> None:
+        """
+        Delete the entries of the prompt versions no process has written for `stale_ttl` seconds.
+        """
+        connection.execute(
+            "DELETE FROM summaries WHERE prompt_version IN (SELECT prompt_version FROM summaries "
+            "WHERE prompt_version != ? GROUP BY prompt_version HAVING MAX(created) < ?)",
+            (self.prompt_version, time.time() - self.stale_ttl)
+        )
+
+
+_default_cache = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """
+    Return the summary cache of the current process, creating it on first use.
+
+    Returns:
+        SummaryCache: The shared cache instance.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SummaryCache()
+    return _default_cache
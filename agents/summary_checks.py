@@ -0,0 +1,95 @@
+from collections import Counter
+from dataclasses import dataclass
+from decouple import config
+import re
+
+
+PASS = "pass"
+FAIL = "fail"
+AMBIGUOUS = "ambiguous"
+
+TERM = re.compile(r"[A-Za-z][A-Za-z0-9'-]*|\d[\d,.]*%?")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers him
+his how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+
+@dataclass
+class CoverageCheck:
+    """
+    Result of comparing a summary with its content without calling the API.
+    """
+    score: float
+    missing: list
+    verdict: str
+
+
+def key_terms(text: str, limit: int = 20) -> list:
+    """
+    Find the most salient terms of a text: frequent words, with names and figures weighted up.
+
+    Args:
+        text (str): The text to analyse.
+        limit (int): Maximum number of terms returned.
+
+    Returns:
+        list: The stemmed terms, most salient first.
+    """
+    counts = Counter()
+    for match in TERM.finditer(text):
+        word = match.group().rstrip(".,")
+        if word.lower() in STOPWORDS or len(word) < 3 and not word[0].isdigit():
+            continue
+        term = _stem(word.lower())
+        # Capitalized words and numbers are names, products and figures a summary should keep
+        counts[term] += 2 if word[0].isupper() or word[0].isdigit() else 1
+    return [term for term, _ in counts.most_common(limit)]
+
+
+def check_summary(content: str, summary: str, pass_threshold: float = None, fail_threshold: float = None,
+                  limit: int = 20) -> CoverageCheck:
+    """
+    Score a summary by the share of the content's key terms it mentions. Scores at or above `pass_threshold`
+    pass, scores below `fail_threshold` fail, and anything in between needs a closer look.
+
+    Args:
+        content (str): The summarized content.
+        summary (str): The summary to check.
+        pass_threshold (float, optional): Lowest passing score. Defaults to the SUMMARY_COVERAGE_PASS setting.
+        fail_threshold (float, optional): Scores below this fail. Defaults to the SUMMARY_COVERAGE_FAIL setting.
+        limit (int): Number of key terms of the content checked.
+
+    Returns:
+        CoverageCheck: The score, the key terms the summary misses and the verdict.
+    """
+    pass_threshold = pass_threshold if pass_threshold is not None else config(
+        "SUMMARY_COVERAGE_PASS", default=0.7, cast=float)
+    fail_threshold = fail_threshold if fail_threshold is not None else config(
+        "SUMMARY_COVERAGE_FAIL", default=0.3, cast=float)
+    if not summary.strip():
+        return CoverageCheck(score=0.0, missing=key_terms(content, limit), verdict=FAIL)
+
+    terms = key_terms(content, limit)
+    found = {_stem(match.group().rstrip(".,").lower()) for match in TERM.finditer(summary)}
+    missing = [term for term in terms if term not in found]
+    score = 1 - len(missing) / len(terms) if terms else 1.0
+
+    if score >= pass_threshold:
+        verdict = PASS
+    elif score < fail_threshold:
+        verdict = FAIL
+    else:
+        verdict = AMBIGUOUS
+    return CoverageCheck(score=score, missing=missing, verdict=verdict)
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
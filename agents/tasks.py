@@ -0,0 +1,42 @@
+from agents.assistants import get_assistant_registry
+from agents.models import RAGContext
+from agents.openai_api import LLMFactory
+from celery import shared_task
+from celery.signals import worker_ready
+
+
+@shared_task
+def verify_assistants() -> list:
+    """
+    Check that the registered assistants still exist, so deleted ones are created again on next use.
+
+    Returns:
+        list: The IDs of the assistants that no longer exist.
+    """
+    missing = get_assistant_registry().verify()
+    if missing:
+        print(f"Assistants no longer available, will be recreated: {', '.join(missing)}")
+    return missing
+
+
+@worker_ready.connect
+def verify_assistants_on_startup(**kwargs) -> None:
+    verify_assistants.delay()
+
+
+@shared_task
+def summarize_rag_context(company_name: str, context_name: str) -> int:
+    """
+    Summarize the documents of a company's RAG context that have no summary yet.
+    Running the task again after an interruption picks up where it stopped.
+
+    Args:
+        company_name (str): Name of the Company owning the context.
+        context_name (str): The name of the RAG context.
+
+    Returns:
+        int: The number of documents summarized.
+    """
+    factory = LLMFactory(company_name)
+    rag_context = RAGContext.objects.defer("embeddings").get(name=context_name, llm=factory._get_llm())
+    return factory.summarize_rag_context(rag_context)
@@ -0,0 +1,82 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import json
+import threading
+
+
+class FakeOpenAIServer:
+    """
+    Minimal local stand-in for the OpenAI embeddings endpoint.
+    Vectors are derived from a hash of the input text, so the same text always gets the same embedding.
+    """
+
+    def __init__(self, dimensions: int = 8, fail_first: int = 0) -> None:
+        """
+        Args:
+            dimensions (int): Length of the returned vectors.
+            fail_first (int): Number of requests answered with a 500 error before the server starts succeeding.
+        """
+        self.dimensions = dimensions
+        self.fail_first = fail_first
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def embed(self, text: str) -> list:
+        digest = hashlib.sha256(text.encode()).digest()
+        return [byte / 255 for byte in digest[:self.dimensions]]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    failing = fake.fail_first > 0
+                    fake.fail_first -= failing
+
+                if failing:
+                    self._reply(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+
+                inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                # Reply in reverse order to make sure clients sort by index
+                data = [
+                    {"object": "embedding", "index": i, "embedding": fake.embed(text)}
+                    for i, text in reversed(list(enumerate(inputs)))
+                ]
+                self._reply(200, {
+                    "object": "list",
+                    "data": data,
+                    "model": body["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0}
+                })
+
+            def _reply(self, status, payload):
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import os
+import tempfile
+
+
+def isolate_local_stores(test_case: SimpleTestCase) -> str:
+    """
+    Point the local stores of the agents (the embedding and summary caches, the embedding files and the rate limit
+    buckets) at a temporary directory for the duration of a test, so tests neither read what earlier runs left nor
+    leave files behind. The in-process answer cache is replaced by an empty one too.
+
+    Args:
+        test_case (SimpleTestCase): The test, whose cleanups restore the stores.
+
+    Returns:
+        str: The temporary directory.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    patchers = [
+        patch.dict(os.environ, {
+            "EMBEDDING_CACHE_PATH": f"{directory.name}/embedding_cache.sqlite3",
+            "SUMMARY_CACHE_PATH": f"{directory.name}/summary_cache.sqlite3",
+            "EMBEDDINGS_DIR": f"{directory.name}/embeddings",
+            "RATE_LIMIT_PATH": f"{directory.name}/rate_limits.sqlite3",
+        }),
+        # Stores opened before the test are set aside, the getters open new ones at the temporary paths
+        patch("agents.embedding_cache._default_cache", None),
+        patch("agents.summary_cache._default_cache", None),
+        patch("agents.answer_cache._default_cache", None),
+        patch("agents.rate_limit._limiters", {}),
+    ]
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    return directory.name
@@ -0,0 +1,53 @@
+from django.test import TestCase
+from agents.ann_index import IVFIndex
+from agents.retrieval import top_k
+import numpy as np
+import tempfile
+
+
+def clustered_vectors(size: int, dimensions: int = 32, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions))
+    vectors = centers[rng.integers(clusters, size=size)] + 0.3 * rng.standard_normal((size, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class IVFIndexTest(TestCase):
+    def setUp(self):
+        self.matrix = clustered_vectors(5000)
+        self.index = IVFIndex(n_lists=IVFIndex.lists_for(len(self.matrix)))
+        self.index.train(self.matrix)
+
+    def test_recall_against_exact_search(self):
+        found = 0
+        for query in self.matrix[:50]:
+            exact, _ = top_k(self.matrix, query, 10)
+            approximate, _ = self.index.search(self.matrix, query, 10)
+            found += len(set(exact) & set(approximate))
+        self.assertGreater(found / 500, 0.9)
+
+    def test_added_vectors_are_searchable(self):
+        added = clustered_vectors(100, seed=1)
+        matrix = np.vstack([self.matrix, added])
+        self.index.add(added)
+        self.assertEqual(len(self.index), len(matrix))
+        indices, scores = self.index.search(matrix, added[7], 1)
+        self.assertEqual(indices[0], len(self.matrix) + 7)
+        self.assertAlmostEqual(float(scores[0]), 1.0, places=5)
+
+    def test_needs_training_once_grown(self):
+        self.assertFalse(self.index.needs_training(len(self.matrix) * 2))
+        self.assertTrue(self.index.needs_training(len(self.matrix) * 5))
+        self.assertTrue(IVFIndex(n_lists=4).needs_training(10))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/index.npz"
+            self.index.save(path)
+            loaded = IVFIndex.load(path)
+
+        np.testing.assert_array_equal(loaded.centroids, self.index.centroids)
+        np.testing.assert_array_equal(loaded.assignments, self.index.assignments)
+        self.assertEqual(loaded.nprobe, self.index.nprobe)
+        query = self.matrix[3]
+        np.testing.assert_array_equal(loaded.search(self.matrix, query, 5)[0], self.index.search(self.matrix, query, 5)[0])
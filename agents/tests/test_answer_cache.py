@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from agents.answer_cache import AnswerCache
+
+
+class AnswerCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = AnswerCache(max_entries=3, ttl=60, threshold=0.95)
+
+    def test_similar_questions_share_an_answer(self):
+        self.cache.put("Bloktopia", "gpt-4o", "v1", [1.0, 0.0, 0.1], "The roadmap", question="What's the roadmap?")
+        self.assertEqual(self.cache.get("Bloktopia", "gpt-4o", "v1", [0.98, 0.0, 0.12]), "The roadmap")
+        self.assertIsNone(self.cache.get("Bloktopia", "gpt-4o", "v1", [0.0, 1.0, 0.0]))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "entries": 1})
+
+    def test_answers_are_scoped_to_company_model_and_context_version(self):
+        self.cache.put("Bloktopia", "gpt-4o", "v1", [1.0, 0.0], "The roadmap")
+        self.assertIsNone(self.cache.get("Other", "gpt-4o", "v1", [1.0, 0.0]))
+        self.assertIsNone(self.cache.get("Bloktopia", "gpt-4o-mini", "v1", [1.0, 0.0]))
+        # A new context version drops the answers generated from the old one
+        self.assertIsNone(self.cache.get("Bloktopia", "gpt-4o", "v2", [1.0, 0.0]))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_answers_expire(self):
+        with patch("agents.answer_cache.time.monotonic", return_value=1000):
+            self.cache.put("Bloktopia", "gpt-4o", "v1", [1.0, 0.0], "The roadmap")
+        with patch("agents.answer_cache.time.monotonic", return_value=1061):
+            self.assertIsNone(self.cache.get("Bloktopia", "gpt-4o", "v1", [1.0, 0.0]))
+
+    def test_least_recently_used_answers_are_evicted(self):
+        for i, vector in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+            self.cache.put("Bloktopia", "gpt-4o", "v1", vector, f"answer {i}")
+        self.cache.get("Bloktopia", "gpt-4o", "v1", [1.0, 0.0, 0.0])
+        self.cache.put("Bloktopia", "gpt-4o", "v1", [1.0, 1.0, 0.0], "answer 3")
+
+        self.assertEqual(self.cache.get("Bloktopia", "gpt-4o", "v1", [1.0, 0.0, 0.0]), "answer 0")
+        self.assertIsNone(self.cache.get("Bloktopia", "gpt-4o", "v1", [0.0, 1.0, 0.0]))
+
+    def test_invalidate_drops_the_answers_of_a_company(self):
+        self.cache.put("Bloktopia", "gpt-4o", "v1", [1.0, 0.0], "The roadmap")
+        self.cache.put("Other", "gpt-4o", "v1", [1.0, 0.0], "Other roadmap")
+        self.assertEqual(self.cache.invalidate("Bloktopia"), 1)
+        self.assertEqual(self.cache.get("Other", "gpt-4o", "v1", [1.0, 0.0]), "Other roadmap")
@@ -0,0 +1,66 @@
+from django.test import TestCase
+from unittest.mock import MagicMock
+from agents.assistants import AssistantRegistry, RegisteredAssistant
+import httpx
+import openai
+
+
+class AssistantRegistryTest(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.registry = AssistantRegistry(client=self.client)
+        self.create = MagicMock(side_effect=["asst_1", "asst_2", "asst_3"])
+
+    def test_assistant_is_created_once(self):
+        first = self.registry.get_or_create("Summarizer", "gpt-4o", self.create, description="Summarizes")
+        second = self.registry.get_or_create("Summarizer", "gpt-4o", self.create, description="Summarizes")
+        self.assertEqual(first, "asst_1")
+        self.assertEqual(second, "asst_1")
+        self.create.assert_called_once()
+
+    def test_registry_is_shared_between_processes(self):
+        self.registry.get_or_create("Summarizer", "gpt-4o", self.create)
+        other_process = AssistantRegistry(client=self.client)
+        self.assertEqual(other_process.get_or_create("Summarizer", "gpt-4o", self.create), "asst_1")
+        self.create.assert_called_once()
+
+    def test_assistant_registered_meanwhile_wins(self):
+        def create():
+            # Another worker registers the assistant while this one creates its own
+            RegisteredAssistant.objects.create(key=AssistantRegistry.key("Summarizer", "gpt-4o"), name="Summarizer",
+                                               model="gpt-4o", assistant_id="asst_other")
+            return "asst_1"
+
+        self.assertEqual(self.registry.get_or_create("Summarizer", "gpt-4o", create), "asst_other")
+        self.client.beta.assistants.delete.assert_called_once_with("asst_1")
+
+    def test_configuration_changes_create_a_new_assistant(self):
+        self.registry.get_or_create("Summarizer", "gpt-4o", self.create)
+        self.assertEqual(self.registry.get_or_create("Summarizer", "gpt-4o-mini", self.create), "asst_2")
+        self.assertEqual(self.registry.get_or_create("Summarizer", "gpt-4o", self.create, description="New"), "asst_3")
+
+    def test_failed_creation_is_not_registered(self):
+        self.create.side_effect = [openai.APIConnectionError(request=httpx.Request("POST", "http://test")), "asst_1"]
+        with self.assertRaises(openai.APIConnectionError):
+            self.registry.get_or_create("Summarizer", "gpt-4o", self.create)
+        self.assertEqual(self.registry.get_or_create("Summarizer", "gpt-4o", self.create), "asst_1")
+
+    def test_verify_forgets_deleted_assistants(self):
+        self.registry.get_or_create("Summarizer", "gpt-4o", self.create)
+        self.registry.get_or_create("Verifier", "gpt-4o", self.create)
+        not_found = openai.NotFoundError(
+            "No assistant found",
+            response=httpx.Response(404, request=httpx.Request("GET", "http://test")),
+            body=None
+        )
+
+        def retrieve(assistant_id):
+            if assistant_id == "asst_1":
+                raise not_found
+            return MagicMock(id=assistant_id)
+
+        self.client.beta.assistants.retrieve.side_effect = retrieve
+
+        self.assertEqual(self.registry.verify(), ["asst_1"])
+        self.assertEqual(self.registry.get_or_create("Summarizer", "gpt-4o", self.create), "asst_3")
+        self.assertEqual(self.registry.get_or_create("Verifier", "gpt-4o", self.create), "asst_2")
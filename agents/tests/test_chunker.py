@@ -0,0 +1,47 @@
+from django.test import TestCase
+from agents.chunker import chunk_text, iter_segments
+import io
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+class ChunkerTest(TestCase):
+    def setUp(self):
+        with open("resources/bloktopia_about.txt") as content:
+            self.text = content.read()
+
+    def test_segments_cover_the_source(self):
+        segments = list(iter_segments(io.StringIO(self.text), block_size=100))
+        self.assertEqual("".join(text for text, _ in segments), self.text)
+        for text, start in segments:
+            self.assertEqual(self.text[start:start + len(text)], text)
+
+    def test_chunks_are_bounded_and_carry_offsets(self):
+        chunks = list(chunk_text(io.StringIO(self.text), max_tokens=60, overlap_tokens=10, count_tokens=count_words))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunk.tokens, 60)
+            self.assertEqual(self.text[chunk.start:chunk.end], chunk.text)
+        # Chunks cover the whole text, each one starting before the previous one ends
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(self.text))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertLessEqual(chunk.start, previous.end)
+            self.assertGreater(chunk.end, previous.end)
+
+    def test_chunks_break_between_sentences(self):
+        text = "First sentence here. Second one follows. Third is last."
+        chunks = list(chunk_text(text, max_tokens=6, overlap_tokens=0, count_tokens=count_words))
+        self.assertEqual([chunk.text.strip() for chunk in chunks],
+                         ["First sentence here. Second one follows.", "Third is last."])
+
+    def test_text_without_boundaries_is_split(self):
+        text = "word " * 1000
+        chunks = list(chunk_text(text, max_tokens=100, overlap_tokens=0, count_tokens=count_words))
+        self.assertEqual(len(chunks), 10)
+        self.assertEqual("".join(chunk.text for chunk in chunks), text)
+
+    def test_empty_text(self):
+        self.assertEqual(list(chunk_text("", count_tokens=count_words)), [])
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from agents import clients
+import asyncio
+import os
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test"})
+class ClientsTest(SimpleTestCase):
+    def test_client_is_shared_within_a_process(self):
+        self.assertIs(clients.get_client(), clients.get_client())
+
+    def test_forked_process_gets_its_own_client(self):
+        client = clients.get_client()
+        with patch("agents.clients.os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(clients.get_client(), client)
+
+    def test_async_client_is_shared_within_an_event_loop(self):
+        async def two_clients():
+            return clients.get_async_client(), clients.get_async_client()
+
+        first, second = asyncio.run(two_clients())
+        other_loop, _ = asyncio.run(two_clients())
+        self.assertIs(first, second)
+        self.assertIsNot(first, other_loop)
@@ -0,0 +1,47 @@
+from django.test import TestCase
+from agents.context_packer import ContextPacker
+
+
+class WordEncoding:
+    """
+    One token per whitespace-separated word, enough to test packing without tiktoken's BPE files.
+    """
+
+    def encode_ordinary(self, text: str) -> list:
+        return text.split(" ") if text else []
+
+    def decode(self, tokens: list) -> str:
+        return " ".join(tokens)
+
+
+class ContextPackerTest(TestCase):
+    def setUp(self):
+        self.encoding = WordEncoding()
+
+    def test_available_reserves_question_and_answer(self):
+        packer = ContextPacker(self.encoding, model="gpt-4", budget=100000, answer_tokens=1000)
+        self.assertEqual(packer.available("one two three"), 8192 - 3 - 1000 - 16)
+        packer = ContextPacker(self.encoding, model="gpt-4o", budget=500, answer_tokens=1000)
+        self.assertEqual(packer.available("one two three"), 500)
+
+    def test_documents_are_packed_in_rank_order(self):
+        packer = ContextPacker(self.encoding, model="gpt-4o", budget=14, answer_tokens=0, separator=" | ")
+        packed = packer.pack("question", ["a b c", "d e", "f g h i j k l m"])
+        self.assertEqual(packed.documents, ["a b c", "d e"])
+        self.assertEqual(packed.tokens, 8)
+        # The third document would be cut to too few tokens, so it is left out
+        self.assertTrue(packed.truncated)
+
+    def test_last_document_is_cut_at_a_sentence_boundary(self):
+        packer = ContextPacker(self.encoding, model="gpt-4o", budget=60, answer_tokens=0)
+        long_document = "word " * 30 + "end of sentence. " + "more " * 50
+        packed = packer.pack("question", ["first document", long_document])
+        self.assertTrue(packed.truncated)
+        self.assertTrue(packed.documents[-1].endswith("end of sentence."))
+        self.assertLessEqual(packed.tokens, 60)
+
+    def test_everything_fits(self):
+        packer = ContextPacker(self.encoding, model="gpt-4o", budget=1000, answer_tokens=0)
+        packed = packer.pack("question", ["a b", "c d"])
+        self.assertEqual(packed.text, "a b\nc d")
+        self.assertFalse(packed.truncated)
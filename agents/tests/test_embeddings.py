@@ -0,0 +1,79 @@
+from django.test import TestCase
+from agents.embedding_cache import EmbeddingCache
+from agents.embeddings import EmbeddingBatcher
+from agents.tests.fake_openai import FakeOpenAIServer
+import openai
+import tempfile
+
+
+def count_words(document: str) -> int:
+    return len(document.split())
+
+
+class EmbeddingBatcherTest(TestCase):
+    def setUp(self):
+        self.server = FakeOpenAIServer().start()
+        # Disable the client's own retries so the batcher's retry logic is exercised
+        self.client = openai.OpenAI(api_key="test", base_url=self.server.base_url, max_retries=0)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pack_respects_input_and_token_limits(self):
+        batcher = EmbeddingBatcher(count_words, client=self.client, max_inputs=3, max_tokens=4)
+        documents = ["a", "b", "c", "d", "e e e", "f f"]
+        self.assertEqual(list(batcher.pack(documents)), [[0, 1, 2], [3, 4], [5]])
+
+    def test_embed_returns_vectors_in_input_order(self):
+        batcher = EmbeddingBatcher(count_words, client=self.client, max_inputs=2, max_concurrency=3)
+        documents = [f"Document {i}" for i in range(7)]
+        embeddings = batcher.embed(documents)
+        self.assertEqual(embeddings, [self.server.embed(doc) for doc in documents])
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_only_failed_batches_are_retried(self):
+        self.server.fail_first = 1
+        batcher = EmbeddingBatcher(count_words, client=self.client, max_inputs=2, max_concurrency=1, backoff=0)
+        documents = [f"Document {i}" for i in range(4)]
+        embeddings = batcher.embed(documents)
+        self.assertEqual(embeddings, [self.server.embed(doc) for doc in documents])
+        # Two batches plus a single retry of the batch that failed
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.fail_first = 10
+        batcher = EmbeddingBatcher(count_words, client=self.client, max_retries=2, backoff=0)
+        with self.assertRaises(openai.InternalServerError):
+            batcher.embed(["Document"])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_oversized_document_is_rejected(self):
+        batcher = EmbeddingBatcher(count_words, client=self.client)
+        with self.assertRaises(ValueError):
+            batcher.embed(["word " * 10000])
+
+
+class EmbeddingCacheTest(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.cache = EmbeddingCache(path=f"{self.cache_dir.name}/embeddings.sqlite3")
+
+    def test_get_many_returns_hits_by_position(self):
+        self.cache.put_many(["a", "b"], [[0.5, 1.0], [0.25, 2.0]], "model")
+        found = self.cache.get_many(["b", "c", "a", "b"], "model")
+        self.assertEqual(found, {0: [0.25, 2.0], 2: [0.5, 1.0], 3: [0.25, 2.0]})
+        self.assertEqual(self.cache.stats()["hits"], 3)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_entries_are_keyed_by_model(self):
+        self.cache.put_many(["a"], [[0.5]], "model")
+        self.assertEqual(self.cache.get_many(["a"], "other-model"), {})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        # Each vector takes 4 bytes, so the cache holds at most 3 of them
+        cache = EmbeddingCache(path=self.cache.path, max_bytes=12)
+        cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]], "model")
+        cache.get_many(["a"], "model")
+        cache.put_many(["d"], [[4.0]], "model")
+        self.assertEqual(sorted(cache.get_many(["a", "b", "c", "d"], "model")), [0, 3])
@@ -1,12 +1,14 @@
 
 from agents.models import *
 from agents.openai_api import LLMFactory
+from agents.tests.local_stores import isolate_local_stores
 from companies.models import Company
 from django.test import TestCase
 
 
 class TestModels(TestCase):
     def setUp(self):
+        isolate_local_stores(self)
 
         self.bloktopia = LLMFactory("Bloktopia")
 
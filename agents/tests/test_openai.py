@@ -1,8 +1,38 @@
 from django.test import TestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
+from agents.answer_cache import get_answer_cache
+from agents.embedding_cache import get_embedding_cache
 from agents.models import LLM, RAGContext
 from companies.models import Company
 from agents.openai_api import LLMFactory
+from agents.tests.local_stores import isolate_local_stores
+from agents.rate_limit import BACKGROUND, INTERACTIVE, TokenBucketLimiter
+from agents.summary_cache import get_summary_cache
+from agents.summary_checks import AMBIGUOUS, CoverageCheck
+from agents.vector_store import embeddings_version, load_embeddings, save_embeddings
+from asgiref.sync import sync_to_async
+import asyncio
+import httpx
+import openai
+import threading
+import time
+
+
+def embedding_response(input: list, model: str) -> MagicMock:
+    return MagicMock(data=[MagicMock(index=i, embedding=[1.0, float(len(text))]) for i, text in enumerate(input)])
+
+
+def chat_completion(content: str) -> MagicMock:
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+
+def chat_chunks(*pieces: str) -> list:
+    return [MagicMock(choices=[MagicMock(delta=MagicMock(content=piece))]) for piece in pieces]
+
+
+async def async_stream(items: list):
+    for item in items:
+        yield item
 
 
 class LLMFactoryTest(TestCase):
@@ -13,35 +43,130 @@ class LLMFactoryTest(TestCase):
         self.factory = LLMFactory(company_name=self.company_name, model=self.model)
         self.company = Company.objects.create(name=self.company_name)
 
-    @patch("openai.ChatCompletion.create")
-    def test_generate_response(self, mock_create):
+        # No request leaves the tests: the shared clients are replaced by mocks
+        self.client = MagicMock()
+        self.async_client = MagicMock()
+        for name, client in (("get_client", self.client), ("get_async_client", self.async_client)):
+            client_patcher = patch(f"agents.openai_api.{name}", return_value=client)
+            client_patcher.start()
+            self.addCleanup(client_patcher.stop)
+        self.client.embeddings.create.side_effect = embedding_response
+        self.async_client.embeddings.create = AsyncMock(side_effect=embedding_response)
+
+        # Keep the caches and rate limits of the tests away from the real ones
+        self.directory = isolate_local_stores(self)
+        self.cache = get_embedding_cache()
+        self.summary_cache = get_summary_cache()
+        self.answer_cache = get_answer_cache()
+
+    def test_generate_response(self):
         # Mocking the response from OpenAI API
-        mock_create.return_value = {"choices": [{"message": {"content": "Test response"}}]}
+        mock_create = self.client.chat.completions.create
+        mock_create.return_value = chat_completion("Test response")
         response = self.factory.generate_response(prompt="Test prompt")
         self.assertEqual(response, "Test response")
         mock_create.assert_called_once()
 
-    @patch("openai.embeddings.create")
-    def test_create_text_embeddings(self, mock_create):
-        # Mocking the response from OpenAI Embedding API
-        mock_create.return_value = MagicMock()
-        mock_create.return_value.data = [MagicMock(embedding=[0.1, 0.2, 0.3])]
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_generate_response_includes_retrieved_context(self, mock_embeddings):
+        mock_create = self.client.chat.completions.create
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "The roadmap"}, {"content": "The token unlock"}, {"content": "The team"}]
+        rag_context.save()
+        save_embeddings(rag_context, [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+
+        mock_embeddings.return_value = [[0.1, 0.9]]
+        mock_create.return_value = chat_completion("Test response")
+        self.factory.generate_response(prompt="When is the token unlock?", num_documents=2)
+
+        mock_embeddings.assert_called_once_with(["When is the token unlock?"], priority=INTERACTIVE)
+        system_message = mock_create.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("The token unlock\nThe team", system_message)
+        self.assertNotIn("The roadmap", system_message)
+
+    def test_create_text_embeddings(self):
+        mock_create = self.client.embeddings.create
+        # Mocking the response from OpenAI Embedding API, one vector per input
+        mock_create.side_effect = lambda input, model: MagicMock(
+            data=[MagicMock(index=i, embedding=[0.1, 0.2, 0.3]) for i in range(len(input))]
+        )
         documents = ["Document 1", "Document 2"]
         embeddings = self.factory.create_text_embeddings(documents)
         self.assertEqual(len(embeddings), 2)
         self.assertEqual(embeddings[0], [0.1, 0.2, 0.3])
-        mock_create.assert_called()
+        # Both documents fit in a single batched request
+        mock_create.assert_called_once()
 
-    def test_save_rag_context_to_model(self):
+    def test_create_text_embeddings_uses_cache(self):
+        mock_create = self.client.embeddings.create
+        mock_create.side_effect = lambda input, model: MagicMock(
+            data=[MagicMock(index=i, embedding=[0.5, 0.25]) for i in range(len(input))]
+        )
+        self.factory.create_text_embeddings(["Document 1", "Document 2"])
+        embeddings = self.factory.create_text_embeddings(["Document 2", "Document 3", "Document 1"])
+        self.assertEqual(embeddings, [[0.5, 0.25]] * 3)
+        # Only the unseen document is sent on the second call
+        self.assertEqual(mock_create.call_args.kwargs["input"], ["Document 3"])
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        self.assertEqual(self.cache.stats()["misses"], 3)
+
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_save_rag_context_to_model(self, mock_embeddings):
         # Test saving RAG context to model
+        mock_embeddings.side_effect = lambda documents: [[0.1, 0.2] for _ in documents]
         context_name = "Test Context"
         context_documents = ["Doc 1", "Doc 2"]
         self.factory.save_rag_context_to_model(context_name, context_documents)
         rag_context = RAGContext.objects.get(name=context_name)
         self.assertEqual(rag_context.name, context_name)
-        self.assertEqual(rag_context.documents, context_documents)
+        self.assertEqual([doc["content"] for doc in rag_context.documents], context_documents)
+        self.assertEqual(rag_context.documents[1]["source"], {"index": 1, "start": 0, "end": 5})
         self.assertEqual(rag_context.llm.company.name, self.company_name)
 
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_save_rag_context_to_model_chunks_long_documents(self, mock_embeddings):
+        mock_embeddings.side_effect = lambda documents: [[0.1, 0.2] for _ in documents]
+        with open("resources/bloktopia_about.txt") as content:
+            self.factory.save_rag_context_to_model("Bloktopia", [content], max_tokens=200, overlap_tokens=20)
+
+        rag_context = RAGContext.objects.get(name="Bloktopia")
+        self.assertGreater(len(rag_context.documents), 1)
+        self.assertTrue(all(self.factory.get_token_count(doc["content"]) <= 220 for doc in rag_context.documents))
+        self.assertEqual(load_embeddings(rag_context).shape, (len(rag_context.documents), 2))
+
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_save_rag_context_to_model_embeds_a_batch_at_a_time(self, mock_embeddings):
+        batches = []
+
+        def embed(documents):
+            batches.append(list(documents))
+            return [[float(len(batches)), 0.0] for _ in batches[-1]]
+        mock_embeddings.side_effect = embed
+
+        self.factory.save_rag_context_to_model("Test Context", (f"Doc {i}" for i in range(5)), batch_size=2)
+
+        self.assertEqual(batches, [["Doc 0", "Doc 1"], ["Doc 2", "Doc 3"], ["Doc 4"]])
+        rag_context = RAGContext.objects.get(name="Test Context")
+        self.assertEqual([doc["content"] for doc in rag_context.documents], [f"Doc {i}" for i in range(5)])
+        self.assertEqual(load_embeddings(rag_context)[:, 0].tolist(), [1.0, 1.0, 2.0, 2.0, 3.0])
+
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_save_rag_context_to_model_keeps_documents_and_embeddings_in_step(self, mock_embeddings):
+        mock_embeddings.side_effect = lambda documents: [[0.1, 0.2] for _ in documents]
+        self.factory.save_rag_context_to_model("Test Context", ["Doc 1"])
+
+        # Nothing to embed, nothing appended
+        self.factory.save_rag_context_to_model("Test Context", [""])
+        # Embeddings that cannot be published leave the stored documents as they were
+        with patch("agents.openai_api.append_embeddings", side_effect=ValueError("No embeddings")):
+            with self.assertRaises(ValueError):
+                self.factory.save_rag_context_to_model("Test Context", ["Doc 2"])
+        self.factory.save_rag_context_to_model("Test Context", ["Doc 3"])
+
+        rag_context = RAGContext.objects.get(name="Test Context")
+        self.assertEqual([doc["content"] for doc in rag_context.documents], ["Doc 1", "Doc 3"])
+        self.assertEqual(load_embeddings(rag_context).shape, (2, 2))
+
     def test_get_llm(self):
         # Test retrieving or creating an LLM instance
         llm = self.factory._get_llm()
@@ -49,30 +174,376 @@ class LLMFactoryTest(TestCase):
         self.assertEqual(llm.company.name, self.company_name)
         self.assertEqual(llm.model, self.model)
 
-    @patch("openai.beta.threads.create")
-    def test_create_thread(self, mock_create):
+    def test_create_thread(self):
+        mock_create = self.client.beta.threads.create
         # Mocking the response from OpenAI API for creating a thread
         mock_create.return_value = {"id": "test_thread_id"}
         response = self.factory.create_thread()
         self.assertEqual(response["id"], "test_thread_id")
         mock_create.assert_called_once()
 
-    @patch("openai.beta.assistants.create")
-    def test_create_assistant(self, mock_create):
+    def test_create_assistant(self):
+        mock_create = self.client.beta.assistants.create
         # Mocking the response from OpenAI API for creating an assistant
         mock_create.return_value = {"id": "test_assistant_id"}
         response = self.factory.create_assistant(name="Test Assistant")
         self.assertEqual(response["id"], "test_assistant_id")
         mock_create.assert_called_once()
 
-    @patch("openai.beta.threads.runs.create")
-    def test_run(self, mock_run):
+    def test_run(self):
+        mock_run = self.client.beta.threads.runs.create
         # Mocking the response from OpenAI API for running a thread
         mock_run.return_value = {"id": "test_run_id", "result": "Run result"}
-        response = LLMFactory.run(thread_id="test_thread_id", assistant_id="test_assistant_id", prompt="Test prompt")
+        response = LLMFactory.run(thread_id="test_thread_id", assistant_id="test_assistant_id")
         self.assertEqual(response["id"], "test_run_id")
         self.assertEqual(response["result"], "Run result")
-        mock_run.assert_called_once()
+        mock_run.assert_called_once_with(thread_id="test_thread_id", assistant_id="test_assistant_id")
+
+    @patch("agents.openai_api.LLMFactory.summarize_document")
+    def test_summarize_rag_context(self, mock_summarize):
+        mock_summarize.side_effect = lambda document: {**document, "summary": document["content"].upper()}
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [
+            {"content": "first", "summary": ""},
+            {"content": "second", "summary": "Already done"},
+            {"content": "third", "summary": ""},
+        ]
+        rag_context.save()
+
+        summarized = self.factory.summarize_rag_context(rag_context, max_concurrency=2, documents_per_minute=6000,
+                                                        save_every=1)
+        self.assertEqual(summarized, 2)
+        self.assertEqual(mock_summarize.call_count, 2)
+        rag_context.refresh_from_db()
+        self.assertEqual([doc["summary"] for doc in rag_context.documents], ["FIRST", "Already done", "THIRD"])
+
+        # Nothing is left to do on a second run
+        self.assertEqual(self.factory.summarize_rag_context(rag_context), 0)
+
+    @patch("agents.openai_api.LLMFactory.summarize_document")
+    def test_summarize_rag_context_saves_the_summaries_of_the_other_documents(self, mock_summarize):
+        def summarize(document):
+            if document["content"] == "broken":
+                raise KeyError("content")
+            return {**document, "summary": document["content"].upper()}
+        mock_summarize.side_effect = summarize
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "first", "summary": ""}, {"content": "broken", "summary": ""},
+                                 {"content": "third", "summary": ""}]
+        rag_context.save()
+
+        self.assertEqual(self.factory.summarize_rag_context(rag_context, documents_per_minute=6000), 2)
+        rag_context.refresh_from_db()
+        self.assertEqual([doc["summary"] for doc in rag_context.documents], ["FIRST", "", "THIRD"])
+
+    @patch("agents.openai_api.LLMFactory.ask_assistant")
+    def test_reduce_content_keeps_short_content(self, mock_ask):
+        self.assertEqual(self.factory.reduce_content("A short text.", "summarizer", chunk_tokens=100), "A short text.")
+        mock_ask.assert_not_called()
+
+    @patch("agents.openai_api.LLMFactory.ask_assistant")
+    def test_reduce_content_combines_summaries_in_a_tree(self, mock_ask):
+        def ask(assistant_id, prompt, usage=None):
+            # Chunk summaries are too long to be joined all at once, combined summaries are short
+            return "part " * 20 if prompt.startswith("Summarize") else "combined"
+        mock_ask.side_effect = ask
+        content = " ".join(f"Sentence number {i} is here." for i in range(60))
+
+        reduced = self.factory.reduce_content(content, "summarizer", chunk_tokens=30, max_concurrency=2)
+
+        prompts = [call.args[1] for call in mock_ask.call_args_list]
+        chunk_prompts = [prompt for prompt in prompts if prompt.startswith("Summarize")]
+        self.assertGreater(len(chunk_prompts), 4)
+        self.assertTrue(all(self.factory.get_token_count(prompt) < 60 for prompt in chunk_prompts))
+        self.assertGreater(len(prompts), len(chunk_prompts))
+        self.assertLessEqual(self.factory.get_token_count(reduced), 30)
+        self.assertIn("combined", reduced)
+
+    @patch("agents.openai_api.check_summary", return_value=CoverageCheck(score=0.5, missing=[], verdict=AMBIGUOUS))
+    @patch("agents.openai_api.LLMFactory.get_assistant", side_effect=lambda name, description: name)
+    @patch("agents.openai_api.LLMFactory.ask_assistant")
+    def test_summarize_document_verifies_against_partial_summaries(self, mock_ask, mock_get_assistant, mock_check):
+        mock_ask.side_effect = lambda assistant_id, prompt, usage: (
+            "1" if assistant_id == "Verifier" else "Partial summary.")
+        content = " ".join(f"Raw sentence {i}." for i in range(60))
+
+        document = self.factory.summarize_document({"content": content}, chunk_tokens=40)
+
+        self.assertEqual(document["summary"], "Partial summary.")
+        verification_prompt = mock_ask.call_args_list[-1].args[1]
+        self.assertIn("Partial summary.", verification_prompt)
+        self.assertNotIn("Raw sentence", verification_prompt)
+
+    @patch("agents.openai_api.LLMFactory.get_assistant", side_effect=lambda name, description: name)
+    @patch("agents.openai_api.LLMFactory.ask_assistant")
+    def test_summarize_document_skips_verifier_when_coverage_is_clear(self, mock_ask, mock_get_assistant):
+        mock_ask.return_value = "Bloktopia opens the Skyscraper in March 2025 with Polygon and Reblok."
+        content = "Bloktopia opens the Skyscraper on Polygon in March 2025. Reblok lets players build on Bloktopia."
+
+        document = self.factory.summarize_document({"content": content})
+
+        mock_ask.assert_called_once()
+        self.assertEqual(document["summary_meta"]["outcome"], "verified")
+        self.assertEqual(document["summary_meta"]["verifier_calls"], 0)
+
+    @patch("agents.openai_api.LLMFactory.get_assistant", side_effect=lambda name, description: name)
+    @patch("agents.openai_api.LLMFactory.ask_assistant", return_value="Nothing relevant.")
+    def test_summarize_document_stops_after_max_attempts(self, mock_ask, mock_get_assistant):
+        content = "Bloktopia opens the Skyscraper on Polygon in March 2025. Reblok lets players build on Bloktopia."
+
+        document = self.factory.summarize_document({"content": content}, max_attempts=2)
+
+        self.assertEqual(mock_ask.call_count, 2)
+        self.assertEqual(document["summary"], "Nothing relevant.")
+        self.assertEqual(document["summary_meta"]["attempts"], 2)
+        self.assertEqual(document["summary_meta"]["outcome"], "unverified")
+        # Each retry is a fresh prompt naming what was missed, not a longer conversation
+        retry_prompt = mock_ask.call_args_list[1].args[1]
+        self.assertIn("bloktopia", retry_prompt)
+        self.assertEqual(retry_prompt.count(content), 1)
+
+    @patch("agents.openai_api.LLMFactory.run_to_completion")
+    @patch("agents.openai_api.LLMFactory.create_thread")
+    def test_ask_assistant_records_tokens(self, mock_create_thread, mock_run):
+        self.client.beta.threads.messages.list.return_value = MagicMock(data=[MagicMock(content=[MagicMock(text=MagicMock(value=" The reply "))])])
+        usage = []
+        self.assertEqual(self.factory.ask_assistant("assistant", "The prompt", usage), "The reply")
+        mock_create_thread.assert_called_once_with(messages=[{"role": "user", "content": "The prompt"}])
+        self.assertEqual(usage, [self.factory.get_token_count("The prompt"), self.factory.get_token_count("The reply")])
+
+    @patch("agents.openai_api.LLMFactory.get_assistant", side_effect=lambda name, description: name)
+    @patch("agents.openai_api.LLMFactory.ask_assistant")
+    def test_summarize_document_reuses_cached_summary(self, mock_ask, mock_get_assistant):
+        mock_ask.return_value = "Bloktopia opens the Skyscraper in March 2025 with Polygon and Reblok."
+        content = "Bloktopia opens the Skyscraper on Polygon in March 2025. Reblok lets players build on Bloktopia."
+        first = self.factory.summarize_document({"content": content})
+
+        second = self.factory.summarize_document({"content": content})
+
+        mock_ask.assert_called_once()
+        self.assertEqual(second["summary"], first["summary"])
+        self.assertTrue(second["summary_meta"]["cached"])
+
+    @patch("agents.openai_api.LLMFactory.summarize_document")
+    def test_summarize_rag_context_fills_cached_summaries_first(self, mock_summarize):
+        mock_summarize.side_effect = lambda document: {**document, "summary": document["content"].upper()}
+        self.summary_cache.put("first", self.model, "Cached first", {"outcome": "verified"})
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "first", "summary": ""}, {"content": "second", "summary": ""}]
+        rag_context.save()
+
+        self.assertEqual(self.factory.summarize_rag_context(rag_context, documents_per_minute=6000), 2)
+        mock_summarize.assert_called_once()
+        rag_context.refresh_from_db()
+        self.assertEqual([doc["summary"] for doc in rag_context.documents], ["Cached first", "SECOND"])
+
+    async def test_agenerate_response(self):
+        self.async_client.chat.completions.create = AsyncMock(return_value=chat_completion(" Async response "))
+        response = await self.factory.agenerate_response(prompt="Test prompt")
+        self.assertEqual(response, "Async response")
+        self.assertEqual(self.async_client.chat.completions.create.call_args.kwargs["model"], self.model)
+
+    async def test_agenerate_response_with_a_context_without_embeddings(self):
+        # An existing context is fetched with its legacy embeddings column deferred
+        llm = await LLM.objects.acreate(company=self.company, model=self.model)
+        await RAGContext.objects.acreate(llm=llm, documents=[], embeddings=[])
+        self.async_client.chat.completions.create = AsyncMock(return_value=chat_completion("Async response"))
+
+        response = await self.factory.agenerate_response(prompt="Test prompt", use_cache=False)
+
+        self.assertEqual(response, "Async response")
+
+    async def test_async_methods_use_the_caches_off_the_event_loop(self):
+        def save_context():
+            rag_context = self.factory._get_rag_context()
+            rag_context.documents = [{"content": "The token unlock is in May"}]
+            rag_context.save()
+            save_embeddings(rag_context, [[1.0, 25.0]])
+            self.summary_cache.put("The roadmap", self.model, "The roadmap, shortly", {"outcome": "verified"})
+        await sync_to_async(save_context)()
+        self.async_client.chat.completions.create = AsyncMock(return_value=chat_completion("In May"))
+        calls = []
+
+        def record(name, function):
+            def recorded(*args, **kwargs):
+                calls.append((name, threading.current_thread()))
+                return function(*args, **kwargs)
+            return recorded
+
+        with patch.object(self.cache, "get_many", record("get_many", self.cache.get_many)), \
+                patch.object(self.cache, "put_many", record("put_many", self.cache.put_many)), \
+                patch.object(self.summary_cache, "get", record("get", self.summary_cache.get)), \
+                patch("agents.openai_api.embeddings_version", record("embeddings_version", embeddings_version)):
+            await self.factory.agenerate_response("When is the token unlock?")
+            document = await self.factory.asummarize_document({"content": "The roadmap"})
+
+        self.assertEqual(document["summary"], "The roadmap, shortly")
+        self.assertEqual({name for name, _ in calls}, {"get_many", "put_many", "get", "embeddings_version"})
+        self.assertNotIn(threading.current_thread(), [thread for _, thread in calls])
+
+    async def test_acreate_text_embeddings(self):
+        self.async_client.embeddings.create = AsyncMock(side_effect=lambda input, model: MagicMock(
+            data=[MagicMock(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        ))
+        embeddings = await self.factory.acreate_text_embeddings(["a", "bb", "a"])
+        self.assertEqual(embeddings, [[1.0], [2.0], [1.0]])
+        self.assertEqual(self.async_client.embeddings.create.call_args.kwargs["input"], ["a", "bb"])
+
+    async def test_asummarize_document_runs_chunks_concurrently(self):
+        running, peak = 0, 0
+
+        async def ask(assistant_id, prompt, usage=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "Raw sentence summary."
+
+        content = " ".join(f"Raw sentence {i}." for i in range(60))
+        with patch.object(LLMFactory, "aget_assistant", AsyncMock(side_effect=lambda name, description: name)), \
+                patch.object(LLMFactory, "aask_assistant", side_effect=ask):
+            document = await self.factory.asummarize_document({"content": content}, chunk_tokens=40,
+                                                              max_concurrency=4)
+
+        self.assertEqual(document["summary"], "Raw sentence summary.")
+        self.assertEqual(peak, 4)
+
+    def test_generate_response_waits_out_rate_limits(self):
+        clock = [time.time()]
+        mock_sleep = MagicMock(side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+        time_patcher = patch.multiple("agents.rate_limit.time", time=lambda: clock[0], sleep=mock_sleep)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        rate_limited = openai.RateLimitError("Rate limit reached", body=None, response=httpx.Response(
+            429, headers={"retry-after": "2"}, request=httpx.Request("POST", "https://api.openai.com")
+        ))
+        self.client.chat.completions.create.side_effect = [rate_limited, chat_completion("Test response")]
+
+        response = self.factory.generate_response(prompt="Test prompt", use_context=False)
+
+        self.assertEqual(response, "Test response")
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+        self.assertAlmostEqual(sum(call.args[0] for call in mock_sleep.call_args_list), 2, delta=0.1)
+
+    def test_questions_are_embedded_ahead_of_background_work(self):
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "The token unlock is in May"}]
+        rag_context.save()
+        save_embeddings(rag_context, [[1.0, 25.0]])
+        self.client.chat.completions.create.return_value = chat_completion("In May")
+        # Ingestion drained the buckets down to the reserve left to interactive calls
+        limiter = TokenBucketLimiter("text-embedding-ada-002", requests_per_minute=60, tokens_per_minute=600,
+                                     path=f"{self.directory}/drained.sqlite3", reserve=0.5)
+        limiter._take(300, BACKGROUND)
+        mock_sleep = MagicMock()
+
+        with patch("agents.openai_api.get_rate_limiter", return_value=limiter), \
+                patch("agents.rate_limit.time.sleep", mock_sleep):
+            self.assertEqual(self.factory.generate_response("When is the token unlock?", answer_tokens=10), "In May")
+
+        self.client.embeddings.create.assert_called_once()
+        mock_sleep.assert_not_called()
+        self.assertGreater(limiter._take(10, BACKGROUND), 0)
+
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_generate_response_reuses_answers_to_similar_questions(self, mock_embeddings):
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "The token unlock is in May"}]
+        rag_context.save()
+        save_embeddings(rag_context, [[0.0, 1.0]])
+        self.client.chat.completions.create.return_value = chat_completion("In May")
+
+        mock_embeddings.return_value = [[0.1, 0.9]]
+        self.assertEqual(self.factory.generate_response("When is the token unlock?"), "In May")
+        mock_embeddings.return_value = [[0.11, 0.9]]
+        self.assertEqual(self.factory.generate_response("when token unlock??"), "In May")
+        self.client.chat.completions.create.assert_called_once()
+
+        # A different question, or the same one once the context changed, is answered again
+        mock_embeddings.return_value = [[0.9, 0.1]]
+        self.factory.generate_response("Who is on the team?")
+        save_embeddings(rag_context, [[0.0, 1.0]])
+        mock_embeddings.return_value = [[0.1, 0.9]]
+        self.factory.generate_response("When is the token unlock?")
+        self.assertEqual(self.client.chat.completions.create.call_count, 3)
+
+    async def test_agenerate_response_coalesces_identical_questions(self):
+        async def complete(**kwargs):
+            await asyncio.sleep(0.01)
+            return chat_completion("In May")
+        self.async_client.chat.completions.create = AsyncMock(side_effect=complete)
+
+        answers = await asyncio.gather(*(
+            self.factory.agenerate_response(question, use_context=False)
+            for question in ["When is the token unlock?", "when is the token unlock", "@bot When is the token unlock"]
+        ))
+
+        self.assertEqual(answers, ["In May"] * 3)
+        self.async_client.chat.completions.create.assert_called_once()
+
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_generate_response_does_not_embed_questions_without_context(self, mock_embeddings):
+        self.client.chat.completions.create.return_value = chat_completion("In May")
+
+        self.factory.generate_response("When is the token unlock?")
+        self.factory.generate_response("When is the token unlock?")
+
+        # Nothing to retrieve or key the answer cache on: the question is not embedded, and answered each time
+        mock_embeddings.assert_not_called()
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+    async def test_agenerate_response_does_not_embed_questions_without_context(self):
+        self.async_client.chat.completions.create = AsyncMock(return_value=chat_completion("In May"))
+
+        await self.factory.agenerate_response("When is the token unlock?")
+
+        self.async_client.embeddings.create.assert_not_awaited()
+
+    async def test_agenerate_response_shares_answers_of_a_bucket_only_with_similar_questions(self):
+        def save_context():
+            rag_context = self.factory._get_rag_context()
+            rag_context.documents = [{"content": "The token unlock is in May"}]
+            rag_context.save()
+            save_embeddings(rag_context, [[1.0, 0.0]])
+        await sync_to_async(save_context)()
+        questions = {"When is the unlock?": [1.0, 0.0], "When is the unlock again?": [0.99, 0.1],
+                     "Is the unlock delayed?": [0.8, 0.6]}
+
+        async def complete(messages, **kwargs):
+            await asyncio.sleep(0.01)
+            return chat_completion(f"About: {messages[-1]['content']}")
+        self.async_client.chat.completions.create = AsyncMock(side_effect=complete)
+
+        # Every question falls in the same bucket
+        with patch("agents.openai_api.embedding_bucket", return_value="0"), \
+                patch.object(LLMFactory, "acreate_text_embeddings",
+                             AsyncMock(side_effect=lambda documents, priority: [questions[documents[0]]])):
+            answers = await asyncio.gather(*(self.factory.agenerate_response(question) for question in questions))
+
+        self.assertEqual(answers, ["About: When is the unlock?"] * 2 + ["About: Is the unlock delayed?"])
+        self.assertEqual(self.async_client.chat.completions.create.await_count, 2)
+        # The borrowed answer is not cached under the question that borrowed it
+        self.assertEqual(self.answer_cache.stats()["entries"], 2)
+
+    def test_stream_response_yields_pieces_and_caches_the_answer(self):
+        rag_context = self.factory._get_rag_context()
+        rag_context.documents = [{"content": "The token unlock is in May"}]
+        rag_context.save()
+        save_embeddings(rag_context, [[1.0, 25.0]])
+        self.client.chat.completions.create.return_value = iter(chat_chunks("In ", None, "May"))
+
+        pieces = list(self.factory.stream_response("When is the token unlock?"))
+
+        self.assertEqual(pieces, ["In ", "May"])
+        self.assertTrue(self.client.chat.completions.create.call_args.kwargs["stream"])
+        # The answer was cached whole and is given again at once
+        self.assertEqual(list(self.factory.stream_response("When is the token unlock?")), ["In May"])
+        self.client.chat.completions.create.assert_called_once()
 
+    async def test_astream_response(self):
+        self.async_client.chat.completions.create = AsyncMock(return_value=async_stream(chat_chunks("In ", "May")))
 
+        pieces = [piece async for piece in self.factory.astream_response("When?", use_context=False)]
 
+        self.assertEqual(pieces, ["In ", "May"])
@@ -0,0 +1,97 @@
+from django.test import SimpleTestCase
+from unittest.mock import MagicMock, patch
+from agents.rate_limit import BACKGROUND, INTERACTIVE, RateLimiter, TokenBucketLimiter, rate_limits
+from agents.runs import RunError
+import asyncio
+import os
+import tempfile
+import time
+
+
+class TokenBucketLimiterTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = f"{self.directory.name}/rate_limits.sqlite3"
+
+    def limiter(self, **kwargs) -> TokenBucketLimiter:
+        return TokenBucketLimiter("gpt-4o", path=self.path, **{"requests_per_minute": 60,
+                                                                 "tokens_per_minute": 600, **kwargs})
+
+    def test_requests_are_limited_per_minute(self):
+        limiter = self.limiter(reserve=0)
+        self.assertTrue(all(limiter._take(0, BACKGROUND) == 0 for _ in range(60)))
+        # The bucket refills one request per second
+        self.assertAlmostEqual(limiter._take(0, BACKGROUND), 1, delta=0.1)
+
+    def test_tokens_are_limited_per_minute(self):
+        limiter = self.limiter(reserve=0)
+        self.assertEqual(limiter._take(500, BACKGROUND), 0)
+        self.assertAlmostEqual(limiter._take(200, BACKGROUND), 10, delta=0.1)
+
+    def test_background_calls_leave_a_reserve_to_interactive_calls(self):
+        limiter = self.limiter(reserve=0.5)
+        self.assertEqual(limiter._take(300, BACKGROUND), 0)
+        self.assertGreater(limiter._take(10, BACKGROUND), 0)
+        self.assertEqual(limiter._take(300, INTERACTIVE), 0)
+
+    def test_buckets_are_shared_between_processes(self):
+        self.limiter(reserve=0)._take(600, BACKGROUND)
+        other_worker = self.limiter(reserve=0)
+        self.assertGreater(other_worker._take(100, BACKGROUND), 0)
+
+    def test_rate_limited_runs_are_retried_after_a_pause(self):
+        clock = [time.time()]
+        mock_sleep = MagicMock(side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+        limiter = self.limiter()
+        run = MagicMock(id="run_1", thread_id="thread_1", status="failed")
+        run.last_error.code = "rate_limit_exceeded"
+        function = MagicMock(side_effect=[RunError(run), "done"])
+
+        with patch.multiple("agents.rate_limit.time", time=lambda: clock[0], sleep=mock_sleep):
+            self.assertEqual(limiter.call(function, tokens=10), "done")
+        self.assertEqual(function.call_count, 2)
+        # Without a Retry-After header the first pause lasts one second
+        self.assertAlmostEqual(sum(call.args[0] for call in mock_sleep.call_args_list), 1, delta=0.01)
+
+    def test_other_errors_are_raised(self):
+        run = MagicMock(id="run_1", thread_id="thread_1", status="failed")
+        run.last_error.code = "server_error"
+        with self.assertRaises(RunError):
+            self.limiter().call(MagicMock(side_effect=RunError(run)))
+
+    async def test_aacquire_leaves_the_event_loop_running(self):
+        limiter = self.limiter()
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        def slow_take(tokens, priority):
+            # The bucket file is locked by another process for a while
+            time.sleep(0.1)
+            return 0.0
+
+        ticker = asyncio.create_task(tick())
+        with patch.object(limiter, "_take", side_effect=slow_take):
+            await limiter.aacquire(10)
+        ticker.cancel()
+        self.assertGreater(ticks, 3)
+
+    @patch.dict(os.environ, {"OPENAI_RATE_LIMITS": "gpt-4o=10/1000, custom=5/50"})
+    def test_rate_limits_setting_overrides_defaults(self):
+        limits = rate_limits()
+        self.assertEqual(limits["gpt-4o"], (10, 1000))
+        self.assertEqual(limits["custom"], (5, 50))
+
+
+class RateLimiterTest(SimpleTestCase):
+    @patch("agents.rate_limit.time.sleep")
+    def test_calls_are_spaced_out(self, mock_sleep):
+        limiter = RateLimiter(per_minute=60)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 1, delta=0.1)
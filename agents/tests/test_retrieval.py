@@ -0,0 +1,27 @@
+from django.test import TestCase
+from agents.retrieval import top_k
+import numpy as np
+
+
+class TopKTest(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((1000, 16)).astype(np.float32)
+        self.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def test_returns_best_rows_in_order(self):
+        query = self.matrix[42] + 0.01
+        indices, scores = top_k(self.matrix, query, 5)
+        expected = np.argsort(self.matrix @ (query / np.linalg.norm(query)))[::-1][:5]
+        np.testing.assert_array_equal(indices, expected)
+        self.assertEqual(indices[0], 42)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_k_larger_than_matrix(self):
+        indices, _ = top_k(self.matrix[:3], self.matrix[0], 10)
+        self.assertEqual(sorted(indices), [0, 1, 2])
+
+    def test_empty_matrix(self):
+        indices, scores = top_k(np.empty((0, 0), dtype=np.float32), [1.0, 0.0], 5)
+        self.assertEqual(len(indices), 0)
+        self.assertEqual(len(scores), 0)
@@ -0,0 +1,66 @@
+from django.test import TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+from agents.runs import RunError, RunTimeoutError, RunWaiter
+import asyncio
+
+
+def make_run(status: str, run_id: str = "run_1") -> MagicMock:
+    return MagicMock(id=run_id, thread_id="thread_1", status=status, last_error=None)
+
+
+class RunWaiterTest(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.waiter = RunWaiter(client=self.client, timeout=5, initial_delay=0.001, max_delay=0.002)
+
+    def test_poll_until_completed(self):
+        self.client.beta.threads.runs.retrieve.side_effect = [make_run("in_progress"), make_run("completed")]
+        run = self.waiter.poll(make_run("queued"))
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(self.client.beta.threads.runs.retrieve.call_count, 2)
+
+    def test_poll_raises_on_terminal_errors(self):
+        for status in ("failed", "cancelled", "expired"):
+            self.client.beta.threads.runs.retrieve.side_effect = [make_run(status)]
+            with self.assertRaises(RunError) as raised:
+                self.waiter.poll(make_run("queued"))
+            self.assertEqual(raised.exception.run.status, status)
+
+    def test_poll_cancels_after_deadline(self):
+        self.client.beta.threads.runs.retrieve.return_value = make_run("in_progress")
+        waiter = RunWaiter(client=self.client, timeout=0.01, initial_delay=0.001, max_delay=0.002)
+        with self.assertRaises(RunTimeoutError):
+            waiter.poll(make_run("queued"))
+        self.client.beta.threads.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+
+    @patch("agents.runs.time.sleep")
+    def test_backoff_grows_up_to_max_delay(self, mock_sleep):
+        self.client.beta.threads.runs.retrieve.side_effect = [make_run("in_progress")] * 5 + [make_run("completed")]
+        waiter = RunWaiter(client=self.client, timeout=60, initial_delay=1, max_delay=4, jitter=0)
+        waiter.poll(make_run("queued"))
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [1, 2, 4, 4, 4, 4])
+
+    def test_stream_returns_final_run(self):
+        stream = self.client.beta.threads.runs.stream.return_value.__enter__.return_value
+        stream.__iter__.return_value = iter([MagicMock(), MagicMock()])
+        stream.get_final_run.return_value = make_run("completed")
+        run = self.waiter.stream(thread_id="thread_1", assistant_id="assistant_1")
+        self.assertEqual(run.status, "completed")
+
+    def test_stream_raises_on_failed_run(self):
+        stream = self.client.beta.threads.runs.stream.return_value.__enter__.return_value
+        stream.__iter__.return_value = iter([])
+        stream.get_final_run.return_value = make_run("failed")
+        with self.assertRaises(RunError):
+            self.waiter.stream(thread_id="thread_1", assistant_id="assistant_1")
+
+    def test_apoll_many_waits_on_one_loop(self):
+        async_client = MagicMock()
+        finished = {"run_1": make_run("completed", "run_1"), "run_2": make_run("failed", "run_2")}
+        async_client.beta.threads.runs.retrieve = AsyncMock(side_effect=lambda thread_id, run_id: finished[run_id])
+        waiter = RunWaiter(async_client=async_client, timeout=5, initial_delay=0.001)
+
+        runs = [make_run("queued", "run_1"), make_run("queued", "run_2")]
+        results = asyncio.run(waiter.apoll_many(runs, return_exceptions=True))
+        self.assertEqual(results[0].status, "completed")
+        self.assertIsInstance(results[1], RunError)
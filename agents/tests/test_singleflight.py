@@ -0,0 +1,108 @@
+from django.test import SimpleTestCase
+from concurrent.futures import ThreadPoolExecutor
+from agents.singleflight import AsyncSingleFlight, SingleFlight, embedding_bucket, normalize_question
+import asyncio
+import threading
+import time
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_concurrent_calls_share_one_call(self):
+        flights, release, calls = SingleFlight(), threading.Event(), []
+
+        def answer():
+            calls.append(1)
+            release.wait(5)
+            return "In May"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(flights.do, "unlock", answer) for _ in range(8)]
+            # Give every thread time to join the call in flight before it finishes
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, ["In May"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_reach_every_waiter_and_the_next_call_runs_again(self):
+        flights = SingleFlight()
+        with self.assertRaises(ValueError):
+            flights.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(flights.do("key", lambda: "ok"), "ok")
+
+    def test_async_calls_share_one_call(self):
+        flights, calls = AsyncSingleFlight(), []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "In May"
+
+        async def ask_many():
+            return await asyncio.gather(*(flights.do("unlock", answer) for _ in range(50)))
+
+        self.assertEqual(asyncio.run(ask_many()), ["In May"] * 50)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_errors_reach_every_waiter(self):
+        flights = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def ask_many():
+            return await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in asyncio.run(ask_many())))
+
+    def test_cancelling_the_first_caller_does_not_cancel_the_others(self):
+        flights, calls = AsyncSingleFlight(), []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "In May"
+
+        async def ask_and_leave():
+            leader = asyncio.create_task(flights.do("unlock", answer))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(flights.do("unlock", answer)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            # The client of the first caller went away
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*followers)
+
+        self.assertEqual(asyncio.run(ask_and_leave()), ["In May"] * 3)
+        self.assertEqual(len(calls), 1)
+
+    def test_the_call_is_cancelled_once_every_caller_is(self):
+        flights, finished = AsyncSingleFlight(), []
+
+        async def answer():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "In May"
+
+        async def ask_and_leave():
+            callers = [asyncio.create_task(flights.do("unlock", answer)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0.1)
+            # The next call starts afresh
+            return await flights.do("unlock", answer)
+
+        self.assertEqual(asyncio.run(ask_and_leave()), "In May")
+        self.assertEqual(len(finished), 1)
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("@LinkWhaleBot  When token UNLOCK??"), "when token unlock")
+
+    def test_embedding_bucket(self):
+        self.assertEqual(embedding_bucket([0.5, 0.25, 0.1]), embedding_bucket([0.51, 0.25, 0.1]))
+        self.assertNotEqual(embedding_bucket([0.5, 0.25, 0.1]), embedding_bucket([-0.5, -0.25, -0.1]))
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+from agents.summary_cache import SummaryCache
+import tempfile
+import time
+
+
+class SummaryCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = f"{self.directory.name}/summaries.sqlite3"
+        self.cache = SummaryCache(path=self.path, prompt_version="v1")
+
+    def test_get_many_returns_cached_fields_by_position(self):
+        self.cache.put("content", "gpt-4o", "summary", {"outcome": "verified"})
+
+        found = self.cache.get_many(["other", "content", "content"], "gpt-4o")
+
+        self.assertEqual(sorted(found), [1, 2])
+        self.assertEqual(found[1], {"summary": "summary", "summary_meta": {"outcome": "verified", "cached": True}})
+        self.assertEqual(self.cache.stats(), {"hits": 2, "misses": 1, "entries": 1})
+
+    def test_entries_are_per_model(self):
+        self.cache.put("content", "gpt-4o", "summary", {})
+        self.assertIsNone(self.cache.get("content", "gpt-4o-mini"))
+
+    def test_prompt_change_invalidates_entries(self):
+        self.cache.put("content", "gpt-4o", "summary", {})
+
+        updated = SummaryCache(path=self.path, prompt_version="v2")
+
+        self.assertIsNone(updated.get("content", "gpt-4o"))
+        # Processes still running the previous prompts keep their entries during a deploy
+        self.assertIsNotNone(SummaryCache(path=self.path, prompt_version="v1").get("content", "gpt-4o"))
+
+    def test_entries_of_unused_prompt_versions_are_evicted(self):
+        self.cache.put("old", "gpt-4o", "summary", {})
+        with patch("agents.summary_cache.time.time", return_value=time.time() - 3600):
+            self.cache.put("older", "gpt-4o", "summary", {})
+            SummaryCache(path=self.path, prompt_version="v0").put("oldest", "gpt-4o", "summary", {})
+
+        updated = SummaryCache(path=self.path, prompt_version="v2", stale_ttl=60)
+        updated.put("new", "gpt-4o", "summary", {})
+
+        # A version written to recently is kept whole, one left alone for longer than the TTL is dropped
+        self.assertEqual(updated.stats()["entries"], 3)
+        self.assertIsNotNone(self.cache.get("older", "gpt-4o"))
@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+from agents.summary_checks import AMBIGUOUS, FAIL, PASS, check_summary, key_terms
+
+
+CONTENT = ("Bloktopia is a decentralized vertical reality on Polygon. The Bloktopia Skyscraper has 21 levels, "
+           "and players earn BLOK tokens by building with Reblok. Tokens are staked for rewards.")
+
+
+class SummaryChecksTest(SimpleTestCase):
+    def test_key_terms_favour_names_and_figures(self):
+        terms = key_terms(CONTENT, limit=5)
+        self.assertEqual(terms[0], "bloktopia")
+        self.assertIn("token", terms)
+        self.assertNotIn("the", key_terms(CONTENT, limit=50))
+
+    def test_good_summary_passes(self):
+        summary = ("Bloktopia, a decentralized vertical reality on Polygon, has a 21 level Skyscraper where players "
+                   "earn and stake BLOK tokens for rewards by building with Reblok.")
+        check = check_summary(CONTENT, summary)
+        self.assertEqual(check.verdict, PASS)
+        self.assertGreaterEqual(check.score, 0.7)
+
+    def test_unrelated_summary_fails(self):
+        check = check_summary(CONTENT, "A game about cats.")
+        self.assertEqual(check.verdict, FAIL)
+        self.assertIn("bloktopia", check.missing)
+
+    def test_partial_summary_is_ambiguous(self):
+        check = check_summary(CONTENT, "Bloktopia is a Polygon game where players earn tokens.",
+                              pass_threshold=0.9, fail_threshold=0.1)
+        self.assertEqual(check.verdict, AMBIGUOUS)
+
+    def test_empty_summary_fails(self):
+        self.assertEqual(check_summary(CONTENT, "  ").verdict, FAIL)
@@ -0,0 +1,26 @@
+from django.test import TestCase
+from agents.tokenizer import count_tokens, count_tokens_batch, encode_batch, get_encoding
+from unittest.mock import patch
+
+
+class TokenizerTest(TestCase):
+    def setUp(self):
+        with open("resources/bloktopia_about.txt") as content:
+            self.documents = [line for line in content.read().splitlines() if line]
+
+    def test_encoding_is_built_once(self):
+        get_encoding("gpt-4")
+        with patch("agents.tokenizer.tiktoken.encoding_for_model") as mock_encoding_for_model:
+            self.assertIs(get_encoding("gpt-4"), get_encoding("gpt-4"))
+            mock_encoding_for_model.assert_not_called()
+
+    def test_batch_counts_match_single_counts(self):
+        counts = count_tokens_batch(self.documents * 3, num_threads=2)
+        self.assertEqual(counts.tolist(), [count_tokens(doc) for doc in self.documents * 3])
+
+    def test_encode_batch(self):
+        tokens = encode_batch(self.documents[:2])
+        self.assertEqual(tokens, [get_encoding().encode_ordinary(doc) for doc in self.documents[:2]])
+
+    def test_special_tokens_are_counted_as_text(self):
+        self.assertGreater(count_tokens("<|endoftext|>"), 1)
@@ -0,0 +1,60 @@
+from django.core.management import call_command
+from django.test import TestCase
+from unittest.mock import patch
+from agents.models import LLM, RAGContext
+from agents.vector_store import embeddings_path, load_embeddings, save_embeddings
+from companies.models import Company
+from io import StringIO
+import numpy as np
+import os
+import tempfile
+
+
+class VectorStoreTest(TestCase):
+    def setUp(self):
+        self.embeddings_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.embeddings_dir.cleanup)
+        env_patcher = patch.dict(os.environ, {"EMBEDDINGS_DIR": self.embeddings_dir.name})
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+        company = Company.objects.create(name="Test Company")
+        self.llm = LLM.objects.create(company=company)
+
+    def test_save_and_load_embeddings(self):
+        rag_context = RAGContext.objects.create(name="Test Context", documents=[], embeddings=[], llm=self.llm)
+        save_embeddings(rag_context, [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+        matrix = load_embeddings(rag_context)
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertEqual(matrix.shape, (2, 3))
+        np.testing.assert_allclose(matrix[1], [0.4, 0.5, 0.6], rtol=1e-6)
+
+    def test_loaded_matrix_is_shared_until_replaced(self):
+        rag_context = RAGContext.objects.create(name="Test Context", documents=[], embeddings=[], llm=self.llm)
+        save_embeddings(rag_context, [[0.1, 0.2]])
+        matrix = load_embeddings(rag_context)
+        self.assertIsInstance(matrix, np.memmap)
+        self.assertFalse(matrix.flags.writeable)
+        self.assertIs(load_embeddings(rag_context), matrix)
+
+        save_embeddings(rag_context, [[0.1, 0.2], [0.3, 0.4]])
+        self.assertEqual(load_embeddings(rag_context).shape, (2, 2))
+        # The previous mapping still reads the version it was opened on
+        self.assertEqual(matrix.shape, (1, 2))
+
+    def test_legacy_json_embeddings_are_migrated_on_load(self):
+        rag_context = RAGContext.objects.create(name="Test Context", documents=[], embeddings=[[0.5, 0.25]],
+                                                llm=self.llm)
+        matrix = load_embeddings(rag_context)
+        np.testing.assert_array_equal(matrix, [[0.5, 0.25]])
+        self.assertTrue(embeddings_path(rag_context).exists())
+        rag_context.refresh_from_db()
+        self.assertEqual(rag_context.embeddings, [])
+
+    def test_migrate_embeddings_command(self):
+        rag_context = RAGContext.objects.create(name="Test Context", documents=[], embeddings=[[0.5, 0.25]],
+                                                llm=self.llm)
+        call_command("migrate_embeddings", stdout=StringIO())
+        rag_context.refresh_from_db()
+        self.assertEqual(rag_context.embeddings, [])
+        np.testing.assert_array_equal(load_embeddings(rag_context), [[0.5, 0.25]])
@@ -0,0 +1,80 @@
+from decouple import config
+import numpy as np
+import threading
+import tiktoken
+
+
+# Documents are encoded in slices so the token lists of a huge batch never all live in memory at once
+BATCH_SLICE_SIZE = 4096
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
+    """
+    Return the tiktoken encoding of a model, building it only once per process.
+
+    Args:
+        model (str): The model whose encoding to return. Defaults to "gpt-4".
+
+    Returns:
+        tiktoken.Encoding: The encoding of the model.
+    """
+    encoding = _encodings.get(model)
+    if encoding is None:
+        with _encodings_lock:
+            encoding = _encodings.get(model)
+            if encoding is None:
+                encoding = _encodings[model] = tiktoken.encoding_for_model(model)
+    return encoding
+
+
+def count_tokens(document: str, model: str = "gpt-4") -> int:
+    """
+    Count the tokens of a document. Special token markers in the text are counted as plain text.
+
+    Args:
+        document (str): The document for which to count tokens.
+        model (str): The model whose encoding to use. Defaults to "gpt-4".
+
+    Returns:
+        int: The number of tokens in the document.
+    """
+    return len(get_encoding(model).encode_ordinary(document))
+
+
+def encode_batch(documents: list, model: str = "gpt-4", num_threads: int = None) -> list:
+    """
+    Encode many documents at once, spreading the work over tiktoken's native threads.
+
+    Args:
+        documents (list): The documents to encode.
+        model (str): The model whose encoding to use. Defaults to "gpt-4".
+        num_threads (int, optional): Number of encoding threads. Defaults to the TOKENIZER_THREADS setting.
+
+    Returns:
+        list: The tokens of each document.
+    """
+    num_threads = num_threads or config("TOKENIZER_THREADS", default=8, cast=int)
+    return get_encoding(model).encode_ordinary_batch(list(documents), num_threads=num_threads)
+
+
+def count_tokens_batch(documents: list, model: str = "gpt-4", num_threads: int = None) -> np.ndarray:
+    """
+    Count the tokens of many documents at once.
+
+    Args:
+        documents (list): The documents for which to count tokens.
+        model (str): The model whose encoding to use. Defaults to "gpt-4".
+        num_threads (int, optional): Number of encoding threads. Defaults to the TOKENIZER_THREADS setting.
+
+    Returns:
+        np.ndarray: The token count of each document.
+    """
+    documents = list(documents)
+    counts = np.empty(len(documents), dtype=np.int64)
+    for start in range(0, len(documents), BATCH_SLICE_SIZE):
+        tokens = encode_batch(documents[start:start + BATCH_SLICE_SIZE], model, num_threads)
+        counts[start:start + len(tokens)] = [len(document_tokens) for document_tokens in tokens]
+    return counts
@@ -0,0 +1,228 @@
+from agents.ann_index import IVFIndex
+from agents.models import RAGContext
+from decouple import config
+from pathlib import Path
+import numpy as np
+import os
+import threading
+
+
+# Files mapped by this process, keyed by path, along with the identity of the file they were read from
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def embeddings_path(rag_context: RAGContext) -> Path:
+    """
+    Location of the float32 embedding matrix of a RAG context.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the embeddings.
+
+    Returns:
+        Path: Path of the `.npy` file next to the other contexts' embeddings.
+    """
+    return Path(config("EMBEDDINGS_DIR", default="var/embeddings")) / f"{rag_context.pk}.npy"
+
+
+def save_embeddings(rag_context: RAGContext, embeddings) -> np.ndarray:
+    """
+    Write the embeddings of a RAG context as a packed float32 matrix, one row per document.
+    The file is replaced atomically, so processes mapping the previous version keep reading it consistently
+    until they pick up the new one.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the embeddings.
+        embeddings: A list of embeddings or a 2D array.
+
+    Returns:
+        np.ndarray: The stored matrix.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.size == 0:
+        matrix = matrix.reshape(0, 0)
+
+    _publish(embeddings_path(rag_context), lambda file: np.save(file, matrix))
+    return matrix
+
+
+def append_embeddings(rag_context: RAGContext, embeddings, start: int) -> np.ndarray:
+    """
+    Write the embeddings of documents added to a RAG context after its first `start` documents.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the embeddings.
+        embeddings: The embeddings of the added documents.
+        start (int): Number of documents the context held before.
+
+    Returns:
+        np.ndarray: The stored matrix, including the rows that were already there.
+    """
+    added = np.asarray(embeddings, dtype=np.float32)
+    if start == 0:
+        return save_embeddings(rag_context, added)
+
+    existing = load_embeddings(rag_context)
+    if existing.shape[0] < start:
+        raise ValueError(f"RAG context {rag_context.pk} has {existing.shape[0]} stored embeddings, expected {start}")
+    return save_embeddings(rag_context, np.vstack([existing[:start], added]))
+
+
+def load_embeddings(rag_context: RAGContext) -> np.ndarray:
+    """
+    Load the embedding matrix of a RAG context.
+    The file is memory-mapped read-only, so every worker process on the host shares the same pages of the
+    page cache instead of holding its own copy. The mapping is reused until a new version is published.
+    Contexts still holding their embeddings in the legacy JSON column are migrated on first load.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the embeddings.
+
+    Returns:
+        np.ndarray: A read-only float32 matrix with one row per document.
+    """
+    matrix = _load(embeddings_path(rag_context), lambda path: np.load(path, mmap_mode="r"))
+    if matrix is not None:
+        return matrix
+
+    if rag_context.embeddings:
+        return migrate_embeddings(rag_context)
+
+    return np.empty((0, 0), dtype=np.float32)
+
+
+def embeddings_version(rag_context: RAGContext) -> str:
+    """
+    Identify the current version of the embeddings of a RAG context. The version changes every time embeddings
+    are published, in whichever process, so it tells whether the documents of the context changed.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the embeddings.
+
+    Returns:
+        str: The identity of the embedding file, or "none" if the context has no embeddings yet.
+    """
+    try:
+        stat = os.stat(embeddings_path(rag_context))
+    except FileNotFoundError:
+        return "none"
+    return f"{rag_context.pk}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def migrate_embeddings(rag_context: RAGContext) -> np.ndarray:
+    """
+    Move the embeddings of a RAG context from the legacy JSON column to its binary file and clear the column.
+
+    Args:
+        rag_context (RAGContext): The RAG context to migrate.
+
+    Returns:
+        np.ndarray: The migrated matrix.
+    """
+    matrix = save_embeddings(rag_context, rag_context.embeddings)
+    rag_context.embeddings = []
+    rag_context.save(update_fields=["embeddings"])
+    return matrix
+
+
+def index_path(rag_context: RAGContext) -> Path:
+    """
+    Location of the approximate nearest-neighbour index of a RAG context.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the index.
+
+    Returns:
+        Path: Path of the `.npz` file next to the context's embeddings.
+    """
+    return Path(config("EMBEDDINGS_DIR", default="var/embeddings")) / f"{rag_context.pk}.ivf.npz"
+
+
+def load_index(rag_context: RAGContext) -> IVFIndex:
+    """
+    Load the approximate nearest-neighbour index of a RAG context.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the index.
+
+    Returns:
+        IVFIndex: The index, or None if the context is too small to have one.
+    """
+    return _load(index_path(rag_context), IVFIndex.load)
+
+
+def update_index(rag_context: RAGContext, matrix: np.ndarray) -> IVFIndex:
+    """
+    Bring the approximate nearest-neighbour index of a RAG context up to date with its embedding matrix.
+    New rows are added to the existing lists; the index is retrained once the context has grown well beyond
+    the vectors its centroids were fitted on.
+
+    Args:
+        rag_context (RAGContext): The RAG context owning the index.
+        matrix (np.ndarray): The full embedding matrix of the context.
+
+    Returns:
+        IVFIndex: The updated index, or None if the context is too small to need one.
+    """
+    if matrix.shape[0] < config("ANN_MIN_VECTORS", default=20000, cast=int):
+        return None
+
+    # Work on a private copy, the cached index may be in use by other threads
+    path = index_path(rag_context)
+    index = IVFIndex.load(path) if path.exists() else None
+    if index is None or len(index) > matrix.shape[0] or index.needs_training(matrix.shape[0]):
+        index = IVFIndex(n_lists=IVFIndex.lists_for(matrix.shape[0]))
+        index.train(matrix)
+    elif len(index) < matrix.shape[0]:
+        index.add(matrix[len(index):])
+
+    _publish(path, index.save)
+    return index
+
+
+def _publish(path: Path, write) -> None:
+    """
+    Write a file next to its destination and atomically swap it in.
+
+    Args:
+        path (Path): The destination of the file.
+        write: Function writing the content of the file to an open binary file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def _load(path: Path, read):
+    """
+    Read a published file, reusing what this process read before unless the file was replaced since.
+
+    Args:
+        path (Path): The file to read.
+        read: Function reading the file from its path.
+
+    Returns:
+        The result of `read`, or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+
+    value = read(path)
+    with _loaded_lock:
+        _loaded[path] = (identity, value)
+    return value
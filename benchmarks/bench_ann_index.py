@@ -0,0 +1,53 @@
+"""
+Measure recall@k and query latency of the IVF index against exact search on synthetic clustered embeddings.
+
+Usage:
+    python -m benchmarks.bench_ann_index [vectors] [dimensions]
+"""
+from agents.ann_index import IVFIndex
+from agents.retrieval import top_k
+import sys
+import time
+import numpy as np
+
+
+K = 10
+QUERIES = 100
+
+
+def clustered_vectors(size: int, dimensions: int, clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=size)]
+    vectors += 0.5 * rng.standard_normal((size, dimensions), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed(search, queries) -> tuple:
+    start = time.perf_counter()
+    results = [search(query)[0] for query in queries]
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main(size: int = 200000, dimensions: int = 256) -> None:
+    matrix = clustered_vectors(size, dimensions)
+    queries = clustered_vectors(QUERIES, dimensions, seed=1)
+
+    start = time.perf_counter()
+    index = IVFIndex(n_lists=IVFIndex.lists_for(size))
+    index.train(matrix)
+    print(f"{size} vectors x {dimensions} dimensions, {index.n_lists} lists, trained in "
+          f"{time.perf_counter() - start:.1f} s")
+
+    exact, exact_latency = timed(lambda query: top_k(matrix, query, K), queries)
+    print(f"{'search':<14}{f'recall@{K}':>10}{'latency (ms)':>14}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_latency * 1000:>14.2f}")
+
+    for nprobe in (4, 8, 16, 32, 64):
+        approximate, latency = timed(lambda query: index.search(matrix, query, K, nprobe=nprobe), queries)
+        recall = np.mean([len(set(a) & set(e)) / K for a, e in zip(approximate, exact)])
+        print(f"{f'ivf nprobe={nprobe}':<14}{recall:>10.3f}{latency * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
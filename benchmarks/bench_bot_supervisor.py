@@ -0,0 +1,71 @@
+"""
+Measure the start time, memory and file descriptors per bot of a BotSupervisor hosting many bots on one event
+loop, polling a fake Telegram API served from another process.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=_settings.settings python -m benchmarks.bench_bot_supervisor [bots]
+"""
+from multiprocessing import Process, Queue
+import asyncio
+import django
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+
+def serve_fake_telegram(urls: Queue) -> None:
+    from telegram_api.tests.fake_telegram import FakeTelegram
+    telegram = FakeTelegram(max_poll=10).start()
+    urls.put(telegram.url)
+    while True:
+        time.sleep(60)
+
+
+async def measure(bots: int) -> None:
+    from telegram_api.supervisor import BotSupervisor, open_fds, resident_memory
+
+    names = [f"bench{i}" for i in range(bots)]
+    for i, name in enumerate(names):
+        os.environ[f"BOT_KEY_{name.upper()}"] = f"{i}:token"
+
+    supervisor = BotSupervisor(polling_pool_size=bots + 8)
+    rss, fds = resident_memory(), open_fds()
+    tracemalloc.start()
+    start = time.perf_counter()
+    failed = await supervisor.start(names)
+    elapsed = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Let every bot settle into its long poll
+    await asyncio.sleep(1)
+    stats = supervisor.stats()
+
+    print(f"{bots} bots started in {elapsed:.2f} s, {len(failed)} failed")
+    print(f"{'':<22}{'total':>12}{'per bot':>12}")
+    print(f"{'python heap (KiB)':<22}{heap / 1024:>12.0f}{heap / 1024 / bots:>12.1f}")
+    print(f"{'resident memory (KiB)':<22}{(stats['rss'] - rss) / 1024:>12.0f}"
+          f"{(stats['rss'] - rss) / 1024 / bots:>12.1f}")
+    print(f"{'file descriptors':<22}{stats['open_fds'] - fds:>12}{(stats['open_fds'] - fds) / bots:>12.2f}")
+    await supervisor.close()
+
+
+def main(bots: int = 200) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "_settings.settings")
+    django.setup()
+    # Polls cut short by the shutdown are reported by the library, they are expected here
+    logging.getLogger("telegram").setLevel(logging.CRITICAL)
+
+    urls = Queue()
+    server = Process(target=serve_fake_telegram, args=(urls,), daemon=True)
+    server.start()
+    os.environ["TELEGRAM_API_URL"] = urls.get(timeout=10)
+    try:
+        asyncio.run(measure(bots))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
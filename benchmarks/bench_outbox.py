@@ -0,0 +1,87 @@
+"""
+Compare sending a burst of messages straight to the Telegram API with sending them through an Outbox, against a
+fake API that enforces Telegram's flood limits: one message per second to a chat and 30 per second overall, with
+a 429 answer and a retry delay beyond them.
+
+Usage:
+    python -m benchmarks.bench_outbox [chats] [messages_per_chat]
+"""
+from telegram.error import RetryAfter
+from telegram_api.outbox import Outbox
+import asyncio
+import sys
+import time
+
+
+class RateLimitedTelegram:
+    """
+    Fake client whose `send_message` refuses messages beyond the flood limits like the Telegram API does.
+    """
+
+    def __init__(self, per_second: int = 30, chat_interval: float = 1.0, latency: float = 0.02) -> None:
+        self.token = "bench"
+        self.per_second = per_second
+        self.chat_interval = chat_interval
+        self.latency = latency
+        self.delivered = 0
+        self.refused = 0
+        self._recent = []
+        self._last_sent = {}
+
+    async def send_message(self, chat_id: int, text: str, **options) -> dict:
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        self._recent = [sent_at for sent_at in self._recent if now - sent_at < 1]
+        retry_after = 0.0
+        if len(self._recent) >= self.per_second:
+            retry_after = 1 - (now - self._recent[0])
+        if now - self._last_sent.get(chat_id, -self.chat_interval) < self.chat_interval:
+            retry_after = max(retry_after, self.chat_interval - (now - self._last_sent[chat_id]))
+        if retry_after > 0:
+            self.refused += 1
+            # Telegram rounds the delay up to whole seconds
+            raise RetryAfter(int(retry_after) + 1)
+        self._recent.append(now)
+        self._last_sent[chat_id] = now
+        self.delivered += 1
+        return {"chat_id": chat_id, "text": text}
+
+
+async def send_directly(client: RateLimitedTelegram, chat_id: int, text: str) -> None:
+    # What a handler without a queue does: send, and sleep through each flood error
+    while True:
+        try:
+            return await client.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def run(label: str, chats: int, per_chat: int, outboxed: bool, merge_chars: int = None) -> None:
+    client = RateLimitedTelegram()
+    start = time.perf_counter()
+    sends = [(chat_id, f"Update {i} for chat {chat_id}") for i in range(per_chat) for chat_id in range(chats)]
+    if outboxed:
+        async with Outbox(client, per_second=client.per_second, chat_interval=client.chat_interval,
+                          merge_chars=merge_chars) as outbox:
+            await asyncio.gather(*(outbox.send(chat_id, text) for chat_id, text in sends))
+    else:
+        await asyncio.gather(*(send_directly(client, chat_id, text) for chat_id, text in sends))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16}{len(sends):>8}{client.delivered:>8}{client.refused:>8}{elapsed:>11.2f}"
+          f"{len(sends) / elapsed:>11.1f}")
+
+
+async def measure(chats: int, per_chat: int) -> None:
+    # Sent counts the messages Telegram received, which carry several queued ones once merged
+    print(f"{'':<16}{'queued':>8}{'sent':>8}{'429s':>8}{'time (s)':>11}{'queued/s':>11}")
+    await run("direct", chats, per_chat, outboxed=False)
+    await run("outbox, unmerged", chats, per_chat, outboxed=True, merge_chars=0)
+    await run("outbox", chats, per_chat, outboxed=True)
+
+
+def main(chats: int = 60, per_chat: int = 5) -> None:
+    asyncio.run(measure(chats, per_chat))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,48 @@
+"""
+Measure token counting throughput on the Bloktopia corpus repeated to many documents.
+Compares a fresh encoding lookup per call (the former get_token_count), the cached encoding, and batched counting.
+
+Usage:
+    python -m benchmarks.bench_tokenizer [documents] [threads]
+"""
+from agents.tokenizer import count_tokens, count_tokens_batch
+from itertools import cycle, islice
+import sys
+import time
+import tiktoken
+
+
+def corpus(size: int) -> list:
+    with open("resources/bloktopia_about.txt") as content:
+        paragraphs = [line for line in content.read().splitlines() if line.strip()]
+    return list(islice(cycle(paragraphs), size))
+
+
+def uncached_count(document: str) -> int:
+    return len(tiktoken.encoding_for_model("gpt-4").encode(document))
+
+
+def main(size: int = 100000, threads: int = 8) -> None:
+    documents = corpus(size)
+    megabytes = sum(len(doc.encode()) for doc in documents) / 1e6
+    # Build the encoding up front so its one-off loading time is not measured
+    count_tokens("warm up")
+
+    print(f"{size} documents, {megabytes:.1f} MB")
+    print(f"{'method':<24}{'time (s)':>10}{'docs/s':>12}{'MB/s':>8}")
+    runs = (
+        ("lookup per call", lambda: [uncached_count(doc) for doc in documents]),
+        ("cached encoding", lambda: [count_tokens(doc) for doc in documents]),
+        (f"batch, {threads} threads", lambda: count_tokens_batch(documents, num_threads=threads)),
+    )
+    for name, run in runs:
+        start = time.perf_counter()
+        counts = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24}{elapsed:>10.2f}{size / elapsed:>12.0f}{megabytes / elapsed:>8.1f}")
+
+    print(f"{int(sum(counts))} tokens")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,53 @@
+"""
+Compare loading RAG context embeddings from the legacy JSON column with loading the float32 .npy files.
+
+Usage:
+    python -m benchmarks.bench_vector_store [documents] [dimensions]
+"""
+from pathlib import Path
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+
+def measure(load) -> tuple:
+    """
+    Report the wall time of a loader and, in a separate run since tracing slows it down, its peak Python heap.
+    """
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(documents: int = 5000, dimensions: int = 1536) -> None:
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((documents, dimensions)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory) / "embeddings.json"
+        npy_path = Path(directory) / "embeddings.npy"
+        # The JSON column holds the float64 values returned by the API
+        json_path.write_text(json.dumps(embeddings.astype(np.float64).tolist()))
+        np.save(npy_path, embeddings)
+
+        json_time, json_peak = measure(lambda: np.asarray(json.loads(json_path.read_text()), dtype=np.float32))
+        npy_time, npy_peak = measure(lambda: np.load(npy_path))
+
+        print(f"{documents} embeddings x {dimensions} dimensions")
+        print(f"{'format':<8}{'size (MB)':>12}{'load (ms)':>12}{'peak heap (MB)':>16}")
+        for name, path, elapsed, peak in (("json", json_path, json_time, json_peak),
+                                          ("npy", npy_path, npy_time, npy_peak)):
+            print(f"{name:<8}{path.stat().st_size / 1e6:>12.1f}{elapsed * 1000:>12.1f}{peak / 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
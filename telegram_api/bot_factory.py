@@ -1,54 +1,163 @@
+from agents.openai_api import LLMFactory
 from decouple import config
+from telegram_api.history import agroup_messages, asave_messages, asave_updates, export_to_rag_context, \
+    group_messages, save_messages
+from telegram_api.models import BotIdentity
+from telegram_api.outbox import BROADCAST, Outbox, get_outbox
+from telegram_api.streaming import StreamingReply
 import telegram
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackContext
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters, \
+    CallbackContext
 from telegram import Update, Document
 import asyncio
 
 
+def api_url() -> str:
+    """
+    Base URL of the Telegram Bot API, to be followed by the bot token.
+
+    Returns:
+        str: The TELEGRAM_API_URL setting, which may point to a local Bot API server.
+    """
+    return config("TELEGRAM_API_URL", default="https://api.telegram.org/bot")
+
+
+class MentionFilter(filters.MessageFilter):
+    """
+    Messages starting with a mention of a bot. The username is read when filtering, so the filter can be built
+    before the identity of the bot is loaded.
+    """
+
+    def __init__(self, factory: "TelegramBotFactory") -> None:
+        super().__init__(name="MentionFilter")
+        self.factory = factory
+
+    def filter(self, message: telegram.Message) -> bool:
+        return bool(message.text) and message.text.startswith(f"@{self.factory.bot_username}")
+
+
 class TelegramBotFactory:
 
     """
     Factory class to create instances of Telegram bots.
     Each bot instance uses a unique key provided by the Telegram Bot API and can automatically retrieve the group ID.
+    Creating a factory does no I/O: the key is read on first use and the identity of the bot (its username and
+    group ID) is loaded from the database, or from Telegram for a bot never seen before, by `load_identity`.
     """
 
-    def __init__(self, bot: str, group_id: str = None) -> None:
+    def __init__(self, bot: str, group_id: str = None, bot_username: str = None, client: telegram.Bot = None) -> None:
 
         """
-        Initialize the factory by loading the Telegram bot key from the .env file.
+        Initialize the factory. The Telegram bot key is loaded from the .env file when first needed.
 
         Args:
             bot (str): The name identifier of the bot.
-            group_id (str, optional): The Telegram group chat ID. Defaults to None.
+            group_id (str, optional): The Telegram group chat ID. Defaults to the one stored for the bot.
+            bot_username (str, optional): The username of the bot, when already known. Defaults to the one stored
+                for the bot.
+            client (telegram.Bot, optional): Client of the bot, e.g. one sharing its connection pools with other
+                bots. Defaults to the client of the bot's application.
         """
 
-        try:
-            self.bot_key: str = config(f'BOT_KEY_{bot.upper()}')
-            self.client: telegram.Bot = telegram.Bot(token=self.bot_key)
-            self.group_id: str = group_id if group_id is not None else None
+        self.bot = bot
+        self.group_id: str = group_id
+        self.shared_client = client is not None
+        self._client: telegram.Bot = client
+        self._bot_username: str = bot_username
+        # Concurrent first uses wait for a single lookup of the identity
+        self._identity_lock = asyncio.Lock()
 
-            # Use asyncio to run get_me and retrieve the bot username
-            self.bot_username: str = asyncio.get_event_loop().run_until_complete(self.client.get_me()).username
+        # List of accepted usernames for direct message interaction
+        self.accepted_usernames = ["admin_username1", "admin_username2"]
 
-            # If group_id is None, try to automatically retrieve it from updates
-            if self.group_id is None:
-                self.group_id = self._retrieve_group_id()
+    @property
+    def bot_key(self) -> str:
+        """
+        The Telegram bot key, from the BOT_KEY_<BOT> setting.
+        """
+        return config(f'BOT_KEY_{self.bot.upper()}')
 
-            # List of accepted usernames for direct message interaction
-            self.accepted_usernames = ["admin_username1", "admin_username2"]
+    @property
+    def client(self) -> telegram.Bot:
+        """
+        The client of the bot, created on first use.
+        """
+        if self._client is None:
+            self._client = telegram.Bot(token=self.bot_key, base_url=api_url())
+        return self._client
 
-        except Exception as e:
-            print(f"Error initializing bot for {bot}: {e}")
+    @property
+    def bot_username(self) -> str:
+        """
+        The username of the bot. Code running on an event loop awaits `load_identity` before reading it; elsewhere
+        the identity is loaded on first use.
+        """
+        if self._bot_username is None:
+            identity = BotIdentity.objects.filter(bot=self.bot).first()
+            if identity is None:
+                # No event loop runs here, the lookup gets one of its own
+                identity = asyncio.run(self._fetch_identity_with_own_client())
+            self._apply_identity(identity)
+        return self._bot_username
+
+    async def load_identity(self) -> str:
+        """
+        Load the username and group ID of the bot once: from the database, or from Telegram if the bot was never
+        seen before. Concurrent callers share a single lookup.
 
-    def _retrieve_group_id(self) -> str:
+        Returns:
+            str: The username of the bot.
+        """
+        if self._bot_username is not None:
+            return self._bot_username
+        async with self._identity_lock:
+            if self._bot_username is None:
+                identity = await BotIdentity.objects.filter(bot=self.bot).afirst()
+                if identity is None:
+                    identity = await self._fetch_identity(self.client)
+                self._apply_identity(identity)
+        return self._bot_username
+
+    async def _fetch_identity(self, client: telegram.Bot) -> BotIdentity:
+        """
+        Look the bot up on Telegram and store its identity.
+        """
+        try:
+            # An initialized client already looked the bot up
+            me = client.bot
+        except RuntimeError:
+            me = await client.get_me()
+        group_id = self.group_id if self.group_id is not None else await self._retrieve_group_id(client)
+        identity, _ = await BotIdentity.objects.aupdate_or_create(
+            bot=self.bot, defaults={"username": me.username, "group_id": group_id}
+        )
+        return identity
+
+    async def _fetch_identity_with_own_client(self) -> BotIdentity:
+        async with telegram.Bot(token=self.bot_key, base_url=api_url()) as client:
+            return await self._fetch_identity(client)
+
+    def _apply_identity(self, identity: BotIdentity) -> None:
+        if self._bot_username is None:
+            self._bot_username = identity.username
+        if self.group_id is None:
+            self.group_id = identity.group_id
+
+    async def _retrieve_group_id(self, client: telegram.Bot) -> str:
         """
         Retrieve the group ID from recent updates if the bot is already in a group.
 
+        Args:
+            client (telegram.Bot): The client of the bot.
+
         Returns:
             str: The group ID if found, otherwise None.
         """
+        if config("TELEGRAM_WEBHOOK_URL", default=""):
+            # Updates are pushed to the webhook, get_updates would be refused while it is set
+            return None
         try:
-            updates = self.client.get_updates()
+            updates = await client.get_updates()
             for update in updates:
                 if update.message and update.message.chat.type in ['group', 'supergroup']:
                     print(f"Automatically retrieved group ID: {update.message.chat.id}")
@@ -57,9 +166,18 @@ class TelegramBotFactory:
             print(f"Error retrieving group ID from updates: {e}")
         return None
 
+    @property
+    def outbox(self) -> Outbox:
+        """
+        The outbox every message of the bot goes through on the running event loop.
+        """
+        return get_outbox(self.client)
+
     def post_to_group(self, message: str) -> None:
         """
         Post a message to a Telegram group.
+        Meant for code running outside of an event loop, e.g. Celery tasks; on an event loop, await
+        `apost_to_group`.
 
         Args:
             message (str): The message to be posted to the group.
@@ -68,21 +186,49 @@ class TelegramBotFactory:
             if self.group_id is None:
                 print("Group ID is not set. Please use the /setgroup command to set it.")
                 return
-            self.client.send_message(chat_id=self.group_id, text=message)
+            sent = asyncio.run(self._post_with_own_client(message))
+            # The bot does not receive its own messages, they are added to the history here
+            save_messages([sent])
         except Exception as e:
             print(f"Error posting message to group {self.group_id}: {e}")
             raise
 
+    async def apost_to_group(self, message: str) -> telegram.Message:
+        """
+        Post a message to a Telegram group through the outbox of the bot, after the pending replies.
+
+        Args:
+            message (str): The message to be posted to the group.
+
+        Returns:
+            telegram.Message: The message posted, or None if the group is not set.
+        """
+        await self.load_identity()
+        if self.group_id is None:
+            print("Group ID is not set. Please use the /setgroup command to set it.")
+            return None
+        sent = await self.outbox.send(self.group_id, message, priority=BROADCAST)
+        await asave_messages([sent])
+        return sent
+
+    async def _post_with_own_client(self, message: str) -> telegram.Message:
+        # The event loop only lives for this call, so neither the client nor the outbox can be shared
+        async with telegram.Bot(token=self.bot_key, base_url=api_url()) as client:
+            async with Outbox(client) as outbox:
+                return await outbox.send(self.group_id, message, priority=BROADCAST)
+
     async def handle_mentions(self, update: Update, context: CallbackContext) -> None:
         """
-        Handle messages that mention the bot by username.
+        Handle messages that mention the bot by username, streaming the answer to the question that follows the
+        mention into a reply.
 
         Args:
             update (Update): The incoming update.
             context (CallbackContext): The context of the callback.
         """
         message_text = update.message.text
-        if message_text.startswith(f"@{self.bot_username}"):
+        mention = f"@{await self.load_identity()}"
+        if message_text.startswith(mention):
             print(f"Mentioned message: {message_text}")
             chat = update.message.chat
             print(f"Group ID: {chat.id}")
@@ -90,6 +236,19 @@ class TelegramBotFactory:
             print(f"Sender Username: {update.message.from_user.username}")
             print(f"Sender First Name: {update.message.from_user.first_name}")
 
+            question = message_text[len(mention):].strip()
+            if not question:
+                return
+
+            # Show the answer while it is generated instead of after the whole completion
+            reply = StreamingReply(update.message, outbox=self.outbox)
+            await reply.start()
+            try:
+                await reply.stream(LLMFactory(company_name=self.bot).astream_response(question))
+            except Exception as e:
+                print(f"Error answering mention in chat {chat.id}: {e}")
+                await reply.fail("Sorry, I could not answer your question.")
+
     async def set_group_id(self, update: Update, context: CallbackContext) -> None:
         """
         Command handler to set the group ID automatically when the bot is added to a group.
@@ -101,28 +260,72 @@ class TelegramBotFactory:
         chat = update.message.chat
         if chat.type in ['group', 'supergroup']:
             self.group_id = chat.id
+            await BotIdentity.objects.filter(bot=self.bot).aupdate(group_id=self.group_id)
             print(f"Group ID set to: {self.group_id}")
-            await update.message.reply_text(f"Group ID has been set to: {self.group_id}")
+            await self.outbox.reply(update.message, f"Group ID has been set to: {self.group_id}")
         else:
-            await update.message.reply_text("This command can only be used in a group.")
+            await self.outbox.reply(update.message, "This command can only be used in a group.")
 
-    def get_group_messages(self, limit: int = 100) -> list:
+    def get_group_messages(self, limit: int = 100, before: int = None, after: int = None) -> list:
         """
-        Get a list of messages from the Telegram group.
+        Get a page of messages from the Telegram group, as stored by `record_update`. Without cursor, the page
+        holds the latest messages; pass the ID of the first message of a page as `before` to get the page before it.
 
         Args:
             limit (int): The maximum number of messages to retrieve (default is 100).
+            before (int, optional): Only return messages older than this message ID.
+            after (int, optional): Only return messages newer than this message ID.
 
         Returns:
-            list: A list of messages from the group.
+            list: The GroupMessage instances of the page, oldest first.
+        """
+        if self.group_id is None:
+            print("Group ID is not set. Please use the /setgroup command to set it.")
+            return []
+        return group_messages(int(self.group_id), limit=limit, before=before, after=after)
+
+    async def aget_group_messages(self, limit: int = 100, before: int = None, after: int = None) -> list:
+        """
+        Get a page of messages from the Telegram group, see `get_group_messages`.
+
+        Args:
+            limit (int): The maximum number of messages to retrieve (default is 100).
+            before (int, optional): Only return messages older than this message ID.
+            after (int, optional): Only return messages newer than this message ID.
+
+        Returns:
+            list: The GroupMessage instances of the page, oldest first.
+        """
+        await self.load_identity()
+        if self.group_id is None:
+            print("Group ID is not set. Please use the /setgroup command to set it.")
+            return []
+        return await agroup_messages(int(self.group_id), limit=limit, before=before, after=after)
+
+    def save_group_messages_to_rag_context(self) -> int:
+        """
+        Add the group messages stored since the last export to the RAG context of the bot's company.
+
+        Returns:
+            int: The number of messages exported.
+        """
+        if self.group_id is None:
+            print("Group ID is not set. Please use the /setgroup command to set it.")
+            return 0
+        return export_to_rag_context(self.bot, int(self.group_id))
+
+    async def record_update(self, update: Update, context: CallbackContext) -> None:
+        """
+        Store the group message of an update, if any, before the other handlers see the update.
+
+        Args:
+            update (Update): The incoming update.
+            context (CallbackContext): The context of the callback.
         """
         try:
-            updates = self.client.get_updates()
-            messages = [update.message for update in updates if update.message and self.group_id is not None and update.message.chat.id == int(self.group_id)]
-            return messages[:limit]
+            await asave_updates(self.bot, [update])
         except Exception as e:
-            print(f"Error getting messages from group {self.group_id}: {e}")
-            raise
+            print(f"Error storing update {update.update_id} of bot {self.bot}: {e}")
 
     async def handle_dm(self, update: Update, context: CallbackContext) -> None:
         """
@@ -135,10 +338,10 @@ class TelegramBotFactory:
         """
         username = update.message.from_user.username
         if username not in self.accepted_usernames:
-            await update.message.reply_text("You are not authorized to interact with this bot.")
+            await self.outbox.reply(update.message, "You are not authorized to interact with this bot.")
             return
 
-        await update.message.reply_text("Hello! You can upload a document by clicking the upload button.")
+        await self.outbox.reply(update.message, "Hello! You can upload a document by clicking the upload button.")
 
     async def handle_document_upload(self, update: Update, context: CallbackContext) -> None:
         """
@@ -153,37 +356,68 @@ class TelegramBotFactory:
         if document:
             file_name = document.file_name
             if not (file_name.endswith('.txt') or file_name.endswith('.pdf')):
-                await update.message.reply_text("Error: Only .txt or .pdf files are allowed.")
+                await self.outbox.reply(update.message, "Error: Only .txt or .pdf files are allowed.")
                 return
 
             file = await context.bot.get_file(document.file_id)
 
-            await update.message.reply_text(f"File {file_name} has been uploaded successfully.")
+            await self.outbox.reply(update.message, f"File {file_name} has been uploaded successfully.")
+        else:
+            await self.outbox.reply(update.message, "Error: No document found.")
+
+    def build_application(self, polling: bool = True) -> Application:
+        """
+        Build the application dispatching the updates of the bot to its handlers.
+
+        Args:
+            polling (bool): Whether the application fetches its updates by polling. Without polling, updates are
+                pushed to the webhook and handed to the application with `process_update`. Defaults to True.
+
+        Returns:
+            Application: The application, not initialized yet.
+        """
+        if self.shared_client:
+            # The client already holds the connection pools the application should use
+            builder = ApplicationBuilder().bot(self.client)
         else:
-            await update.message.reply_text("Error: No document found.")
+            builder = ApplicationBuilder().token(self.bot_key).base_url(api_url())
+        if not polling:
+            builder = builder.updater(None)
+        # run_polling loads the identity once the application is initialized; other callers await load_identity
+        application = builder.post_init(self._post_init).build()
+        # The factory and its application share one client
+        self._client = application.bot
+
+        # Store every update first, in a handler group of its own so that the handlers below still run
+        application.add_handler(TypeHandler(Update, self.record_update), group=-1)
+
+        # Add command handler to set the group ID. Whether the group is known is only certain once the identity
+        # is loaded, so the command is always available.
+        application.add_handler(CommandHandler('setgroup', self.set_group_id))
+
+        # Add message handler to handle mentions of the bot
+        mention_filter = filters.TEXT & MentionFilter(self)
+        application.add_handler(MessageHandler(mention_filter, self.handle_mentions))
+
+        # Add message handler for direct messages
+        application.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE, self.handle_dm))
+
+        # Add document handler for uploads
+        application.add_handler(MessageHandler(filters.Document.ALL & filters.ChatType.PRIVATE, self.handle_document_upload))
+        return application
+
+    async def _post_init(self, application: Application) -> None:
+        await self.load_identity()
 
     def start_bot(self) -> None:
         """
         Start the Telegram bot, handling errors if any occur.
         This method will be called from a different Celery task to start the bot as a background task.
+        Bots served by the webhook (see `telegram_api.webhook`) do not need to be started.
         """
         try:
             print(f"Bot for group {self.group_id if self.group_id else 'not set'} is starting...")
-            application = ApplicationBuilder().token(self.bot_key).build()
-
-            if self.group_id is None:
-                # Add command handler to set the group ID
-                application.add_handler(CommandHandler('setgroup', self.set_group_id))
-
-            # Add message handler to handle mentions of the bot
-            mention_filter = filters.TEXT & filters.Regex(f"^@{self.bot_username}")
-            application.add_handler(MessageHandler(mention_filter, self.handle_mentions))
-
-            # Add message handler for direct messages
-            application.add_handler(MessageHandler(filters.TEXT & filters.ChatType.PRIVATE, self.handle_dm))
-
-            # Add document handler for uploads
-            application.add_handler(MessageHandler(filters.Document.ALL & filters.ChatType.PRIVATE, self.handle_document_upload))
+            application = self.build_application()
 
             print(f"Bot for group {self.group_id if self.group_id else 'not set'} is running.")
             # Start polling to receive updates from Telegram
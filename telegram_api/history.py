@@ -0,0 +1,209 @@
+"""
+Group history: the messages of the groups the bots are in, stored as their updates arrive so that the history can
+be read a page at a time from the database instead of being scraped from Telegram's short-lived update buffer.
+"""
+from agents.openai_api import LLMFactory
+from telegram import Chat, Update
+from telegram_api.models import GroupMessage, UpdateCheckpoint
+import telegram
+
+
+GROUP_TYPES = (Chat.GROUP, Chat.SUPERGROUP)
+
+
+def _rows(messages: list) -> list:
+    """
+    Rows of the group messages among `messages`, the latest version of each message only.
+    """
+    rows = {}
+    for message in messages:
+        if message is None or message.chat.type not in GROUP_TYPES:
+            continue
+        sender = message.from_user
+        rows[(message.chat.id, message.message_id)] = GroupMessage(
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            sender_id=sender.id if sender else None,
+            username=(sender.username or sender.full_name) if sender else "",
+            text=message.text or message.caption or "",
+            date=message.date,
+            edited=message.edit_date
+        )
+    return list(rows.values())
+
+
+# An edited message replaces the stored one
+_UPSERT = {"update_conflicts": True, "unique_fields": ["chat_id", "message_id"], "update_fields": ["text", "edited"]}
+
+
+def save_messages(messages: list) -> int:
+    """
+    Store the group messages among `messages`, updating those already stored.
+
+    Args:
+        messages (list): Telegram messages, those of private chats are ignored.
+
+    Returns:
+        int: The number of group messages stored.
+    """
+    rows = _rows(messages)
+    if rows:
+        GroupMessage.objects.bulk_create(rows, **_UPSERT)
+    return len(rows)
+
+
+async def asave_messages(messages: list) -> int:
+    """
+    Store the group messages among `messages`, updating those already stored.
+
+    Args:
+        messages (list): Telegram messages, those of private chats are ignored.
+
+    Returns:
+        int: The number of group messages stored.
+    """
+    rows = _rows(messages)
+    if rows:
+        await GroupMessage.objects.abulk_create(rows, **_UPSERT)
+    return len(rows)
+
+
+async def asave_updates(bot: str, updates: list) -> int:
+    """
+    Store the group messages of a bot's updates and move its checkpoint past them.
+
+    Args:
+        bot (str): The name identifier of the bot.
+        updates (list): The updates of the bot.
+
+    Returns:
+        int: The number of group messages stored.
+    """
+    stored = await asave_messages([update.message or update.edited_message for update in updates])
+    if updates:
+        last = max(update.update_id for update in updates)
+        # Updates are processed concurrently, the checkpoint only ever moves forward
+        moved = await UpdateCheckpoint.objects.filter(bot=bot, update_id__lt=last).aupdate(update_id=last)
+        if not moved:
+            await UpdateCheckpoint.objects.aget_or_create(bot=bot, defaults={"update_id": last})
+    return stored
+
+
+async def ingest_updates(bot: str, client: telegram.Bot, limit: int = 100) -> int:
+    """
+    Fetch the updates of a bot waiting on Telegram since its checkpoint and store their group messages.
+    Only for bots that neither poll nor use the webhook, which receive their updates themselves.
+
+    Args:
+        bot (str): The name identifier of the bot.
+        client (telegram.Bot): The initialized client of the bot.
+        limit (int): Number of updates fetched per request, at most 100.
+
+    Returns:
+        int: The number of group messages stored.
+    """
+    checkpoint = await UpdateCheckpoint.objects.filter(bot=bot).afirst()
+    offset = checkpoint.update_id + 1 if checkpoint else None
+    stored = 0
+    while True:
+        # Asking for an offset also tells Telegram to forget the updates before it
+        updates = await client.get_updates(offset=offset, limit=limit, timeout=0, allowed_updates=Update.ALL_TYPES)
+        if not updates:
+            return stored
+        stored += await asave_updates(bot, updates)
+        offset = updates[-1].update_id + 1
+
+
+def _page(chat_id: int, limit: int, before: int = None, after: int = None) -> tuple:
+    """
+    Query of a page of a chat's history, and whether it is ordered from the newest message.
+    """
+    messages = GroupMessage.objects.filter(chat_id=chat_id)
+    if before is not None:
+        messages = messages.filter(message_id__lt=before)
+    if after is not None:
+        return messages.filter(message_id__gt=after).order_by("message_id")[:limit], False
+    return messages.order_by("-message_id")[:limit], True
+
+
+def group_messages(chat_id: int, limit: int = 100, before: int = None, after: int = None) -> list:
+    """
+    Read a page of a group's history. Without cursor, the page holds the latest messages; pass the ID of the first
+    message of a page as `before` to get the page before it, or the ID of the last one as `after` to get the page
+    after it.
+
+    Args:
+        chat_id (int): The ID of the group.
+        limit (int): The maximum number of messages to return.
+        before (int, optional): Only return messages older than this message ID.
+        after (int, optional): Only return messages newer than this message ID.
+
+    Returns:
+        list: The GroupMessage instances of the page, oldest first.
+    """
+    query, newest_first = _page(chat_id, limit, before, after)
+    messages = list(query)
+    return messages[::-1] if newest_first else messages
+
+
+async def agroup_messages(chat_id: int, limit: int = 100, before: int = None, after: int = None) -> list:
+    """
+    Read a page of a group's history, see `group_messages`.
+
+    Args:
+        chat_id (int): The ID of the group.
+        limit (int): The maximum number of messages to return.
+        before (int, optional): Only return messages older than this message ID.
+        after (int, optional): Only return messages newer than this message ID.
+
+    Returns:
+        list: The GroupMessage instances of the page, oldest first.
+    """
+    query, newest_first = _page(chat_id, limit, before, after)
+    messages = [message async for message in query]
+    return messages[::-1] if newest_first else messages
+
+
+def transcript(messages: list) -> str:
+    """
+    Render messages as a chat transcript, one line per message with text.
+
+    Args:
+        messages (list): GroupMessage instances, oldest first.
+
+    Returns:
+        str: The transcript.
+    """
+    return "\n".join(
+        f"[{message.date:%Y-%m-%d %H:%M}] {message.username or 'unknown'}: {message.text}"
+        for message in messages if message.text
+    )
+
+
+def export_to_rag_context(bot: str, chat_id: int, page_size: int = 1000) -> int:
+    """
+    Add the messages of a bot's group stored since the last export to the RAG context of the bot's company, the
+    one questions to the bot are answered from.
+
+    Args:
+        bot (str): The name identifier of the bot, which is also the company name of its LLM.
+        chat_id (int): The ID of the bot's group.
+        page_size (int): Number of messages added to the context at a time.
+
+    Returns:
+        int: The number of messages exported.
+    """
+    checkpoint, _ = UpdateCheckpoint.objects.get_or_create(bot=bot)
+    llm_factory = LLMFactory(company_name=bot)
+    exported = 0
+    while True:
+        page = group_messages(chat_id, limit=page_size, after=checkpoint.exported_message_id)
+        if not page:
+            return exported
+        text = transcript(page)
+        if text:
+            llm_factory.add_to_rag_context([text])
+        # Saved after each page, so a failed export resumes where it stopped
+        checkpoint.exported_message_id = page[-1].message_id
+        checkpoint.save(update_fields=["exported_message_id", "updated"])
+        exported += len(page)
@@ -0,0 +1,52 @@
+from django.db import models
+
+
+class BotIdentity(models.Model):
+    """
+    Identity of a Telegram bot as returned by Telegram, stored so that bots are not looked up on every start.
+    """
+    bot = models.CharField(max_length=255, unique=True, help_text="Name identifier of the bot, as in BOT_KEY_<BOT>")
+    username = models.CharField(max_length=255)
+    group_id = models.BigIntegerField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.bot} (@{self.username})"
+
+
+class GroupMessage(models.Model):
+    """
+    A message posted in a Telegram group, stored as it arrives so that the history of the group can be read
+    without asking Telegram, whose update buffer only keeps the last day.
+    """
+    chat_id = models.BigIntegerField()
+    message_id = models.BigIntegerField()
+    sender_id = models.BigIntegerField(null=True, blank=True)
+    username = models.CharField(max_length=255, blank=True, default="")
+    text = models.TextField(blank=True, default="")
+    date = models.DateTimeField()
+    edited = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Message IDs grow within a chat, so the constraint's index also serves pages of a chat's history
+        constraints = [
+            models.UniqueConstraint(fields=["chat_id", "message_id"], name="unique_group_message")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.chat_id}/{self.message_id} {self.username}: {self.text[:50]}"
+
+
+class UpdateCheckpoint(models.Model):
+    """
+    Progress of a bot through its updates and through the export of its group's history to the RAG context.
+    """
+    bot = models.CharField(max_length=255, unique=True, help_text="Name identifier of the bot, as in BOT_KEY_<BOT>")
+    update_id = models.BigIntegerField(default=0, help_text="Last update stored")
+    exported_message_id = models.BigIntegerField(
+        default=0, help_text="Last group message added to the RAG context"
+    )
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.bot} at update {self.update_id}"
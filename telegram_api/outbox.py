@@ -0,0 +1,310 @@
+"""
+Outbound message queue: every message a bot sends goes through the outbox of the bot, which keeps the sends
+within Telegram's limits instead of running into flood waits.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decouple import config
+from telegram import Chat, Message, ReplyParameters
+from telegram.error import RetryAfter
+import asyncio
+import heapq
+import itertools
+import telegram
+import time
+import weakref
+
+
+# Longest text a Telegram message can hold
+MESSAGE_LIMIT = 4096
+
+# Replies to users are sent before broadcasts
+REPLY = 0
+BROADCAST = 1
+
+MERGE_SEPARATOR = "\n\n"
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """
+    Number of seconds Telegram asks to wait after a flood error.
+
+    Args:
+        error (RetryAfter): The error.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+@dataclass(order=True)
+class OutgoingMessage:
+    """
+    A message waiting in the outbox, ordered by priority then by arrival.
+    """
+    priority: int
+    sequence: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    options: dict = field(compare=False, default_factory=dict)
+    futures: list = field(compare=False, default_factory=list)
+
+
+class Outbox:
+    """
+    Send the messages of one bot at the pace Telegram allows: at most `per_second` messages overall, and one
+    message per `chat_interval` seconds to a private chat or per `group_interval` seconds to a group. Replies go
+    before broadcasts. Short messages queued for the same chat are merged into one, and a flood error pauses the
+    sends for the delay Telegram asks for before the message is sent again. Edits of sent messages count against
+    the same overall pace and wait out the same pauses.
+    """
+
+    def __init__(self, client: telegram.Bot, per_second: float = None, chat_interval: float = None,
+                 group_interval: float = None, merge_chars: int = None) -> None:
+        """
+        Args:
+            client (telegram.Bot): The client of the bot.
+            per_second (float, optional): Messages sent per second overall. Defaults to the
+                TELEGRAM_MESSAGES_PER_SECOND setting.
+            chat_interval (float, optional): Seconds between two messages to a private chat. Defaults to the
+                TELEGRAM_CHAT_INTERVAL setting.
+            group_interval (float, optional): Seconds between two messages to a group, whose chat IDs are
+                negative. Defaults to the TELEGRAM_GROUP_INTERVAL setting.
+            merge_chars (int, optional): Longest message merged with the next one of the same chat, 0 to never
+                merge. Defaults to the TELEGRAM_MERGE_CHARS setting.
+        """
+        self.client = client
+        self.per_second = per_second or config("TELEGRAM_MESSAGES_PER_SECOND", default=30, cast=float)
+        self.chat_interval = chat_interval if chat_interval is not None else config(
+            "TELEGRAM_CHAT_INTERVAL", default=1.0, cast=float)
+        self.group_interval = group_interval if group_interval is not None else config(
+            "TELEGRAM_GROUP_INTERVAL", default=3.0, cast=float)
+        self.merge_chars = merge_chars if merge_chars is not None else config(
+            "TELEGRAM_MERGE_CHARS", default=1024, cast=int)
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self._queues = {}
+        self._ready_at = {}
+        self._sending = set()
+        self._next_send = 0.0
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._worker = None
+        self._tasks = set()
+
+    async def __aenter__(self) -> "Outbox":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def send(self, chat_id: int, text: str, priority: int = BROADCAST, **options) -> Message:
+        """
+        Queue a message and wait until it is sent.
+
+        Args:
+            chat_id (int): The chat to send the message to.
+            text (str): The text of the message.
+            priority (int): REPLY or BROADCAST.
+            **options: Further parameters of `send_message`. Messages with options are never merged.
+
+        Returns:
+            Message: The message sent, shared by every message merged with it.
+        """
+        future = asyncio.get_running_loop().create_future()
+        message = OutgoingMessage(priority, next(self._sequence), chat_id, text, options, [future])
+        heapq.heappush(self._queues.setdefault(chat_id, []), message)
+        self._idle.clear()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return await future
+
+    async def reply(self, message: Message, text: str) -> Message:
+        """
+        Reply to a message ahead of the queued broadcasts, quoting it outside private chats like
+        `Message.reply_text` does.
+
+        Args:
+            message (Message): The message to reply to.
+            text (str): The text of the reply.
+
+        Returns:
+            Message: The reply sent.
+        """
+        options = {}
+        if message.chat.type != Chat.PRIVATE:
+            options["reply_parameters"] = ReplyParameters(message_id=message.message_id)
+        return await self.send(message.chat.id, text, priority=REPLY, **options)
+
+    async def edit(self, message: Message, text: str) -> Message:
+        """
+        Edit a message of the bot once the overall pace allows it. Edits are not queued: one refused with a flood
+        error pauses the outbox like a refused send, and the error is raised for the caller to retry the edit or
+        leave it to a later one.
+
+        Args:
+            message (Message): The message to edit.
+            text (str): The new text of the message.
+
+        Returns:
+            Message: The edited message.
+        """
+        # Sends and other edits may take the slot while this one sleeps
+        while (delay := self._next_send - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        self._next_send = time.monotonic() + 1 / self.per_second
+        try:
+            return await message.edit_text(text)
+        except RetryAfter as e:
+            self._pause(message.chat_id, retry_after_seconds(e))
+            raise
+
+    async def close(self) -> None:
+        """
+        Wait until every queued message is sent, then stop the worker.
+        """
+        await self._idle.wait()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        """
+        Counters of the outbox.
+
+        Returns:
+            dict: The messages sent, the messages merged into another and the sends retried after a flood error.
+        """
+        return {"sent": self.sent, "merged": self.merged, "retried": self.retried}
+
+    async def _run(self) -> None:
+        while True:
+            delay = self._next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            message = self._take()
+            if message is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._next_ready())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._next_send = time.monotonic() + 1 / self.per_second
+            task = asyncio.create_task(self._deliver(message))
+            # Keep a reference until the task is done, the loop only holds weak ones
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _take(self) -> OutgoingMessage:
+        """
+        Take the most urgent message among the chats that may receive one now, merged with the short messages
+        queued after it for the same chat.
+        """
+        now = time.monotonic()
+        ready = [queue for chat_id, queue in self._queues.items()
+                 if queue and chat_id not in self._sending and self._ready_at.get(chat_id, 0.0) <= now]
+        if not ready:
+            return None
+
+        queue = min(ready, key=lambda queue: queue[0])
+        message = heapq.heappop(queue)
+        while queue and self._mergeable(message, queue[0]):
+            following = heapq.heappop(queue)
+            message.text += MERGE_SEPARATOR + following.text
+            message.futures.extend(following.futures)
+            self.merged += 1
+
+        self._sending.add(message.chat_id)
+        self._ready_at[message.chat_id] = now + self._interval(message.chat_id)
+        return message
+
+    def _mergeable(self, message: OutgoingMessage, following: OutgoingMessage) -> bool:
+        """
+        Whether a queued message can be appended to the one about to be sent: both are plain messages of the same
+        priority, the queued one is short and both fit in one message.
+        """
+        return (
+            following.priority == message.priority
+            and not message.options and not following.options
+            and len(following.text) <= self.merge_chars
+            and len(message.text) + len(MERGE_SEPARATOR) + len(following.text) <= MESSAGE_LIMIT
+        )
+
+    def _next_ready(self) -> float:
+        """
+        Seconds until a chat with queued messages may receive one, or None if none is waiting for its interval.
+        """
+        waiting = [self._ready_at.get(chat_id, 0.0) for chat_id, queue in self._queues.items()
+                   if queue and chat_id not in self._sending]
+        return max(min(waiting) - time.monotonic(), 0.0) if waiting else None
+
+    def _interval(self, chat_id: int) -> float:
+        # Group and channel IDs are negative
+        return self.group_interval if chat_id < 0 else self.chat_interval
+
+    def _pause(self, chat_id: int, delay: float) -> None:
+        """
+        Hold every send and edit back for the delay Telegram asked for after a flood error.
+        """
+        print(f"Flood limit reached in chat {chat_id}, pausing {delay:.1f}s")
+        # Telegram does not say which limit was reached, so every send waits
+        resume = time.monotonic() + delay
+        self._next_send = max(self._next_send, resume)
+        self._ready_at[chat_id] = max(self._ready_at.get(chat_id, 0.0), resume)
+
+    async def _deliver(self, message: OutgoingMessage) -> None:
+        chat_id = message.chat_id
+        try:
+            result = await self.client.send_message(chat_id=chat_id, text=message.text, **message.options)
+        except RetryAfter as e:
+            self.retried += 1
+            self._pause(chat_id, retry_after_seconds(e))
+            heapq.heappush(self._queues[chat_id], message)
+        except Exception as e:
+            for future in message.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.sent += 1
+            for future in message.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._sending.discard(chat_id)
+            if not self._sending and not any(self._queues.values()):
+                self._idle.set()
+            self._wakeup.set()
+
+
+# Outboxes belong to the event loop of their worker, so each loop gets its own outbox per bot
+_outboxes = weakref.WeakKeyDictionary()
+
+
+def get_outbox(client: telegram.Bot) -> Outbox:
+    """
+    Return the outbox of a bot on the running event loop, creating it on first use.
+
+    Args:
+        client (telegram.Bot): The client of the bot.
+
+    Returns:
+        Outbox: The outbox shared by every sender of the bot on this loop.
+    """
+    outboxes = _outboxes.setdefault(asyncio.get_running_loop(), {})
+    if client.token not in outboxes:
+        outboxes[client.token] = Outbox(client)
+    return outboxes[client.token]
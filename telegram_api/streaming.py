@@ -0,0 +1,171 @@
+from decouple import config
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+from telegram_api.outbox import MESSAGE_LIMIT, Outbox, retry_after_seconds
+from typing import AsyncIterator
+import asyncio
+import time
+
+
+PLACEHOLDER = "…"
+
+
+class StreamingReply:
+    """
+    Reply to a message with an answer that is still being generated.
+    A placeholder reply is posted right away and edited as the answer grows. Edits are batched: one is sent only
+    once `min_interval` seconds have passed since the previous one and at least `min_chars` new characters are
+    waiting, which keeps each chat within Telegram's edit rate limits. Answers longer than a message continue in
+    new replies.
+    """
+
+    def __init__(self, message: Message, min_interval: float = None, min_chars: int = None,
+                 placeholder: str = PLACEHOLDER, outbox: Outbox = None) -> None:
+        """
+        Args:
+            message (Message): The message to reply to.
+            min_interval (float, optional): Minimum number of seconds between two edits. Defaults to the
+                TELEGRAM_EDIT_INTERVAL setting in private chats and TELEGRAM_GROUP_EDIT_INTERVAL in groups, which
+                Telegram limits to 20 messages a minute.
+            min_chars (int, optional): Minimum number of new characters worth an edit. Defaults to the
+                TELEGRAM_EDIT_MIN_CHARS setting.
+            placeholder (str): Text of the reply until the first part of the answer arrives.
+            outbox (Outbox, optional): Outbox of the bot the replies are queued in and the edits paced by. Defaults
+                to replying and editing directly.
+        """
+        if min_interval is None:
+            if message.chat.type in ("group", "supergroup"):
+                min_interval = config("TELEGRAM_GROUP_EDIT_INTERVAL", default=3.0, cast=float)
+            else:
+                min_interval = config("TELEGRAM_EDIT_INTERVAL", default=1.0, cast=float)
+        self.message = message
+        self.min_interval = min_interval
+        self.min_chars = min_chars if min_chars is not None else config("TELEGRAM_EDIT_MIN_CHARS", default=40,
+                                                                        cast=int)
+        self.placeholder = placeholder
+        self.outbox = outbox
+        self.replies = []
+        self.edits = 0
+        self._text = ""
+        self._shown = ""
+        self._next_edit = 0.0
+
+    @property
+    def text(self) -> str:
+        """
+        The text of the last reply, answered so far.
+        """
+        return self._text
+
+    async def start(self) -> None:
+        """
+        Post the placeholder reply.
+        """
+        self.replies.append(await self._post(self.placeholder))
+
+    async def append(self, text: str) -> None:
+        """
+        Add a part of the answer, editing the reply if an edit is due.
+
+        Args:
+            text (str): The next part of the answer.
+        """
+        self._text += text
+        pending = len(self._text) - len(self._shown)
+        # The first part is shown as soon as possible, later ones are batched
+        if time.monotonic() >= self._next_edit and (pending >= self.min_chars or not self._shown):
+            await self._flush(final=False)
+
+    async def finish(self) -> None:
+        """
+        Show the whole answer.
+        """
+        if not self._text.strip():
+            self._text = "I could not come up with an answer."
+        await self._flush(final=True)
+
+    async def fail(self, text: str) -> None:
+        """
+        Replace the reply with an error message.
+
+        Args:
+            text (str): The error message.
+        """
+        self._text = text
+        await self._flush(final=True)
+
+    async def stream(self, chunks: AsyncIterator[str]) -> str:
+        """
+        Post the placeholder and show the answer as its parts arrive.
+
+        Args:
+            chunks (AsyncIterator[str]): The successive parts of the answer.
+
+        Returns:
+            str: The whole answer.
+        """
+        if not self.replies:
+            await self.start()
+        answer = []
+        async for chunk in chunks:
+            answer.append(chunk)
+            await self.append(chunk)
+        await self.finish()
+        return "".join(answer)
+
+    async def _flush(self, final: bool) -> None:
+        """
+        Edit the reply to show the text received so far, moving overflowing text to new replies.
+        """
+        while len(self._text) > MESSAGE_LIMIT:
+            cut = self._split_point(self._text)
+            await self._edit(self._text[:cut].rstrip(), retry=True)
+            self._text = self._text[cut:].lstrip()
+            # The rest may still not fit in one message, the new reply is filled by the edits that follow
+            self.replies.append(await self._post(self.placeholder))
+            self._shown = ""
+        if self._text != self._shown:
+            await self._edit(self._text, retry=final)
+
+    async def _post(self, text: str) -> Message:
+        if self.outbox is not None:
+            return await self.outbox.reply(self.message, text)
+        return await self.message.reply_text(text)
+
+    async def _edit(self, text: str, retry: bool) -> None:
+        """
+        Edit the last reply. An edit refused for flooding is retried after the delay Telegram asks for if
+        `retry` is set, and otherwise left to a later flush.
+        """
+        while True:
+            try:
+                if self.outbox is not None:
+                    await self.outbox.edit(self.replies[-1], text)
+                else:
+                    await self.replies[-1].edit_text(text)
+                self.edits += 1
+                break
+            except RetryAfter as e:
+                delay = retry_after_seconds(e)
+                self._next_edit = time.monotonic() + delay
+                if not retry:
+                    return
+                await asyncio.sleep(delay)
+            except BadRequest as e:
+                # Nothing changed since the last edit
+                if "not modified" not in str(e).lower():
+                    raise
+                break
+        self._shown = text
+        self._next_edit = max(self._next_edit, time.monotonic() + self.min_interval)
+
+    @staticmethod
+    def _split_point(text: str) -> int:
+        """
+        Index at which to split an overflowing text, preferably at the end of a line or a word.
+        """
+        for separator in ("\n", " "):
+            index = text.rfind(separator, MESSAGE_LIMIT // 2, MESSAGE_LIMIT)
+            if index > 0:
+                return index + 1
+        return MESSAGE_LIMIT
@@ -0,0 +1,243 @@
+"""
+Host many bots in one process: every bot polls for its updates on the same event loop, over connection pools
+shared by all of them.
+"""
+from dataclasses import dataclass, field
+from decouple import Csv, config
+from telegram.error import TelegramError
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+from telegram_api.bot_factory import TelegramBotFactory, api_url
+from telegram_api.outbox import get_outbox
+import asyncio
+import os
+import resource
+import signal
+import telegram
+import time
+
+
+class SharedRequest(HTTPXRequest):
+    """
+    Connection pool shared by the bots of a supervisor. A bot shutting down leaves the pool open for the others;
+    the supervisor closes it once every bot stopped.
+    """
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        """
+        Close the connections of the pool.
+        """
+        await super().shutdown()
+
+
+@dataclass
+class SupervisedBot:
+    """
+    A bot run by the supervisor.
+    """
+    name: str
+    token: str
+    application: Application
+    started: float = field(default_factory=time.time)
+
+
+def configured_bots() -> list:
+    """
+    Names of the bots to run, from the TELEGRAM_BOTS setting (comma separated).
+
+    Returns:
+        list: The names of the bots.
+    """
+    return config("TELEGRAM_BOTS", default="", cast=Csv())
+
+
+class BotSupervisor:
+    """
+    Start, stop and reload many bots inside one asyncio loop.
+    All bots send their requests through one shared connection pool and poll for updates through another, so the
+    process holds a bounded number of connections however many bots it runs. Bots are started concurrently and a
+    bot failing to start or stop does not affect the others; its error is kept in `errors`.
+    """
+
+    def __init__(self, pool_size: int = None, polling_pool_size: int = None, poll_timeout: int = 10) -> None:
+        """
+        Args:
+            pool_size (int, optional): Connections shared by the requests of every bot. Defaults to the
+                TELEGRAM_POOL_SIZE setting.
+            polling_pool_size (int, optional): Connections shared by the long polls of every bot, at least one per
+                bot. Defaults to the TELEGRAM_POLLING_POOL_SIZE setting.
+            poll_timeout (int): Seconds Telegram holds a poll open while there are no updates.
+        """
+        self.request = SharedRequest(
+            connection_pool_size=pool_size or config("TELEGRAM_POOL_SIZE", default=32, cast=int),
+            pool_timeout=30.0
+        )
+        self.polling_request = SharedRequest(
+            connection_pool_size=polling_pool_size or config("TELEGRAM_POLLING_POOL_SIZE", default=512, cast=int),
+            pool_timeout=30.0
+        )
+        self.poll_timeout = poll_timeout
+        self.bots = {}
+        self.errors = {}
+        self._reload = asyncio.Event()
+
+    async def start(self, names: list) -> dict:
+        """
+        Start bots concurrently.
+
+        Args:
+            names (list): Names of the bots to start. Bots already running are left as they are.
+
+        Returns:
+            dict: The error of each bot that failed to start, keyed by name.
+        """
+        names = [name for name in dict.fromkeys(names) if name not in self.bots]
+        results = await asyncio.gather(*(self._start_bot(name) for name in names), return_exceptions=True)
+        failed = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"Error starting bot {name}: {result}")
+                failed[name] = result
+            else:
+                self.bots[name] = result
+                self.errors.pop(name, None)
+        self.errors.update(failed)
+        return failed
+
+    async def stop(self, names: list = None) -> None:
+        """
+        Stop bots concurrently.
+
+        Args:
+            names (list, optional): Names of the bots to stop. Defaults to every running bot.
+        """
+        names = list(self.bots) if names is None else [name for name in names if name in self.bots]
+        bots = [self.bots.pop(name) for name in names]
+        results = await asyncio.gather(*(self._stop_bot(bot) for bot in bots), return_exceptions=True)
+        for bot, result in zip(bots, results):
+            if isinstance(result, BaseException):
+                print(f"Error stopping bot {bot.name}: {result}")
+
+    async def reload(self, names: list = None) -> None:
+        """
+        Bring the running bots in line with a list of names: stop the bots left out, restart the bots whose key
+        changed and start the new ones.
+
+        Args:
+            names (list, optional): Names of the bots to run. Defaults to the TELEGRAM_BOTS setting.
+        """
+        names = configured_bots() if names is None else names
+        changed = [name for name, bot in self.bots.items()
+                   if name not in names or config(f"BOT_KEY_{name.upper()}", default=None) != bot.token]
+        await self.stop(changed)
+        await self.start(names)
+
+    async def close(self) -> None:
+        """
+        Stop every bot and close the shared connection pools.
+        """
+        await self.stop()
+        await self.request.close()
+        await self.polling_request.close()
+
+    async def run(self, reload_interval: float = None) -> None:
+        """
+        Run the configured bots until cancelled, reloading them regularly and on SIGHUP.
+
+        Args:
+            reload_interval (float, optional): Seconds between two reloads. Defaults to the
+                TELEGRAM_RELOAD_INTERVAL setting.
+        """
+        reload_interval = reload_interval or config("TELEGRAM_RELOAD_INTERVAL", default=60, cast=float)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self._reload.set)
+        except (NotImplementedError, RuntimeError):
+            # Signals can only be handled on the main thread of platforms supporting them
+            pass
+
+        try:
+            while True:
+                await self.reload()
+                try:
+                    await asyncio.wait_for(self._reload.wait(), reload_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._reload.clear()
+        finally:
+            await self.close()
+
+    def stats(self) -> dict:
+        """
+        Resources used by the process hosting the bots.
+
+        Returns:
+            dict: The number of running and failed bots, the resident memory in bytes and the number of open file
+                descriptors.
+        """
+        return {
+            "bots": len(self.bots),
+            "failed": len(self.errors),
+            "rss": resident_memory(),
+            "open_fds": open_fds(),
+        }
+
+    async def _start_bot(self, name: str) -> SupervisedBot:
+        token = config(f"BOT_KEY_{name.upper()}")
+        client = telegram.Bot(token=token, base_url=api_url(), request=self.request,
+                              get_updates_request=self.polling_request)
+        factory = TelegramBotFactory(name, client=client)
+        application = factory.build_application()
+
+        try:
+            await application.initialize()
+            await factory.load_identity()
+            await application.updater.start_polling(
+                timeout=self.poll_timeout,
+                error_callback=lambda error: print(f"Error polling updates of bot {name}: {error}")
+            )
+            await application.start()
+        except BaseException:
+            await self._shutdown(application)
+            raise
+        return SupervisedBot(name=name, token=token, application=application)
+
+    async def _stop_bot(self, bot: SupervisedBot) -> None:
+        try:
+            if bot.application.updater.running:
+                await bot.application.updater.stop()
+            if bot.application.running:
+                await bot.application.stop()
+            await get_outbox(bot.application.bot).close()
+        finally:
+            await self._shutdown(bot.application)
+
+    @staticmethod
+    async def _shutdown(application: Application) -> None:
+        try:
+            await application.shutdown()
+        except (TelegramError, RuntimeError) as e:
+            print(f"Error shutting down bot {application.bot.username}: {e}")
+
+
+def resident_memory() -> int:
+    """
+    Resident memory of the process in bytes, or its peak where the current value cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_fds() -> int:
+    """
+    Number of file descriptors open in the process, or -1 where they cannot be listed.
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
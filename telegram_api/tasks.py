@@ -1,8 +1,70 @@
 
 from celery import shared_task
+from telegram_api.bot_factory import TelegramBotFactory, api_url
+from telegram_api.history import ingest_updates
+from telegram_api.supervisor import BotSupervisor
+from telegram_api.webhook import set_webhook
+from decouple import config
+import asyncio
+import telegram
 
 
 @shared_task
 def add(x, y):
     return x + y
 
+
+@shared_task
+def register_webhook(bot: str) -> bool:
+    """
+    Have Telegram push the updates of a bot to the webhook of the ASGI app.
+
+    Args:
+        bot (str): The name identifier of the bot.
+
+    Returns:
+        bool: True if Telegram accepted the webhook.
+    """
+    return asyncio.run(set_webhook(bot))
+
+
+@shared_task
+def run_bots() -> None:
+    """
+    Run every bot of the TELEGRAM_BOTS setting in this worker, on one event loop.
+    """
+    asyncio.run(BotSupervisor().run())
+
+
+@shared_task
+def ingest_group_messages(bot: str) -> int:
+    """
+    Store the group messages waiting on Telegram for a bot that is not running, e.g. one only used to post.
+
+    Args:
+        bot (str): The name identifier of the bot.
+
+    Returns:
+        int: The number of group messages stored.
+    """
+    async def ingest() -> int:
+        async with telegram.Bot(token=config(f"BOT_KEY_{bot.upper()}"), base_url=api_url()) as client:
+            return await ingest_updates(bot, client)
+    return asyncio.run(ingest())
+
+
+@shared_task
+def export_group_messages(bot: str) -> int:
+    """
+    Add the messages of a bot's group stored since the last export to the RAG context of the bot's company.
+
+    Args:
+        bot (str): The name identifier of the bot.
+
+    Returns:
+        int: The number of messages exported.
+    """
+    factory = TelegramBotFactory(bot)
+    # Reading the username loads the stored identity of the bot, its group included
+    print(f"Exporting the group messages of @{factory.bot_username}")
+    return factory.save_group_messages_to_rag_context()
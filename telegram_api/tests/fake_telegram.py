@@ -0,0 +1,150 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+import json
+import threading
+import time
+
+
+class FakeTelegram:
+    """
+    Local stand-in for the Telegram Bot API, served on a free port. It records the calls it receives and answers
+    them like Telegram would. Point the bots at it with the TELEGRAM_API_URL setting.
+    """
+
+    def __init__(self, username: str = "example_bot", max_poll: float = 0.5) -> None:
+        """
+        Args:
+            username (str): Username of the bot returned by getMe.
+            max_poll (float): Longest time a getUpdates call without updates is held open, whatever its timeout.
+        """
+        self.username = username
+        self.max_poll = max_poll
+        self.calls = []
+        self.failures = {}
+        self.updates = {}
+        self.revoked = set()
+        self._message_ids = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the API, to be followed by the bot token.
+        """
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/bot"
+
+    def start(self) -> "FakeTelegram":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def calls_to(self, method: str) -> list:
+        """
+        Parameters of the calls received by one method of the API.
+        """
+        with self._lock:
+            return [parameters for name, parameters in self.calls if name == method]
+
+    def fail(self, method: str, retry_after: int) -> None:
+        """
+        Refuse the next call to a method with a 429 asking to retry after `retry_after` seconds.
+        """
+        with self._lock:
+            self.failures.setdefault(method, []).append(retry_after)
+
+    def revoke(self, token: str) -> None:
+        """
+        Refuse every call made with a token, like Telegram does for revoked tokens.
+        """
+        with self._lock:
+            self.revoked.add(token)
+
+    def push_update(self, token: str, update: dict) -> None:
+        """
+        Queue an update for the bot with the given token, to be returned by its next getUpdates call.
+        """
+        with self._lock:
+            self.updates.setdefault(token, []).append(update)
+
+    def answer(self, method: str, parameters: dict, token: str = "") -> tuple:
+        """
+        Record a call and build its response.
+
+        Returns:
+            tuple: The HTTP status and the JSON body of the response.
+        """
+        if token in self.revoked:
+            return 401, {"ok": False, "error_code": 401, "description": "Unauthorized"}
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._poll(token, parameters)}
+        with self._lock:
+            self.calls.append((method, parameters))
+            if self.failures.get(method):
+                retry_after = self.failures[method].pop(0)
+                return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                             "parameters": {"retry_after": retry_after}}
+            if method in ("sendMessage", "editMessageText"):
+                self._message_ids += 1
+                message_id = parameters.get("message_id", self._message_ids)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Example", "username": self.username}
+        elif method in ("sendMessage", "editMessageText"):
+            result = {"message_id": message_id, "date": int(time.time()), "text": parameters.get("text", ""),
+                      "chat": {"id": parameters.get("chat_id"), "type": "private"}}
+        else:
+            result = True
+        return 200, {"ok": True, "result": result}
+
+    def _poll(self, token: str, parameters: dict) -> list:
+        """
+        Hold a getUpdates call open until updates arrive for the bot or its timeout passes, like a long poll.
+        """
+        with self._lock:
+            self.calls.append(("getUpdates", parameters))
+        deadline = time.monotonic() + min(float(parameters.get("timeout") or 0), self.max_poll)
+        while True:
+            with self._lock:
+                offset = int(parameters.get("offset") or 0)
+                pending = [update for update in self.updates.get(token, []) if update["update_id"] >= offset]
+                self.updates[token] = pending
+            if pending or time.monotonic() >= deadline:
+                return pending
+            time.sleep(0.01)
+
+    def _handler(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                token, _, method = self.path.strip("/").removeprefix("bot").rpartition("/")
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                parameters = {}
+                for name, value in parse_qsl(body):
+                    # Every parameter but strings is sent JSON encoded
+                    try:
+                        parameters[name] = json.loads(value)
+                    except ValueError:
+                        parameters[name] = value
+                status, response = fake.answer(method, parameters, token)
+                payload = json.dumps(response).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the call, e.g. a poll cancelled when its bot stopped
+                    pass
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
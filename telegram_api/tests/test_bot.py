@@ -1,7 +1,10 @@
 from django.test import TestCase
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import patch, MagicMock, AsyncMock, PropertyMock
 from telegram_api.bot_factory import TelegramBotFactory
+from telegram_api.models import BotIdentity
+from datetime import datetime, timezone
 import asyncio
+import telegram
 
 
 class TelegramBotIntegrationTest(TestCase):
@@ -10,22 +13,24 @@ class TelegramBotIntegrationTest(TestCase):
     Simulate starting a bot instance, sending a message to a group, and asserting if the message is contained in the group messages.
     """
 
+    @patch.dict('os.environ', {'BOT_KEY_EXAMPLE': 'test-key'})
     @patch('telegram_api.bot_factory.telegram.Bot')
-    @patch('telegram_api.bot_factory.asyncio.get_event_loop')
-    def test_bot_send_and_receive_message(self, mock_get_event_loop, MockBot):
+    def test_bot_send_and_receive_message(self, MockBot):
         # Mock Telegram Bot API
         mock_bot_instance = MockBot.return_value
+        mock_bot_instance.__aenter__.return_value = mock_bot_instance
         mock_message = MagicMock()
         mock_message.text = "Hello, Test Group!"
-        mock_message.chat.id = 123456789  # Example group ID
+        mock_message.chat.id = -123456789  # Example group ID
 
-        # Mock get_updates to return a list containing our mock message
-        mock_bot_instance.get_updates.return_value = [MagicMock(message=mock_message)]
-
-        # Mock the async call to get_me()
-        mock_future = AsyncMock()
-        mock_future.return_value.username = "example_bot"
-        mock_get_event_loop.return_value.run_until_complete.return_value = mock_future.return_value
+        # Telegram answers with the message posted, which is stored in the group history
+        mock_bot_instance.send_message = AsyncMock(return_value=telegram.Message(
+            message_id=1,
+            date=datetime.now(timezone.utc),
+            chat=telegram.Chat(id=mock_message.chat.id, type="supergroup"),
+            from_user=telegram.User(id=1, is_bot=True, first_name="Example", username="example_bot"),
+            text=mock_message.text
+        ))
 
         # Initialize the bot factory with mocked group ID and bot token
         bot_name = "example"
@@ -34,6 +39,7 @@ class TelegramBotIntegrationTest(TestCase):
         # Send a message to the group
         test_message = "Hello, Test Group!"
         bot_factory.post_to_group(test_message)
+        mock_bot_instance.send_message.assert_awaited_once_with(chat_id=mock_message.chat.id, text=test_message)
 
         # Get messages from the group
         messages = bot_factory.get_group_messages()
@@ -41,3 +47,58 @@ class TelegramBotIntegrationTest(TestCase):
         # Assert if the sent message is in the retrieved messages
         message_texts = [message.text for message in messages]
         self.assertIn(test_message, message_texts)
+
+    @patch('telegram_api.bot_factory.LLMFactory')
+    def test_mentions_are_answered_with_a_streamed_reply(self, MockLLMFactory):
+        reply = MagicMock(edit_text=AsyncMock())
+        client = MagicMock(token="test-key", send_message=AsyncMock(return_value=reply))
+        bot_factory = TelegramBotFactory("example", group_id=123456789, bot_username="example_bot", client=client)
+
+        async def answer(question):
+            yield "In "
+            yield "May"
+        MockLLMFactory.return_value.astream_response.side_effect = answer
+
+        update = MagicMock()
+        update.message.text = "@example_bot When is the token unlock?"
+        update.message.chat.type = "supergroup"
+        update.message.chat.id = -123456789
+
+        asyncio.run(bot_factory.handle_mentions(update, MagicMock()))
+
+        MockLLMFactory.assert_called_once_with(company_name="example")
+        MockLLMFactory.return_value.astream_response.assert_called_once_with("When is the token unlock?")
+        reply.edit_text.assert_awaited_with("In May")
+
+    @patch('telegram_api.bot_factory.telegram.Bot')
+    def test_construction_does_no_io(self, MockBot):
+        # Neither the key nor the identity of the bot are needed to create the factory
+        bot_factory = TelegramBotFactory("unconfigured")
+        MockBot.assert_not_called()
+        self.assertIsNone(bot_factory.group_id)
+
+    async def test_identity_is_loaded_from_the_database(self):
+        await BotIdentity.objects.acreate(bot="example", username="example_bot", group_id=123456789)
+        bot_factory = TelegramBotFactory("example", client=MagicMock())
+
+        self.assertEqual(await bot_factory.load_identity(), "example_bot")
+        self.assertEqual(bot_factory.group_id, 123456789)
+        bot_factory.client.get_me.assert_not_called()
+
+    async def test_identity_is_fetched_once_and_stored(self):
+        client = MagicMock()
+        type(client).bot = PropertyMock(side_effect=RuntimeError)
+
+        async def get_me():
+            await asyncio.sleep(0.01)
+            return MagicMock(username="example_bot")
+        client.get_me = AsyncMock(side_effect=get_me)
+        client.get_updates = AsyncMock(return_value=[])
+        bot_factory = TelegramBotFactory("example", client=client)
+
+        usernames = await asyncio.gather(*(bot_factory.load_identity() for _ in range(3)))
+
+        self.assertEqual(usernames, ["example_bot"] * 3)
+        client.get_me.assert_awaited_once()
+        identity = await BotIdentity.objects.aget(bot="example")
+        self.assertEqual(identity.username, "example_bot")
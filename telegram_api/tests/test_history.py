@@ -0,0 +1,107 @@
+from django.test import TestCase
+from unittest.mock import patch, AsyncMock, MagicMock
+from agents.models import RAGContext
+from agents.openai_api import LLMFactory
+from agents.tests.local_stores import isolate_local_stores
+from telegram import Update
+from telegram_api.history import agroup_messages, asave_updates, export_to_rag_context, group_messages, \
+    ingest_updates, transcript
+from telegram_api.models import GroupMessage, UpdateCheckpoint
+from telegram_api.tests.test_webhook import GROUP_ID, group_message, private_message
+
+
+def updates(*data: dict) -> list:
+    return [Update.de_json(update, None) for update in data]
+
+
+class GroupHistoryTest(TestCase):
+    async def test_group_messages_are_stored_and_checkpointed(self):
+        stored = await asave_updates("example", updates(
+            group_message(1, "Hello"), private_message(2, "Hi"), group_message(3, "Bye")
+        ))
+
+        self.assertEqual(stored, 2)
+        self.assertEqual([message.text async for message in GroupMessage.objects.order_by("message_id")],
+                         ["Hello", "Bye"])
+        checkpoint = await UpdateCheckpoint.objects.aget(bot="example")
+        self.assertEqual(checkpoint.update_id, 3)
+
+        # An update processed late does not move the checkpoint back
+        await asave_updates("example", updates(group_message(2, "Late", message_id=2)))
+        checkpoint = await UpdateCheckpoint.objects.aget(bot="example")
+        self.assertEqual(checkpoint.update_id, 3)
+
+    async def test_edited_messages_replace_the_stored_ones(self):
+        await asave_updates("example", updates(group_message(1, "Helo")))
+        await asave_updates("example", updates(group_message(2, "Hello", message_id=1, edited=True)))
+
+        message = await GroupMessage.objects.aget(chat_id=GROUP_ID, message_id=1)
+        self.assertEqual(message.text, "Hello")
+        self.assertIsNotNone(message.edited)
+
+    async def test_history_is_read_a_page_at_a_time(self):
+        await asave_updates("example", updates(*(group_message(i, f"Message {i}") for i in range(1, 26))))
+
+        latest = await agroup_messages(GROUP_ID, limit=10)
+        self.assertEqual([message.message_id for message in latest], list(range(16, 26)))
+        earlier = await agroup_messages(GROUP_ID, limit=10, before=latest[0].message_id)
+        self.assertEqual([message.message_id for message in earlier], list(range(6, 16)))
+        later = await agroup_messages(GROUP_ID, limit=10, after=earlier[-1].message_id)
+        self.assertEqual(later, latest)
+        self.assertEqual(await agroup_messages(-2), [])
+
+    async def test_updates_are_ingested_from_the_checkpoint(self):
+        await UpdateCheckpoint.objects.acreate(bot="example", update_id=4)
+        client = MagicMock()
+        client.get_updates = AsyncMock(side_effect=[
+            updates(group_message(5, "One"), group_message(6, "Two")),
+            updates(group_message(7, "Three")),
+            []
+        ])
+
+        self.assertEqual(await ingest_updates("example", client), 3)
+
+        offsets = [call.kwargs["offset"] for call in client.get_updates.await_args_list]
+        self.assertEqual(offsets, [5, 7, 8])
+        checkpoint = await UpdateCheckpoint.objects.aget(bot="example")
+        self.assertEqual(checkpoint.update_id, 7)
+
+    @patch('telegram_api.history.LLMFactory')
+    def test_new_messages_are_exported_to_the_rag_context(self, MockLLMFactory):
+        GroupMessage.objects.bulk_create(
+            GroupMessage(chat_id=GROUP_ID, message_id=i, username="member", text=f"Message {i}",
+                         date="2024-05-01T12:00:00Z")
+            for i in range(1, 6)
+        )
+        save = MockLLMFactory.return_value.add_to_rag_context
+
+        self.assertEqual(export_to_rag_context("example", GROUP_ID, page_size=3), 5)
+        self.assertEqual(save.call_count, 2)
+        self.assertEqual(save.call_args_list[0].args, ([transcript(group_messages(GROUP_ID, limit=3, after=0))],))
+        self.assertIn("[2024-05-01 12:00] member: Message 1", save.call_args_list[0].args[0][0])
+
+        # Only the messages stored since are exported next time
+        GroupMessage.objects.create(chat_id=GROUP_ID, message_id=6, username="member", text="Message 6",
+                                    date="2024-05-01T12:01:00Z")
+        save.reset_mock()
+        self.assertEqual(export_to_rag_context("example", GROUP_ID), 1)
+        save.assert_called_once_with(["[2024-05-01 12:01] member: Message 6"])
+
+    @patch("agents.openai_api.get_client")
+    @patch("agents.openai_api.LLMFactory.create_text_embeddings")
+    def test_questions_are_answered_after_an_export(self, mock_embeddings, mock_get_client):
+        isolate_local_stores(self)
+        mock_embeddings.side_effect = lambda documents, **options: [[1.0, 0.0] for _ in documents]
+        llm_factory = LLMFactory(company_name="example")
+        llm_factory.save_rag_context_to_model("Whitepaper", ["The token unlocks in May."])
+        GroupMessage.objects.create(chat_id=GROUP_ID, message_id=1, username="member",
+                                    text="The launch is on Friday.", date="2024-05-01T12:00:00Z")
+
+        self.assertEqual(export_to_rag_context("example", GROUP_ID), 1)
+        create = mock_get_client.return_value.chat.completions.create
+        create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="On Friday."))])
+        answer = llm_factory.generate_response("When is the launch?", use_cache=False)
+
+        self.assertEqual(answer, "On Friday.")
+        self.assertIn("member: The launch is on Friday.", create.call_args.kwargs["messages"][0]["content"])
+        self.assertEqual(RAGContext.objects.count(), 1)
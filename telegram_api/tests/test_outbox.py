@@ -0,0 +1,107 @@
+from django.test import SimpleTestCase
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import RetryAfter
+from telegram_api.outbox import BROADCAST, REPLY, Outbox
+import asyncio
+import time
+
+
+class FakeClient:
+    """
+    Records the messages sent through it, refusing the first ones with a flood error if asked to.
+    """
+
+    def __init__(self, flood_errors: int = 0, retry_after: float = 0.1) -> None:
+        self.token = "test-token"
+        self.sent = []
+        self.flood_errors = flood_errors
+        self.retry_after = retry_after
+
+    async def send_message(self, chat_id: int, text: str, **options) -> MagicMock:
+        await asyncio.sleep(0.001)
+        if self.flood_errors:
+            self.flood_errors -= 1
+            raise RetryAfter(self.retry_after)
+        self.sent.append((time.monotonic(), chat_id, text))
+        return MagicMock(chat_id=chat_id, text=text)
+
+
+class OutboxTest(SimpleTestCase):
+    async def test_messages_to_a_chat_are_spaced(self):
+        client = FakeClient()
+        async with Outbox(client, per_second=1000, chat_interval=0.05, merge_chars=0) as outbox:
+            await asyncio.gather(*(outbox.send(1, f"Message {i}") for i in range(3)))
+
+        times = [sent_at for sent_at, _, _ in client.sent]
+        self.assertEqual([text for _, _, text in client.sent], ["Message 0", "Message 1", "Message 2"])
+        self.assertTrue(all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:])))
+
+    async def test_global_pace(self):
+        client = FakeClient()
+        start = time.monotonic()
+        async with Outbox(client, per_second=50, chat_interval=1.0) as outbox:
+            await asyncio.gather(*(outbox.send(chat_id, "Hello") for chat_id in range(10)))
+
+        # Ten chats, one message each: only the global pace applies
+        self.assertGreaterEqual(time.monotonic() - start, 9 / 50 - 0.01)
+        self.assertEqual(sorted(chat_id for _, chat_id, _ in client.sent), list(range(10)))
+
+    async def test_replies_go_before_broadcasts(self):
+        client = FakeClient()
+        async with Outbox(client, per_second=20, chat_interval=0) as outbox:
+            broadcasts = [asyncio.create_task(outbox.send(chat_id, "News", priority=BROADCAST))
+                          for chat_id in range(5)]
+            # Let the first broadcast go out, the others wait for the global pace
+            await asyncio.sleep(0.01)
+            await outbox.send(99, "Answer", priority=REPLY)
+            await asyncio.gather(*broadcasts)
+
+        chats = [chat_id for _, chat_id, _ in client.sent]
+        # The first broadcast was already on its way when the reply was queued
+        self.assertEqual(chats.index(99), 1)
+
+    async def test_short_messages_to_a_chat_are_merged(self):
+        client = FakeClient()
+        async with Outbox(client, per_second=1000, chat_interval=0.05) as outbox:
+            first = asyncio.create_task(outbox.send(-1, "Line 0"))
+            await asyncio.sleep(0.01)
+            results = await asyncio.gather(first, *(outbox.send(-1, f"Line {i}") for i in range(1, 4)))
+
+        # The first message goes out at once, the three queued behind it are merged
+        self.assertEqual([text for _, _, text in client.sent], ["Line 0", "Line 1\n\nLine 2\n\nLine 3"])
+        self.assertIs(results[1], results[3])
+        self.assertEqual(outbox.stats(), {"sent": 2, "merged": 2, "retried": 0})
+
+    async def test_messages_with_options_are_not_merged(self):
+        client = FakeClient()
+        async with Outbox(client, per_second=1000, chat_interval=0) as outbox:
+            await asyncio.gather(outbox.send(1, "A"), outbox.send(1, "B", parse_mode="HTML"))
+        self.assertEqual(len(client.sent), 2)
+
+    async def test_flood_errors_pause_and_retry(self):
+        client = FakeClient(flood_errors=1, retry_after=0.1)
+        start = time.monotonic()
+        async with Outbox(client, per_second=1000, chat_interval=0) as outbox:
+            message = await outbox.send(1, "Hello")
+
+        self.assertEqual(message.text, "Hello")
+        self.assertGreaterEqual(client.sent[0][0] - start, 0.1)
+        self.assertEqual(outbox.stats()["retried"], 1)
+
+    async def test_edits_follow_the_pace_and_the_flood_pauses(self):
+        client = FakeClient()
+        message = MagicMock(chat_id=1)
+        message.edit_text = AsyncMock(side_effect=[None, None, RetryAfter(0.1)])
+        start = time.monotonic()
+        async with Outbox(client, per_second=20, chat_interval=0) as outbox:
+            await outbox.edit(message, "In")
+            await outbox.edit(message, "In May")
+            paced = time.monotonic() - start
+            with self.assertRaises(RetryAfter):
+                await outbox.edit(message, "In May.")
+            refused = time.monotonic()
+            await outbox.send(2, "News")
+
+        self.assertGreaterEqual(paced, 1 / 20 - 0.01)
+        # A refused edit holds the sends back too
+        self.assertGreaterEqual(client.sent[0][0] - refused, 0.09)
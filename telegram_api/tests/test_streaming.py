@@ -0,0 +1,105 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch, AsyncMock, MagicMock
+from telegram.error import BadRequest, RetryAfter
+from telegram_api.streaming import MESSAGE_LIMIT, PLACEHOLDER, StreamingReply
+
+
+async def pieces(*texts: str):
+    for text in texts:
+        yield text
+
+
+class StreamingReplyTest(SimpleTestCase):
+    def setUp(self):
+        self.clock = [100.0]
+        clock_patcher = patch("telegram_api.streaming.time.monotonic", side_effect=lambda: self.clock[0])
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
+
+        self.reply = MagicMock()
+        self.reply.edit_text = AsyncMock()
+        self.message = MagicMock()
+        self.message.chat.type = "private"
+        self.message.reply_text = AsyncMock(return_value=self.reply)
+
+    def edited_texts(self) -> list:
+        return [call.args[0] for call in self.reply.edit_text.call_args_list]
+
+    async def test_posts_placeholder_then_final_answer(self):
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=10)
+
+        answer = await streamer.stream(pieces("In ", "May"))
+
+        self.assertEqual(answer, "In May")
+        self.message.reply_text.assert_awaited_once_with(PLACEHOLDER)
+        # The first part replaces the placeholder at once, the rest is shown at the end
+        self.assertEqual(self.edited_texts(), ["In ", "In May"])
+
+    async def test_edits_are_throttled_and_batched(self):
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=10)
+        await streamer.start()
+
+        # The first part is shown at once
+        await streamer.append("The ")
+        self.assertEqual(self.edited_texts(), ["The "])
+        # Later parts wait for both the interval and enough characters
+        self.clock[0] += 0.5
+        await streamer.append("token unlock")
+        self.clock[0] += 0.3
+        await streamer.append(" is in May")
+        self.assertEqual(len(self.edited_texts()), 1)
+        self.clock[0] += 0.2
+        await streamer.append(".")
+        await streamer.finish()
+
+        self.assertEqual(self.edited_texts(), ["The ", "The token unlock is in May."])
+
+    def test_groups_get_a_longer_interval(self):
+        self.message.chat.type = "supergroup"
+        self.assertEqual(StreamingReply(self.message).min_interval, 3.0)
+
+    async def test_retry_after_postpones_the_next_edit(self):
+        self.reply.edit_text.side_effect = [RetryAfter(5), None]
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=1)
+        await streamer.start()
+
+        await streamer.append("In ")
+        self.clock[0] += 1.0
+        await streamer.append("May")
+        self.assertEqual(self.reply.edit_text.await_count, 1)
+        self.clock[0] += 5.0
+        await streamer.append(".")
+
+        self.assertEqual(self.edited_texts(), ["In ", "In May."])
+
+    async def test_unmodified_message_is_ignored(self):
+        self.reply.edit_text.side_effect = BadRequest("Message is not modified")
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=1)
+
+        await streamer.stream(pieces("In May"))
+
+        self.assertEqual(streamer.edits, 0)
+
+    async def test_edits_go_through_the_outbox(self):
+        outbox = MagicMock()
+        outbox.reply = AsyncMock(return_value=self.reply)
+        outbox.edit = AsyncMock()
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=10, outbox=outbox)
+
+        await streamer.stream(pieces("In ", "May"))
+
+        self.assertEqual([call.args for call in outbox.edit.call_args_list],
+                         [(self.reply, "In "), (self.reply, "In May")])
+        self.reply.edit_text.assert_not_awaited()
+
+    async def test_long_answers_continue_in_new_replies(self):
+        streamer = StreamingReply(self.message, min_interval=1.0, min_chars=1)
+        words = MESSAGE_LIMIT // 2
+
+        # Two and a half messages arrive at once
+        await streamer.stream(pieces("word " * words))
+
+        self.assertEqual([call.args[0] for call in self.message.reply_text.call_args_list], [PLACEHOLDER] * 3)
+        texts = self.edited_texts()
+        self.assertTrue(all(len(text) <= MESSAGE_LIMIT for text in texts))
+        self.assertEqual(" ".join(texts).split(), ["word"] * words)
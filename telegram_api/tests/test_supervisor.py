@@ -0,0 +1,80 @@
+from django.test import TestCase
+from unittest.mock import patch
+from telegram_api.supervisor import BotSupervisor
+from telegram_api.tests.fake_telegram import FakeTelegram
+from telegram_api.tests.test_webhook import private_message
+import asyncio
+import os
+
+
+TOKENS = {"alpha": "1:alpha", "beta": "2:beta", "gamma": "3:gamma"}
+
+
+class BotSupervisorTest(TestCase):
+    def setUp(self):
+        self.telegram = FakeTelegram(max_poll=0.05).start()
+        self.addCleanup(self.telegram.stop)
+        env_patcher = patch.dict(os.environ, {
+            "TELEGRAM_API_URL": self.telegram.url,
+            **{f"BOT_KEY_{name.upper()}": token for name, token in TOKENS.items()}
+        })
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+    async def wait_for_replies(self, count: int) -> list:
+        for _ in range(200):
+            replies = self.telegram.calls_to("sendMessage")
+            if len(replies) >= count:
+                return replies
+            await asyncio.sleep(0.01)
+        self.fail(f"Expected {count} replies, got {len(self.telegram.calls_to('sendMessage'))}")
+
+    async def test_bots_poll_on_one_loop(self):
+        supervisor = BotSupervisor(poll_timeout=1)
+        try:
+            failed = await supervisor.start(["alpha", "beta"])
+            self.assertEqual(failed, {})
+
+            self.telegram.push_update(TOKENS["beta"], private_message(1, "Hello"))
+            replies = await self.wait_for_replies(1)
+            self.assertEqual(replies[0]["text"], "You are not authorized to interact with this bot.")
+            # Both bots send through the same connection pool
+            self.assertIs(supervisor.bots["alpha"].application.bot.request, supervisor.bots["beta"].application.bot.request)
+        finally:
+            await supervisor.close()
+        self.assertEqual(supervisor.bots, {})
+
+    async def test_failures_are_isolated(self):
+        self.telegram.revoke(TOKENS["beta"])
+        supervisor = BotSupervisor(poll_timeout=1)
+        try:
+            failed = await supervisor.start(["alpha", "beta", "gamma"])
+
+            self.assertEqual(list(failed), ["beta"])
+            self.assertEqual(set(supervisor.bots), {"alpha", "gamma"})
+            self.assertEqual(supervisor.stats()["failed"], 1)
+            self.telegram.push_update(TOKENS["gamma"], private_message(1, "Hello"))
+            await self.wait_for_replies(1)
+        finally:
+            await supervisor.close()
+
+    async def test_reload(self):
+        supervisor = BotSupervisor(poll_timeout=1)
+        try:
+            await supervisor.start(["alpha", "beta"])
+            beta = supervisor.bots["beta"]
+
+            await supervisor.reload(["beta", "gamma"])
+            self.assertEqual(set(supervisor.bots), {"beta", "gamma"})
+            self.assertIs(supervisor.bots["beta"], beta)
+
+            # A bot whose key changed is restarted
+            with patch.dict(os.environ, {"BOT_KEY_BETA": "4:beta"}):
+                await supervisor.reload(["beta", "gamma"])
+            self.assertIsNot(supervisor.bots["beta"], beta)
+
+            # Stopping bots leaves the shared pool open for the others
+            self.telegram.push_update(TOKENS["gamma"], private_message(1, "Hello"))
+            await self.wait_for_replies(1)
+        finally:
+            await supervisor.close()
@@ -0,0 +1,109 @@
+from django.test import AsyncRequestFactory, TestCase
+from unittest.mock import patch
+from telegram_api.history import agroup_messages
+from telegram_api.models import UpdateCheckpoint
+from telegram_api.tests.fake_telegram import FakeTelegram
+from telegram_api.webhook import SECRET_HEADER, get_dispatcher, set_webhook, telegram_webhook, webhook_secret
+import json
+import os
+
+
+def private_message(update_id: int, text: str, username: str = "stranger") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Test", "username": username},
+            "text": text
+        }
+    }
+
+
+GROUP_ID = -1001
+
+
+def group_message(update_id: int, text: str, message_id: int = None, edited: bool = False) -> dict:
+    message = {
+        "message_id": message_id or update_id,
+        "date": 1700000000 + update_id,
+        "chat": {"id": GROUP_ID, "type": "supergroup", "title": "Example"},
+        "from": {"id": 7, "is_bot": False, "first_name": "Test", "username": "member"},
+        "text": text
+    }
+    if edited:
+        message["edit_date"] = message["date"] + 60
+    return {"update_id": update_id, "edited_message" if edited else "message": message}
+
+
+class TelegramWebhookTest(TestCase):
+    def setUp(self):
+        self.telegram = FakeTelegram().start()
+        self.addCleanup(self.telegram.stop)
+        env_patcher = patch.dict(os.environ, {
+            "BOT_KEY_EXAMPLE": "123:example",
+            "BOT_KEY_OTHER": "456:other",
+            "TELEGRAM_API_URL": self.telegram.url,
+            "TELEGRAM_WEBHOOK_SECRET": "webhook-secret",
+            "TELEGRAM_WEBHOOK_URL": "https://example.com/telegram/webhook",
+        })
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        self.requests = AsyncRequestFactory()
+
+    async def post_update(self, bot: str, update: dict, secret: str = None):
+        secret = secret if secret is not None else webhook_secret(bot)
+        request = self.requests.post(f"/telegram/webhook/{bot}/", data=json.dumps(update),
+                                     content_type="application/json", headers={SECRET_HEADER: secret})
+        return await telegram_webhook(request, bot=bot)
+
+    async def test_updates_are_dispatched_to_the_bot_handlers(self):
+        response = await self.post_update("example", private_message(1, "Hello"))
+        await get_dispatcher().shutdown()
+
+        self.assertEqual(response.status_code, 200)
+        replies = self.telegram.calls_to("sendMessage")
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(replies[0]["chat_id"], 42)
+        self.assertEqual(replies[0]["text"], "You are not authorized to interact with this bot.")
+
+    async def test_group_messages_are_stored(self):
+        await self.post_update("example", group_message(5, "gm"))
+        await get_dispatcher().shutdown()
+
+        messages = await agroup_messages(GROUP_ID)
+        self.assertEqual([(message.username, message.text) for message in messages], [("member", "gm")])
+        checkpoint = await UpdateCheckpoint.objects.aget(bot="example")
+        self.assertEqual(checkpoint.update_id, 5)
+
+    async def test_updates_with_a_wrong_secret_are_rejected(self):
+        response = await self.post_update("example", private_message(1, "Hello"), secret="guess")
+        await get_dispatcher().shutdown()
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.telegram.calls, [])
+
+    async def test_unknown_bots_are_not_found(self):
+        response = await self.post_update("unknown", private_message(1, "Hello"))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_bots_share_the_process(self):
+        await self.post_update("example", private_message(1, "Hello"))
+        await self.post_update("other", private_message(2, "Hello"))
+        lookups = len(self.telegram.calls_to("getMe"))
+        # Later updates reuse the application of their bot
+        await self.post_update("example", private_message(3, "Hello"))
+        dispatcher = get_dispatcher()
+        self.assertEqual(set(dispatcher._applications), {"example", "other"})
+        await dispatcher.shutdown()
+
+        self.assertEqual(len(self.telegram.calls_to("getMe")), lookups)
+        self.assertEqual(len(self.telegram.calls_to("sendMessage")), 3)
+
+    async def test_set_webhook(self):
+        self.assertTrue(await set_webhook("example"))
+
+        parameters, = self.telegram.calls_to("setWebhook")
+        self.assertEqual(parameters["url"], "https://example.com/telegram/webhook/example/")
+        self.assertEqual(parameters["secret_token"], webhook_secret("example"))
@@ -0,0 +1,195 @@
+"""
+Webhook mode: Telegram pushes the updates of every bot to one endpoint of the ASGI app, which dispatches them to
+the handlers of the right bot. Any number of bots share the process and its event loop, without a poller each.
+The app has to be served over ASGI, as in the Dockerfile: under WSGI each request runs on an event loop of its
+own, which cancels the update's processing task once the response is sent.
+"""
+from decouple import config
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from telegram import Update
+from telegram.ext import Application
+from telegram_api.bot_factory import TelegramBotFactory, api_url
+from telegram_api.outbox import get_outbox
+import asyncio
+import hashlib
+import hmac
+import json
+import telegram
+import weakref
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def webhook_secret(bot: str) -> str:
+    """
+    Secret token Telegram sends along with the updates of a bot, derived from the TELEGRAM_WEBHOOK_SECRET setting.
+
+    Args:
+        bot (str): The name identifier of the bot.
+
+    Returns:
+        str: The secret token of the bot.
+    """
+    return hmac.new(config("TELEGRAM_WEBHOOK_SECRET").encode(), bot.encode(), hashlib.sha256).hexdigest()
+
+
+def webhook_url(bot: str, base_url: str = None) -> str:
+    """
+    URL Telegram pushes the updates of a bot to.
+
+    Args:
+        bot (str): The name identifier of the bot.
+        base_url (str, optional): Public URL of the webhook endpoint. Defaults to the TELEGRAM_WEBHOOK_URL setting.
+
+    Returns:
+        str: The URL of the bot's webhook.
+    """
+    base_url = base_url or config("TELEGRAM_WEBHOOK_URL")
+    return f"{base_url.rstrip('/')}/{bot}/"
+
+
+async def set_webhook(bot: str, base_url: str = None) -> bool:
+    """
+    Ask Telegram to push the updates of a bot to the webhook instead of keeping them for `get_updates`.
+
+    Args:
+        bot (str): The name identifier of the bot.
+        base_url (str, optional): Public URL of the webhook endpoint. Defaults to the TELEGRAM_WEBHOOK_URL setting.
+
+    Returns:
+        bool: True if Telegram accepted the webhook.
+    """
+    client = telegram.Bot(
+        token=config(f"BOT_KEY_{bot.upper()}"),
+        base_url=api_url()
+    )
+    async with client:
+        return await client.set_webhook(
+            url=webhook_url(bot, base_url),
+            secret_token=webhook_secret(bot),
+            allowed_updates=Update.ALL_TYPES
+        )
+
+
+class WebhookDispatcher:
+    """
+    Hand the updates pushed to the webhook to the application of their bot.
+    Applications are built and initialized on the first update of their bot. Each update is processed in a task
+    of its own, so the webhook answers Telegram at once and a slow handler does not hold back other updates.
+    """
+
+    def __init__(self) -> None:
+        self._applications = {}
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    async def application(self, bot: str) -> Application:
+        """
+        Return the initialized application of a bot, building it on first use.
+
+        Args:
+            bot (str): The name identifier of the bot.
+
+        Returns:
+            Application: The application of the bot.
+        """
+        application = self._applications.get(bot)
+        if application is not None:
+            return application
+
+        async with self._lock:
+            if bot not in self._applications:
+                factory = TelegramBotFactory(bot)
+                application = factory.build_application(polling=False)
+                await application.initialize()
+                await factory.load_identity()
+                self._applications[bot] = application
+        return self._applications[bot]
+
+    async def dispatch(self, bot: str, data: dict) -> None:
+        """
+        Process an update of a bot in the background.
+
+        Args:
+            bot (str): The name identifier of the bot.
+            data (dict): The update, as sent by Telegram.
+        """
+        application = await self.application(bot)
+        update = Update.de_json(data, application.bot)
+        task = asyncio.create_task(self._process(bot, application, update))
+        # Keep a reference until the task is done, the loop only holds weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """
+        Wait until every update received so far has been processed.
+        """
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def shutdown(self) -> None:
+        """
+        Process the pending updates and release the applications.
+        """
+        await self.drain()
+        async with self._lock:
+            for application in self._applications.values():
+                await get_outbox(application.bot).close()
+                await application.shutdown()
+            self._applications.clear()
+
+    @staticmethod
+    async def _process(bot: str, application: Application, update: Update) -> None:
+        try:
+            await application.process_update(update)
+        except Exception as e:
+            print(f"Error processing update {update.update_id} of bot {bot}: {e}")
+
+
+# Applications hold connections of the loop that initialized them, so each loop gets its own dispatcher
+_dispatchers = weakref.WeakKeyDictionary()
+
+
+def get_dispatcher() -> WebhookDispatcher:
+    """
+    Return the webhook dispatcher of the running event loop, creating it on first use.
+
+    Returns:
+        WebhookDispatcher: The dispatcher of the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _dispatchers:
+        _dispatchers[loop] = WebhookDispatcher()
+    return _dispatchers[loop]
+
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request: HttpRequest, bot: str) -> HttpResponse:
+    """
+    Receive an update of a bot from Telegram and dispatch it to the bot's handlers.
+
+    Args:
+        request (HttpRequest): The request of Telegram, with the update as its JSON body.
+        bot (str): The name identifier of the bot.
+
+    Returns:
+        HttpResponse: 200 once the update is queued, 403 if the secret token does not match and 404 for unknown
+            bots.
+    """
+    secret = request.headers.get(SECRET_HEADER, "")
+    if not hmac.compare_digest(secret, webhook_secret(bot)):
+        return HttpResponseForbidden()
+    if config(f"BOT_KEY_{bot.upper()}", default=None) is None:
+        return HttpResponseNotFound()
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
+    await get_dispatcher().dispatch(bot, data)
+    return HttpResponse()